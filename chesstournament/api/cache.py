@@ -0,0 +1,20 @@
+from django.core.cache import cache
+
+
+def cache_key(name, tournament):
+    # The version changes with every change on the tournament, so old
+    # payloads are never read again and expire by themselves
+    return f"{name}:{tournament.id}:{tournament.version}"
+
+
+def cached_payload(name, tournament, build):
+    # Return the payload stored for the current version of the tournament,
+    # building and storing it when there is none. None is not stored
+    key = cache_key(name, tournament)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build(tournament)
+        if payload is not None:
+            cache.set(key, payload)
+
+    return payload
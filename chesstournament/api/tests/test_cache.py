@@ -0,0 +1,89 @@
+from django.db import connection
+from django.test import tag, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+from chess_models.models import (Tournament, Player, Scores, RankingSystem,
+                                 TournamentType, TournamentSpeed,
+                                 TournamentBoardType)
+from chess_models.models.game import create_rounds
+
+
+class TournamentCacheTest(TransactionTestCase):
+    """ranking and round results are cached by tournament version"""
+    reset_sequences = True
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpassword')
+        self.tournament = Tournament.objects.create(
+            name='cached',
+            tournament_type=TournamentType.ROUNDROBIN,
+            tournament_speed=TournamentSpeed.CLASSICAL,
+            board_type=TournamentBoardType.OTB,
+            administrativeUser=self.user)
+        self.tournament.addToRankingList(RankingSystem.WINS.value)
+        for i in range(4):
+            player = Player.objects.create(
+                name=f'player_{i}', email=f'player_{i}@example.com')
+            self.tournament.players.add(player)
+        create_rounds(self.tournament)
+
+    def version(self):
+        return Tournament.objects.get(id=self.tournament.id).version
+
+    def get(self, url):
+        return self.client.get(f'/api/v1/{url}/{self.tournament.id}/')
+
+    @tag("continua")
+    def test_001_repeated_reads_use_the_cache(self):
+        """the second read only looks for the tournament"""
+        for url in ['get_ranking', 'get_round_results']:
+            first = self.get(url).json()
+            with CaptureQueriesContext(connection) as queries:
+                second = self.get(url).json()
+            self.assertEqual(first, second)
+            self.assertEqual(len(queries), 1)
+
+    @tag("continua")
+    def test_002_game_update_changes_the_version(self):
+        """a new result is shown in the next read"""
+        self.assertEqual(self.get('get_ranking').json()['1']['score'], 0)
+        version = self.version()
+
+        self.client.force_authenticate(user=self.user)
+        game = self.tournament.getGames()[0]
+        self.client.post('/api/v1/admin_update_game/',
+                         {'game_id': game.id,
+                          'otb_result': Scores.WHITE.value})
+        self.assertGreater(self.version(), version)
+
+        ranking = self.get('get_ranking').json()
+        self.assertEqual(ranking['1']['id'], game.white.id)
+        self.assertEqual(ranking['1']['score'], 1)
+        rounds = self.get('get_round_results').json()
+        self.assertEqual(rounds[0]['games'][0]['result'], Scores.WHITE)
+
+    @tag("continua")
+    def test_003_mutations_change_the_version(self):
+        """rounds, players and tournament settings change the version"""
+        version = self.version()
+        player = self.tournament.getPlayers()[0]
+        player.name = 'renamed'
+        player.save()
+        self.assertGreater(self.version(), version)
+
+        version = self.version()
+        self.tournament.players.remove(player)
+        self.assertGreater(self.version(), version)
+
+        version = self.version()
+        self.tournament.round_set.first().delete()
+        self.assertGreater(self.version(), version)
+
+        # Saving an old copy does not take the version back
+        version = self.version()
+        self.tournament.win_points = 3
+        self.tournament.save()
+        self.assertGreater(self.version(), version)
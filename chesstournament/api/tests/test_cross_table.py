@@ -0,0 +1,42 @@
+from django.test import tag, TransactionTestCase
+from rest_framework.test import APIClient
+from chess_models.models import Game, Tournament
+
+
+class GetCrossTableAPIViewTest(TransactionTestCase):
+    reset_sequences = True
+
+    def setUp(self):
+        from chess_models.management.commands.populate import Command
+        self.client = APIClient()
+        self.get_cross_table = '/api/v1/get_cross_table/'
+        command = Command()
+        command.cleanDataBase()
+        command.readInputFile(
+            'chess_models/management/commands/tie-breaking-swiss.trf')
+        command.insertData()
+        self.tournament = Tournament.objects.get(
+            name='tie-breaking exercises swiss')
+
+    @tag("continua")
+    def test_001_getCrossTable(self):
+        """rows in player order, one value per opponent"""
+        response = self.client.get(
+            self.get_cross_table + f'{self.tournament.id}/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        ids = [player['id'] for player in data['players']]
+        self.assertEqual(data['games'], 1)
+        self.assertEqual(len(data['table']), len(ids))
+        for game in Game.objects.filter(round__tournament=self.tournament,
+                                        black__isnull=False):
+            i, j = ids.index(game.white.id), ids.index(game.black.id)
+            self.assertEqual(data['results'][data['table'][i][j] - 1],
+                             game.result)
+            self.assertEqual(data['table'][j][i], -data['table'][i][j])
+
+    @tag("continua")
+    def test_002_getCrossTable_unknown_tournament(self):
+        response = self.client.get(self.get_cross_table + '1000/')
+        self.assertEqual(response.status_code, 400)
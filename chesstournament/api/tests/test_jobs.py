@@ -0,0 +1,161 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import tag, TransactionTestCase
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+from django.utils import timezone
+from io import StringIO
+from unittest.mock import patch
+
+from chess_models.models import (Tournament, TournamentJob, JobStatus,
+                                 TournamentType, TournamentSpeed,
+                                 TournamentBoardType, Player, claim_job,
+                                 create_rounds)
+
+
+class TournamentJobTest(TransactionTestCase):
+    """tournaments created by the run_jobs worker"""
+    reset_sequences = True
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+    def queue(self, name, format='json'):
+        return self.client.post('/api/v1/tournament_create/', {
+            'name': name,
+            'tournament_type': TournamentType.ROUNDROBIN,
+            'tournament_speed': TournamentSpeed.CLASSICAL,
+            'board_type': TournamentBoardType.OTB,
+            'rankingList': ['PS', 'WI'],
+            'players': 'name,email\na,a@example.com\nb,b@example.com\n'
+                       'c,c@example.com\nd,d@example.com',
+            'job': True,
+        }, format=format)
+
+    def status(self, job_id):
+        return self.client.get(f'/api/v1/tournament_job/{job_id}/').json()
+
+    def work(self):
+        out = StringIO()
+        call_command('run_jobs', '--once', '--workers', '0', stdout=out)
+        return out.getvalue()
+
+    @tag("continua")
+    def test_001_job_creates_the_tournament(self):
+        """the request only queues the job, the worker creates the
+        tournament with its players and rounds"""
+        for format in ['json', 'multipart']:
+            response = self.queue(format, format)
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()['job_id']
+            self.assertFalse(Tournament.objects.filter(name=format).exists())
+            self.assertEqual(self.status(job_id), {
+                'id': job_id, 'status': 'Queued', 'progress': 0,
+                'error': '', 'tournament_id': None})
+
+            self.assertIn('Done', self.work())
+            tournament = Tournament.objects.get(name=format)
+            self.assertEqual(self.status(job_id), {
+                'id': job_id, 'status': 'Done', 'progress': 100,
+                'error': '', 'tournament_id': tournament.id})
+            self.assertEqual(tournament.getPlayersCount(), 4)
+            self.assertEqual(tournament.getRoundCount(), 3)
+            self.assertEqual(tournament.getRankingCodes(), ['PS', 'WI'])
+            self.assertEqual(tournament.administrativeUser, self.user)
+
+    @tag("continua")
+    def test_002_job_errors(self):
+        """a job that can not create its tournament reports the error"""
+        first = self.queue('twice').json()['job_id']
+        second = self.queue('twice').json()['job_id']
+        self.work()
+
+        self.assertEqual(self.status(first)['status'], 'Done')
+        status = self.status(second)
+        self.assertEqual(status['status'], 'Failed')
+        self.assertIn('name', status['error'])
+        self.assertEqual(
+            self.client.get('/api/v1/tournament_job/999/').status_code, 400)
+
+    @tag("continua")
+    def test_003_jobs_are_claimed_once(self):
+        """a running job is not taken again"""
+        self.queue('claimed')
+        job = claim_job()
+        self.assertEqual(job.status, JobStatus.RUNNING)
+        self.assertIsNone(claim_job())
+        self.assertEqual(TournamentJob.objects.get().status,
+                         JobStatus.RUNNING)
+
+    @tag("continua")
+    def test_004_jobs_of_other_users(self):
+        """a job is only seen by the user that asked for it"""
+        job_id = self.queue('private').json()['job_id']
+        other = User.objects.create_user(
+            username='other', password='testpassword')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(
+            self.client.get(f'/api/v1/tournament_job/{job_id}/').status_code,
+            400)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.status(job_id)['status'], 'Queued')
+
+    @tag("continua")
+    def test_005_failed_job_is_rolled_back(self):
+        """a job that fails after saving the tournament leaves no tournament
+        nor players behind"""
+        job_id = self.queue('rolled back').json()['job_id']
+        with patch('chess_models.jobs.create_rounds',
+                   side_effect=ValueError('no rounds')):
+            self.work()
+
+        status = self.status(job_id)
+        self.assertEqual(status['status'], 'Failed')
+        self.assertEqual(status['error'], 'no rounds')
+        self.assertIsNone(status['tournament_id'])
+        self.assertFalse(Tournament.objects.exists())
+        self.assertFalse(Player.objects.exists())
+
+    @tag("continua")
+    def test_006_progress_is_seen_while_running(self):
+        """the progress of a running job is seen by the other requests"""
+        job_id = self.queue('progress').json()['job_id']
+        seen = []
+
+        def rounds(tournament):
+            seen.append(self.status(job_id))
+            return create_rounds(tournament)
+
+        with patch('chess_models.jobs.create_rounds', side_effect=rounds):
+            self.work()
+
+        tournament = Tournament.objects.get(name='progress')
+        self.assertEqual(seen, [{
+            'id': job_id, 'status': 'Running', 'progress': 80,
+            'error': '', 'tournament_id': tournament.id}])
+        self.assertEqual(self.status(job_id)['status'], 'Done')
+
+    @tag("continua")
+    def test_007_stalled_jobs_are_claimed_again(self):
+        """a running job without progress for too long is taken again and
+        what its dead worker created is replaced"""
+        job_id = self.queue('stalled').json()['job_id']
+        with patch('chess_models.jobs.create_rounds',
+                   side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                self.work()
+        self.assertEqual(self.status(job_id)['status'], 'Running')
+        self.assertIsNone(claim_job())
+
+        with self.settings(TOURNAMENT_JOB_TIMEOUT=60):
+            TournamentJob.objects.filter(id=job_id).update(
+                update_date=timezone.now() - timedelta(seconds=120))
+            self.assertIn('Done', self.work())
+
+        tournament = Tournament.objects.get(name='stalled')
+        self.assertEqual(self.status(job_id)['tournament_id'], tournament.id)
+        self.assertEqual(tournament.getRoundCount(), 3)
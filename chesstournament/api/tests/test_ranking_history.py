@@ -0,0 +1,53 @@
+from django.test import tag, TransactionTestCase
+from rest_framework.test import APIClient
+from chess_models.models import Tournament, RankingSystem
+
+
+class GetRankingHistoryAPIViewTest(TransactionTestCase):
+    reset_sequences = True
+
+    def setUp(self):
+        from chess_models.management.commands.populate import Command
+        self.client = APIClient()
+        self.url = '/api/v1/get_ranking_history/'
+        command = Command()
+        command.cleanDataBase()
+        command.readInputFile(
+            'chess_models/management/commands/tie-breaking-swiss.trf')
+        command.insertData()
+        self.tournament = Tournament.objects.get(
+            name='tie-breaking exercises swiss')
+        self.tournament.addToRankingList(RankingSystem.WINS.value)
+
+    @tag("continua")
+    def test_001_getRankingHistory(self):
+        """ranking after every round, the last one is the ranking"""
+        tournament_id = self.tournament.id
+        response = self.client.get(self.url + f'{tournament_id}/')
+        history = response.json()
+        self.assertEqual(len(history), self.tournament.getRoundCount())
+        self.assertEqual([entry['round'] for entry in history],
+                         list(range(1, len(history) + 1)))
+
+        ranking = self.client.get(
+            f'/api/v1/get_ranking/{tournament_id}/').json()
+        self.assertEqual(history[-1]['ranking'], ranking)
+
+        # Scores can only grow from one round to the next one
+        for before, after in zip(history, history[1:]):
+            scores = {v['id']: v['score'] for v in before['ranking'].values()}
+            for v in after['ranking'].values():
+                self.assertGreaterEqual(v['score'], scores[v['id']])
+
+    @tag("continua")
+    def test_002_getRankingAfterRound(self):
+        """a single round, unknown rounds are an error"""
+        tournament_id = self.tournament.id
+        history = self.client.get(self.url + f'{tournament_id}/').json()
+        response = self.client.get(self.url + f'{tournament_id}/2/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), history[1]['ranking'])
+
+        response = self.client.get(
+            self.url + f'{tournament_id}/{len(history) + 1}/')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,47 @@
+from django.test import tag, TransactionTestCase
+from rest_framework.test import APIClient
+from chess_models.models import Tournament, TournamentSpeed
+
+
+class GetRatingReportAPIViewTest(TransactionTestCase):
+    reset_sequences = True
+
+    def setUp(self):
+        from chess_models.management.commands.populate import Command
+        self.client = APIClient()
+        self.url = '/api/v1/get_rating_report/'
+        command = Command()
+        command.cleanDataBase()
+        command.readInputFile(
+            'chess_models/management/commands/tie-breaking-swiss.trf')
+        command.insertData()
+        self.tournament = Tournament.objects.get(
+            name='tie-breaking exercises swiss')
+        self.tournament.tournament_speed = TournamentSpeed.CLASSICAL
+        self.tournament.save()
+
+    @tag("continua")
+    def test_001_getRatingReport(self):
+        """one row per player, ordered by rating"""
+        response = self.client.get(self.url + f'{self.tournament.id}/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['rating'], 'fide_rating_classical')
+        self.assertEqual(len(data['players']),
+                         self.tournament.getPlayersCount())
+        ratings = [row['rating'] or 0 for row in data['players']]
+        self.assertEqual(ratings, sorted(ratings, reverse=True))
+
+        # The rating change scales with k
+        double = self.client.get(
+            self.url + f'{self.tournament.id}/?k=40').json()
+        for row, other in zip(data['players'], double['players']):
+            if row['rating_change'] is not None:
+                self.assertAlmostEqual(2 * row['rating_change'],
+                                       other['rating_change'])
+
+    @tag("continua")
+    def test_002_getRatingReport_wrong_k(self):
+        response = self.client.get(
+            self.url + f'{self.tournament.id}/?k=high')
+        self.assertEqual(response.status_code, 400)
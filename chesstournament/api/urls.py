@@ -10,10 +10,16 @@ from .views import (
     CreateRoundAPIView,
     SearchTournamentsAPIView,
     TournamentCreateAPIView,
+    GetTournamentJob,
     GetRanking,
+    GetRankingHistory,
+    GetCrossTable,
+    GetRatingReport,
+    GetSeason,
     GetPlayers,
     GetRoundResults,
     UpdateLichessGameAPIView,
+    UpdateLichessGamesAPIView,
     UpdateOTBGameAPIView,
     AdminUpdateGameAPIView,
 )
@@ -43,10 +49,36 @@ urlpatterns = [
         TournamentCreateAPIView.as_view(),
         name="tournament-create",
     ),
+    path(
+        "tournament_job/<int:job_id>/", GetTournamentJob.as_view(),
+        name="tournament-job",
+    ),
     path(
         "get_ranking/<int:tournament_id>/", GetRanking.as_view(),
         name="get-ranking"
     ),
+    path(
+        "get_ranking_history/<int:tournament_id>/",
+        GetRankingHistory.as_view(),
+        name="get-ranking-history",
+    ),
+    path(
+        "get_ranking_history/<int:tournament_id>/<int:round_number>/",
+        GetRankingHistory.as_view(),
+        name="get-ranking-after-round",
+    ),
+    path(
+        "get_cross_table/<int:tournament_id>/", GetCrossTable.as_view(),
+        name="get-cross-table",
+    ),
+    path(
+        "get_rating_report/<int:tournament_id>/", GetRatingReport.as_view(),
+        name="get-rating-report",
+    ),
+    path(
+        "get_season/<int:season_id>/", GetSeason.as_view(),
+        name="get-season",
+    ),
     path(
         "get_players/<int:tournament_id>/", GetPlayers.as_view(),
         name="get-players"
@@ -60,6 +92,11 @@ urlpatterns = [
         UpdateLichessGameAPIView.as_view(),
         name="update-lichess-game",
     ),
+    path(
+        "update_lichess_games/",
+        UpdateLichessGamesAPIView.as_view(),
+        name="update-lichess-games",
+    ),
     path(
         "update_otb_game/", UpdateOTBGameAPIView.as_view(),
         name="update-otb-game"
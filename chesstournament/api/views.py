@@ -1,5 +1,5 @@
 # from django.shortcuts import render
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
@@ -7,6 +7,7 @@ from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from djoser.views import UserViewSet
 from rest_framework.views import APIView
+from django.db import transaction
 
 from chess_models.models import (
     Referee,
@@ -15,17 +16,35 @@ from chess_models.models import (
     Tournament,
     Round,
     create_rounds,
-    getRanking,
+    lazy_schedule,
+    import_lichess_results,
+    computeRanking,
+    CrossTable,
+    RatingReport,
+    Season,
+    SeasonStanding,
+    TournamentJob,
+    job_payload,
+    rebuild_season,
+    getRankingHistory,
+    rebuild_standings,
+    update_standings,
+    current_version,
     LichessAPIError,
     Scores,
+    RankingSystem,
 )
+from chess_models.models.rating_report import DEFAULT_K
 from chess_models.serializers import (
     RefereeSerializer,
     PlayerSerializer,
     GameSerializer,
     TournamentSerializer,
     RoundSerializer,
+    LichessGamesSerializer,
+    add_players,
 )
+from .cache import cached_payload
 
 ##########################
 # NOTE: Pagination class #
@@ -77,9 +96,22 @@ class GameViewSet(ModelViewSet):
             partial=True
         )
         if serializer.is_valid():
-            serializer.save()
-            instance.finished = True
-            instance.save(update_fields=["finished"])
+            pairing = (instance.white_id, instance.black_id, instance.round_id)
+            with transaction.atomic():
+                version = current_version(tournament, lock=True)
+                serializer.save()
+                instance.finished = True
+                instance.save(update_fields=["finished"])
+
+                # Update the standings, if the pairing changed the
+                # standings of the tournament are built again
+                if pairing == (
+                    instance.white_id, instance.black_id, instance.round_id
+                ):
+                    update_standings(instance, version)
+                else:
+                    for changed in {tournament, instance.round.tournament}:
+                        rebuild_standings(changed)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -134,6 +166,23 @@ class CreateRoundAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        # Players that join the tournament from this round on, a CSV file
+        # like the one of the tournament creation
+        extra_players = request.data.get("extraPlayers")
+        if extra_players:
+            try:
+                add_players(tournament, extra_players)
+            except serializers.ValidationError as e:
+                return Response(
+                    {"result": False, "message": " ".join(e.detail)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            except LichessAPIError as e:
+                return Response(
+                    {"result": False, "message": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
         # Check the are enought players on the tournament
         if tournament.players.count() == 0:
             return Response(
@@ -141,8 +190,9 @@ class CreateRoundAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Create the rounds
-        rounds = create_rounds(tournament, [])
+        # Create the rounds, the swiss byes are the players that asked for
+        # a half point bye on the next round
+        rounds = create_rounds(tournament, request.data.get("swissByes", []))
         if len(rounds) == 0:
             return Response(
                 {"result": False, "message": "No rounds created"},
@@ -190,6 +240,16 @@ class TournamentCreateAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Job mode, the tournament is created later by the run_jobs worker
+        if request.data.get("job") in [True, "true", "True", "1"]:
+            job = TournamentJob.objects.create(
+                user=request.user, data=job_payload(request.data)
+            )
+            return Response(
+                {"result": True, "job_id": job.id},
+                status=status.HTTP_202_ACCEPTED
+            )
+
         # Save the tournament
         try:
             tournament = serializer.save()
@@ -207,6 +267,29 @@ class TournamentCreateAPIView(APIView):
             )
 
 
+class GetTournamentJob(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        # Only the user that asked for the job can see it
+        job = TournamentJob.objects.filter(
+            id=job_id, user=request.user
+        ).first()
+        if not job:
+            return Response(
+                {"result": False, "message": "Job not found"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({
+            "id": job.id,
+            "status": job.get_status_display(),
+            "progress": job.progress,
+            "error": job.error,
+            "tournament_id": job.tournament_id,
+        }, status=status.HTTP_200_OK)
+
+
 class GetRanking(APIView):
     permission_classes = []
     authentication_classes = []
@@ -219,8 +302,8 @@ class GetRanking(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        ranking = getRanking(tournament)
-        if not ranking:
+        result = cached_payload("ranking", tournament, self.get_ranking)
+        if result is None:
             return Response(
                 {
                     "result": False,
@@ -230,28 +313,204 @@ class GetRanking(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        result = {}
-        count = 0
-        for player, data in ranking.items():
-            count += 1
-            current = str(count)
+        return Response(result, status=status.HTTP_200_OK)
+
+    def get_ranking(self, tournament):
+        ranking = computeRanking(tournament)
+        if not ranking:
+            return None
 
-            result[current] = {}
-            result[current]["id"] = player.id
-            if player.lichess_username:
-                result[current]["username"] = player.lichess_username
-            else:
-                result[current]["username"] = player.name
-            result[current]["score"] = data["PS"]
-            result[current]["rank"] = data["rank"]
+        return serialize_ranking(ranking)
 
-            if "WI" in data:
-                result[current]["WI"] = data["WI"]
 
-            if "BT" in data:
-                result[current]["BT"] = data["BT"]
+def serialize_ranking(ranking):
+    # Ranking payload, {position: player data} in ranking order
+    result = {}
+    count = 0
+    for player, data in ranking.items():
+        count += 1
+        current = str(count)
 
-        return Response(result, status=status.HTTP_200_OK)
+        result[current] = {}
+        result[current]["id"] = player.id
+        if player.lichess_username:
+            result[current]["username"] = player.lichess_username
+        else:
+            result[current]["username"] = player.name
+        result[current]["score"] = data["PS"]
+        result[current]["rank"] = data["rank"]
+
+        # Add the tie-breaks computed for the player
+        for system in RankingSystem.values:
+            if system != RankingSystem.PLAIN_SCORE and system in data:
+                result[current][system] = data[system]
+
+    return result
+
+
+class GetRankingHistory(APIView):
+    permission_classes = []
+    authentication_classes = []
+
+    def get(self, request, tournament_id, round_number=None):
+        tournament = Tournament.objects.filter(id=tournament_id).first()
+        if not tournament:
+            return Response(
+                {"result": False, "message": "Error: tournament not found"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        history = cached_payload(
+            "ranking_history", tournament, self.get_history
+        )
+
+        # Every round or only the requested one
+        if round_number is None:
+            return Response(history, status=status.HTTP_200_OK)
+
+        if not 1 <= round_number <= len(history):
+            return Response(
+                {"result": False, "message": "Error: round not found"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            history[round_number - 1]["ranking"], status=status.HTTP_200_OK
+        )
+
+    def get_history(self, tournament):
+        return [
+            {
+                "round": number,
+                "id": round.id,
+                "name": round.name,
+                "ranking": serialize_ranking(ranking),
+            }
+            for number, (round, ranking) in enumerate(
+                getRankingHistory(tournament), 1
+            )
+        ]
+
+
+class GetCrossTable(APIView):
+    permission_classes = []
+    authentication_classes = []
+
+    def get(self, request, tournament_id):
+        tournament = Tournament.objects.filter(id=tournament_id).first()
+        if not tournament:
+            return Response(
+                {"result": False, "message": "Error: tournament not found"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cross_table = cached_payload(
+            "cross_table", tournament, self.get_cross_table
+        )
+        return Response(cross_table, status=status.HTTP_200_OK)
+
+    def get_cross_table(self, tournament):
+        # Every row holds the games of a player against each opponent,
+        # 'games' values per opponent. Values are indexes on 'results'
+        # plus one, negative when the player had black and 0 if there is
+        # no game
+        cross_table = CrossTable(tournament)
+        return {
+            "players": [
+                {
+                    "id": player.id,
+                    "username": player.lichess_username or player.name,
+                }
+                for player in cross_table.players
+            ],
+            "results": Scores.values,
+            "games": cross_table.cycles,
+            "table": cross_table.rows(),
+        }
+
+
+class GetRatingReport(APIView):
+    permission_classes = []
+    authentication_classes = []
+
+    def get(self, request, tournament_id):
+        tournament = Tournament.objects.filter(id=tournament_id).first()
+        if not tournament:
+            return Response(
+                {"result": False, "message": "Error: tournament not found"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Development coefficient of the rating change
+        try:
+            k = int(request.query_params.get("k", DEFAULT_K))
+        except ValueError:
+            return Response(
+                {"result": False, "message": "Error: k must be a number"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        report = cached_payload(
+            f"rating_report_{k}", tournament,
+            lambda tournament: self.get_report(tournament, k)
+        )
+        return Response(report, status=status.HTTP_200_OK)
+
+    def get_report(self, tournament, k):
+        report = RatingReport(tournament, k)
+        rows = []
+        for row in report.rows():
+            player = row.pop("player")
+            rows.append({
+                "id": player.id,
+                "username": player.lichess_username or player.name,
+                **row,
+            })
+
+        return {"rating": report.field, "k": k, "players": rows}
+
+
+class GetSeason(APIView):
+    permission_classes = []
+    authentication_classes = []
+
+    def get(self, request, season_id):
+        season = Season.objects.filter(id=season_id).first()
+        if not season:
+            return Response(
+                {"result": False, "message": "Error: season not found"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # The leaderboard is computed by recompute_seasons, it is only
+        # computed here the first time
+        if season.computed_date is None:
+            rebuild_season(season)
+            season.refresh_from_db()
+
+        standings = SeasonStanding.objects.filter(
+            season=season
+        ).select_related("player")
+        return Response(
+            {
+                "id": season.id,
+                "name": season.name,
+                "computed_date": season.computed_date,
+                "standings": [
+                    {
+                        "rank": standing.rank,
+                        "id": standing.player.id,
+                        "username": standing.player.lichess_username
+                        or standing.player.name,
+                        "points": standing.points,
+                        "wins": standing.wins,
+                        "games": standing.games,
+                        "tournaments": standing.tournaments,
+                    }
+                    for standing in standings
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
 
 
 class GetPlayers(APIView):
@@ -282,11 +541,18 @@ class GetRoundResults(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        round_results = cached_payload(
+            "round_results", tournament, self.get_round_results
+        )
+        return Response(round_results, status=status.HTTP_200_OK)
+
+    def get_round_results(self, tournament):
         rounds = Round.objects.filter(tournament=tournament).all()
         round_results = []
 
         for round_obj in rounds:
-            games = Game.objects.filter(round=round_obj).order_by('id').all()
+            games = Game.objects.filter(round=round_obj).select_related(
+                "white", "black").order_by('id').all()
             games_data = []
 
             for game in games:
@@ -297,19 +563,8 @@ class GetRoundResults(APIView):
                     "update_date": game.update_date,
                     "result": game.result,
                     "rankingOrder": game.rankingOrder,
-                    "white_player_name": game.white.name if game.white
-                    else "Unknown",
-                    "white_player_email": game.white.email if game.white
-                    else "Unknown",
-                    "black_player_name": game.black.name if game.black
-                    else "Unknown",
-                    "black_player_email": game.black.email if game.black
-                    else "Unknown",
-                    "white_lichess_username": game.white.lichess_username
-                    if game.white else "Unknown",
-                    "black_lichess_username": game.black.lichess_username
-                    if game.black else "Unknown",
-                    "round": game.round.id,
+                    **game_players(game.white, game.black),
+                    "round": game.round_id,
                 })
 
             round_results.append({
@@ -318,10 +573,53 @@ class GetRoundResults(APIView):
                 "start_date": round_obj.start_date,
                 "end_date": round_obj.end_date,
                 "finish": round_obj.finish,
+                "virtual": False,
                 "games": games_data
             })
 
-        return Response(round_results, status=status.HTTP_200_OK)
+        # The rounds of a lazy round robin that are not open yet are built
+        # from the seed order, without games on the database
+        schedule = lazy_schedule(tournament)[len(round_results):]
+        players = Player.objects.in_bulk(tournament.seed_order or [])
+        for number, round_data in enumerate(schedule, len(round_results) + 1):
+            round_results.append({
+                "id": None,
+                "name": f"Round {number}",
+                "start_date": None,
+                "end_date": None,
+                "finish": False,
+                "virtual": True,
+                "games": [
+                    {
+                        "id": None,
+                        "finished": False,
+                        "start_date": None,
+                        "update_date": None,
+                        "result": Scores.NOAVAILABLE if black is not None
+                        else tournament.bye_score,
+                        "rankingOrder": 0,
+                        **game_players(players.get(white), players.get(black)),
+                        "round": None,
+                    }
+                    for white, black in round_data
+                ]
+            })
+
+        return round_results
+
+
+def game_players(white, black):
+    # Names, emails and lichess usernames of the players of a game
+    return {
+        "white_player_name": white.name if white else "Unknown",
+        "white_player_email": white.email if white else "Unknown",
+        "black_player_name": black.name if black else "Unknown",
+        "black_player_email": black.email if black else "Unknown",
+        "white_lichess_username": white.lichess_username
+        if white else "Unknown",
+        "black_lichess_username": black.lichess_username
+        if black else "Unknown",
+    }
 
 
 class UpdateLichessGameAPIView(APIView):
@@ -371,7 +669,10 @@ class UpdateLichessGameAPIView(APIView):
         game.result = game_result
 
         game.finished = True
-        game.save()
+        with transaction.atomic():
+            version = current_version(game.round.tournament, lock=True)
+            game.save()
+            update_standings(game, version)
         return Response(
             {
                 "result": True,
@@ -381,6 +682,64 @@ class UpdateLichessGameAPIView(APIView):
         )
 
 
+class UpdateLichessGamesAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # Get the round
+        round_id = request.data.get("round_id")
+        if not round_id:
+            return Response(
+                {"result": False, "message": "round_id is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        round = Round.objects.filter(id=round_id).first()
+        if not round:
+            return Response(
+                {"result": False, "message": "Round does not exist"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Check if the user is an administrative user
+        tournament = round.tournament
+        if (tournament.administrativeUser or tournament.only_administrative) \
+                and not request.user == tournament.administrativeUser:
+            return Response(
+                {
+                    "result": False,
+                    "message": "Only the user that create"
+                               " the tournament can update it",
+                },
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        # Get the lichess game ids, a list or a comma separated string
+        serializer = LichessGamesSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"result": False, "message": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        lichess_game_ids = serializer.validated_data["lichess_game_ids"]
+
+        try:
+            games, errors = import_lichess_results(round, lichess_game_ids)
+        except LichessAPIError as e:
+            return Response(
+                {"result": False, "message": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                "result": True,
+                "games": games,
+                "errors": errors,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 class UpdateOTBGameAPIView(APIView):
     permission_classes = []
     authentication_classes = []
@@ -436,7 +795,10 @@ class UpdateOTBGameAPIView(APIView):
         # Update the game
         game.result = otb_result
         game.finished = True
-        game.save()
+        with transaction.atomic():
+            version = current_version(game.round.tournament, lock=True)
+            game.save()
+            update_standings(game, version)
         return Response(
             {"result": True, "message": "Game updated by player"},
             status=status.HTTP_200_OK,
@@ -491,7 +853,10 @@ class AdminUpdateGameAPIView(APIView):
         # Update the game
         game.result = otb_result
         game.finished = True
-        game.save()
+        with transaction.atomic():
+            version = current_version(game.round.tournament, lock=True)
+            game.save()
+            update_standings(game, version)
         return Response(
             {"result": True, "message": "Game updated by administrator"},
             status=status.HTTP_200_OK,
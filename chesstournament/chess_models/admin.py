@@ -1,8 +1,12 @@
 from django.contrib import admin
-from .models import Game, Player, Round, Tournament, Referee
+from .models import Game, Player, Round, Tournament, Referee, Season
+from .models import TournamentJob, LichessGameResult
 
 admin.site.register(Game)
 admin.site.register(Player)
 admin.site.register(Round)
 admin.site.register(Tournament)
 admin.site.register(Referee)
+admin.site.register(Season)
+admin.site.register(TournamentJob)
+admin.site.register(LichessGameResult)
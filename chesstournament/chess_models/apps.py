@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ChessModelsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chess_models'
+
+    def ready(self):
+        # Connect the signals that change the tournament versions
+        from . import signals # noqa F401
@@ -0,0 +1,71 @@
+from django.db import models
+
+from .models import (JobStatus, Player, Tournament, create_rounds,
+                     job_data)
+from .serializers import TournamentSerializer
+
+# Share of the progress taken by the players import, the rest is for the
+# rounds
+PLAYERS_PROGRESS = 80
+
+
+def run_job(job):
+    # Create the tournament of a claimed job, its players and its rounds,
+    # the same as TournamentCreateAPIView does on the request. The steps
+    # are not wrapped in a transaction, so the progress is seen at once
+    # and no transaction is kept open during the Lichess requests. What a
+    # failed job (or the dead worker of a job taken again) created is
+    # deleted instead
+    def players_progress(done, total):
+        job.set_progress(PLAYERS_PROGRESS * done // max(total, 1))
+
+    def created(tournament):
+        job.set_progress(job.progress, tournament=tournament)
+
+    if job.tournament_id is not None:
+        remove_job_tournament(job)
+    serializer = TournamentSerializer(
+        data=job_data(job.data),
+        context={"progress": players_progress, "created": created},
+    )
+    try:
+        if not serializer.is_valid():
+            raise ValueError(serializer.errors)
+        tournament = serializer.save()
+        job.set_progress(PLAYERS_PROGRESS)
+
+        create_rounds(tournament)
+        tournament.administrativeUser = job.user
+        tournament.save()
+    except Exception as e:
+        remove_job_tournament(job)
+        job.set_progress(
+            job.progress, status=JobStatus.FAILED, error=str(e),
+            tournament=None,
+        )
+        return job
+
+    job.set_progress(100, status=JobStatus.DONE)
+    return job
+
+
+def remove_job_tournament(job):
+    # Delete the tournament of the job, with its rounds and games, and the
+    # players of its file created since the job was queued that are not in
+    # any tournament
+    if job.tournament_id is not None:
+        Tournament.objects.filter(id=job.tournament_id).delete()
+    job.tournament = None
+
+    players = job_data(job.data).get("players") or ""
+    named = models.Q(pk__in=[])
+    for row in players.split("\n")[1:]:
+        columns = [column.strip() for column in row.split(",")]
+        if len(columns) == 1 and columns[0]:
+            named |= models.Q(lichess_username=columns[0])
+        elif len(columns) == 2:
+            named |= models.Q(name=columns[0], email=columns[1])
+    Player.objects.filter(
+        named, creation_date__gte=job.creation_date,
+        tournamentplayers__isnull=True,
+    ).delete()
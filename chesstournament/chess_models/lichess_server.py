@@ -0,0 +1,228 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import json
+import random
+import threading
+import time
+
+# Users and games served by default, the players and games used by the
+# tests and the populate commands. Made up until they are recorded from
+# Lichess with lichess_server --record
+FIXTURES = Path(__file__).resolve().parent / "lichess_fixtures.json"
+
+# Length of the Lichess game ids, the longer ids have the player suffix
+GAME_ID_LENGTH = 8
+
+
+class LichessStandIn(ThreadingHTTPServer):
+    """
+    Local HTTP server that answers like the Lichess API from fixed data:
+    GET /api/user/{name}, POST /api/users, GET /api/game/{id},
+    POST /api/games/export/_ids and GET /api/games/user/{name}.
+
+    Every request waits latency seconds plus a random jitter, then fails
+    with a 500 with probability error_rate or with a 429 (Retry-After
+    retry_after) with probability rate_limit_rate. The draws only depend on
+    the seed, the request and how many times it was sent before, so a run
+    gives the same responses whatever the order of the concurrent requests.
+    """
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), fixtures=FIXTURES,
+                 latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1, seed=0):
+        super().__init__(address, LichessHandler)
+        self.users = {}
+        self.games = {}
+        if fixtures is not None:
+            with open(fixtures) as f:
+                data = json.load(f)
+            for user in data["users"]:
+                self.add_user(user)
+            for game in data["games"]:
+                self.add_game(game)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.seed = seed
+
+        self.lock = threading.Lock()
+        self.sent = {}
+        self.statuses = {}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_user(self, user):
+        self.users[user["id"].lower()] = user
+
+    def add_game(self, game):
+        self.games[game["id"][:GAME_ID_LENGTH]] = game
+
+    def start(self):
+        # Serve on a daemon thread, the tests and benchmarks use it this way
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def draw(self, key):
+        # Seconds to wait and status of the failure (None if the request is
+        # answered) of the nth time the request key is sent
+        with self.lock:
+            n = self.sent.get(key, 0)
+            self.sent[key] = n + 1
+        rng = random.Random(f"{self.seed}:{key}:{n}")
+        delay = self.latency + rng.uniform(0, self.jitter)
+        fault = rng.random()
+        if fault < self.error_rate:
+            return delay, 500
+        if fault < self.error_rate + self.rate_limit_rate:
+            return delay, 429
+        return delay, None
+
+    def count(self, status):
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def user_games(self, username, since=None, until=None, vs=None,
+                   color=None, limit=None, ongoing=False, finished=True):
+        # Games of the user, the newest first, as /api/games/user filters
+        # them
+        username = username.lower()
+        games = []
+        for game in self.games.values():
+            white, black = (
+                game["players"][side].get("user", {}).get("id")
+                for side in ["white", "black"]
+            )
+            if username not in (white, black):
+                continue
+            if vs is not None and vs.lower() not in (white, black):
+                continue
+            if color is not None and username != \
+                    {"white": white, "black": black}.get(color):
+                continue
+            playing = game.get("status") in ["created", "started"]
+            if not (ongoing if playing else finished):
+                continue
+            if since is not None and game["createdAt"] < since:
+                continue
+            if until is not None and game["createdAt"] > until:
+                continue
+            games.append(game)
+        games.sort(key=lambda game: game["createdAt"], reverse=True)
+        return games if limit is None else games[:limit]
+
+
+def game_data(game):
+    # The export data of a game in the format of /api/game/{id}, the players
+    # are given by userId
+    players = {
+        side: {
+            "userId": player.get("user", {}).get("id", ""),
+            "rating": player.get("rating"),
+        }
+        for side, player in game["players"].items()
+    }
+    return {**game, "players": players}
+
+
+class LichessHandler(BaseHTTPRequestHandler):
+    # Routes the requests of the stand-in to the data of the server. The
+    # headers and the body are written apart, Nagle would delay the body
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.answer("GET", b"")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.answer("POST", self.rfile.read(length))
+
+    def answer(self, method, body):
+        server = self.server
+        url = urlsplit(self.path)
+        delay, fault = server.draw(f"{method} {self.path} {body.decode()}")
+        time.sleep(delay)
+        if fault is not None:
+            headers = {"Retry-After": str(server.retry_after)} \
+                if fault == 429 else {}
+            return self.send(fault, {"error": "Stand-in failure"}, headers)
+
+        params = {
+            key: values[-1] for key, values in parse_qs(url.query).items()
+        }
+        names = [
+            name.strip() for name in body.decode().split(",") if name.strip()
+        ]
+        parts = url.path.strip("/").split("/")
+
+        if method == "GET" and parts[:2] == ["api", "user"] \
+                and len(parts) == 3:
+            user = server.users.get(parts[2].lower())
+            if user is None:
+                return self.send(404, {"error": "Not found"})
+            return self.send(200, user)
+
+        if method == "POST" and parts == ["api", "users"]:
+            return self.send(200, [
+                server.users[name.lower()] for name in names
+                if name.lower() in server.users
+            ])
+
+        if method == "GET" and parts[:2] == ["api", "game"] \
+                and len(parts) == 3:
+            game = server.games.get(parts[2][:GAME_ID_LENGTH])
+            if game is None:
+                return self.send(404, {"error": "Not found"})
+            return self.send(200, game_data(game))
+
+        if method == "POST" and parts == ["api", "games", "export", "_ids"]:
+            games = [server.games.get(name[:GAME_ID_LENGTH])
+                     for name in names]
+            return self.send_ndjson([game for game in games if game])
+
+        if method == "GET" and parts[:3] == ["api", "games", "user"] \
+                and len(parts) == 4:
+            def number(key):
+                return int(params[key]) if key in params else None
+
+            return self.send_ndjson(server.user_games(
+                parts[3], since=number("since"), until=number("until"),
+                vs=params.get("vs"), color=params.get("color"),
+                limit=number("max"),
+                ongoing=params.get("ongoing") == "true",
+                finished=params.get("finished", "true") == "true",
+            ))
+
+        return self.send(404, {"error": "Not found"})
+
+    def send(self, status, data, headers=None):
+        self.write(status, json.dumps(data).encode(), "application/json",
+                   headers)
+
+    def send_ndjson(self, rows):
+        body = "".join(json.dumps(row) + "\n" for row in rows).encode()
+        self.write(200, body, "application/x-ndjson")
+
+    def write(self, status, body, content_type, headers=None):
+        self.server.count(status)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,211 @@
+# This command measures how the ranking, the pairings, the round results
+# and the tournament import scale with the number of players.
+# Synthetic tournaments are built with bulk inserts inside a transaction
+# that is rolled back at the end, so the database is left as it was
+import json
+import random
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory
+
+from chess_models.models import (Tournament, TournamentPlayers, Player,
+                                 Round, Game, Scores, RankingSystem,
+                                 RANKING_BACKENDS, create_rounds)
+from chess_models.models import (TournamentType, TournamentSpeed,
+                                 TournamentBoardType)
+from chess_models.serializers import TournamentSerializer
+from api.views import GetRoundResults
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    # Count every query run on the connection, CaptureQueriesContext only
+    # keeps the last 9000
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    # Help text displayed when running `python manage.py help bench`
+    help = """measure wall time, queries and peak memory of the hot paths
+           on synthetic tournaments of several sizes
+           """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[10, 100, 1000],
+            help="number of players of each synthetic tournament")
+        parser.add_argument(
+            "--rounds", type=int, default=9,
+            help="rounds played on the synthetic tournaments")
+        parser.add_argument(
+            "--round-robin-limit", type=int, default=200,
+            help="largest tournament used to measure create_rounds, a "
+                 "round robin has n * (n - 1) / 2 games")
+        parser.add_argument(
+            "--seed", type=int, default=0,
+            help="seed of the random pairings and results")
+        parser.add_argument(
+            "--output", default=None,
+            help="JSON file for the results, printed if not given")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        results = []
+        for size in options["sizes"]:
+            results += self.bench_size(
+                size, options["rounds"], options["round_robin_limit"])
+
+        report = json.dumps({
+            "database": connection.vendor,
+            "rounds": options["rounds"],
+            "seed": options["seed"],
+            "results": results,
+        }, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(report + "\n")
+        else:
+            self.stdout.write(report)
+
+    def bench_size(self, size, rounds, round_robin_limit):
+        results = []
+        try:
+            with transaction.atomic():
+                tournament = self.create_tournament(size, rounds)
+
+                for name, backend in RANKING_BACKENDS.items():
+                    results.append(self.measure(
+                        f"getRanking[{name}]", size, backend, tournament))
+
+                factory = APIRequestFactory()
+                request = factory.get(f"/get_round_results/{tournament.id}/")
+                results.append(self.measure(
+                    "GetRoundResults", size, GetRoundResults.as_view(),
+                    request, tournament_id=tournament.id))
+
+                if size <= round_robin_limit:
+                    round_robin = self.create_tournament(size, 0)
+                    results.append(self.measure(
+                        "create_rounds", size, create_rounds, round_robin))
+
+                results.append(self.measure(
+                    "TournamentSerializer", size, self.import_csv, size))
+
+                # Leave the database as it was
+                raise Rollback()
+        except Rollback:
+            pass
+
+        return results
+
+    def measure(self, name, size, function, *args, **kwargs):
+        # Time and queries are measured first and the peak memory on a
+        # second run, tracemalloc slows down the code it traces. Both runs
+        # are rolled back so they start from the same data
+        seconds, queries = self.run(function, args, kwargs, trace=False)
+        peak, _ = self.run(function, args, kwargs, trace=True)
+
+        self.stderr.write(f"{name:<24} {size:>6} players "
+                          f"{seconds:>9.3f} s {queries:>7} queries")
+        return {
+            "name": name,
+            "players": size,
+            "seconds": seconds,
+            "queries": queries,
+            "peak_memory": peak,
+        }
+
+    def run(self, function, args, kwargs, trace):
+        counter = QueryCounter()
+        cache.clear()
+        try:
+            with transaction.atomic(), connection.execute_wrapper(counter):
+                if trace:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                function(*args, **kwargs)
+                seconds = time.perf_counter() - start
+                if trace:
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                raise Rollback()
+        except Rollback:
+            pass
+
+        return (peak if trace else seconds), counter.count
+
+    def create_tournament(self, size, rounds):
+        # Tournament with random pairings and results on every round
+        tournament = Tournament.objects.create(
+            name=f"bench_{size}_{rounds}_{time.time_ns()}",
+            tournament_type=TournamentType.SWISS
+            if rounds else TournamentType.ROUNDROBIN,
+            tournament_speed=TournamentSpeed.CLASSICAL,
+            board_type=TournamentBoardType.OTB,
+        )
+        for value in [RankingSystem.WINS, RankingSystem.BUCHHOLZ]:
+            tournament.addToRankingList(value.value)
+
+        players = Player.objects.bulk_create([
+            Player(name=f"{tournament.name}_{i}",
+                   email=f"player_{i}@example.com",
+                   fide_rating_classical=self.random.randint(1000, 2800))
+            for i in range(size)
+        ])
+        TournamentPlayers.objects.bulk_create([
+            TournamentPlayers(tournament=tournament, player=player)
+            for player in players
+        ])
+
+        round_list = Round.objects.bulk_create([
+            Round(name=f"round_{i + 1:03d}", tournament=tournament)
+            for i in range(rounds)
+        ])
+        results = [Scores.WHITE, Scores.BLACK, Scores.DRAW]
+        games = []
+        for round in round_list:
+            order = players[:]
+            self.random.shuffle(order)
+            for white, black in zip(order[::2], order[1::2]):
+                games.append(Game(
+                    white=white, black=black, round=round, finished=True,
+                    result=self.random.choice(results)))
+
+            # Odd number of players, the last one gets a bye
+            if len(order) % 2:
+                games.append(Game(
+                    white=order[-1], black=None, round=round,
+                    finished=True, result=Scores.BYE_U))
+        Game.objects.bulk_create(games)
+
+        return tournament
+
+    def import_csv(self, size):
+        # Tournament created from a CSV list of players, as the API does
+        name = f"bench_csv_{size}_{time.time_ns()}"
+        players = "\n".join(
+            ["name,email"]
+            + [f"{name}_{i},player_{i}@example.com" for i in range(size)]
+        )
+        serializer = TournamentSerializer(data={
+            "name": name,
+            "tournament_type": TournamentType.ROUNDROBIN,
+            "tournament_speed": TournamentSpeed.CLASSICAL,
+            "board_type": TournamentBoardType.OTB,
+            "players": players,
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
@@ -0,0 +1,96 @@
+# This command measures the Lichess integration against the local stand-in
+# of the Lichess API, with the latency, errors and rate limits asked for.
+# The same seed gives the same faults on every run, so the clients can be
+# compared offline and deterministically
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from chess_models.lichess_server import LichessStandIn
+from chess_models.models import LichessClient, run_lichess
+from chess_models.models.lichess import export_games
+
+
+class Command(BaseCommand):
+    # Help text displayed when running `python manage.py help bench_lichess`
+    help = """measure the Lichess clients against a local Lichess stand-in
+           with injected latency, errors and rate limits
+           """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=64,
+            help="synthetic users looked up")
+        parser.add_argument("--latency", type=float, default=0.05)
+        parser.add_argument("--jitter", type=float, default=0)
+        parser.add_argument("--error-rate", type=float, default=0)
+        parser.add_argument("--rate-limit", type=float, default=0)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--concurrency", type=int, default=None,
+            help="requests in flight of the asyncio client")
+        parser.add_argument(
+            "--output", default=None,
+            help="write the results as JSON to this file")
+
+    def handle(self, *args, **options):
+        server = LichessStandIn(
+            latency=options["latency"], jitter=options["jitter"],
+            error_rate=options["error_rate"],
+            rate_limit_rate=options["rate_limit"], retry_after=0,
+            seed=options["seed"],
+        ).start()
+        usernames = [f"bench{i}" for i in range(options["users"])]
+        for i, username in enumerate(usernames):
+            server.add_user({"id": username, "username": username, "perfs": {
+                "blitz": {"rating": 1500 + i}}})
+        game_ids = list(server.games)
+
+        def sequential():
+            client = LichessClient(base_url=server.url, backoff=0)
+            for username in usernames:
+                client.get(f"/api/user/{username}")
+            client.close()
+
+        def concurrent():
+            async def work(client):
+                await asyncio.gather(*[
+                    client.fetch_user(username) for username in usernames
+                ])
+            run_lichess(work, base_url=server.url, backoff=0,
+                        concurrency=options["concurrency"])
+
+        def bulk():
+            run_lichess(lambda client: client.fetch_users(usernames),
+                        base_url=server.url, backoff=0)
+
+        def export():
+            client = LichessClient(base_url=server.url, backoff=0)
+            list(export_games(game_ids, client))
+            client.close()
+
+        results = []
+        try:
+            for name, run in [("users one by one", sequential),
+                              ("users concurrently", concurrent),
+                              ("users in bulk", bulk),
+                              ("games export", export)]:
+                server.statuses = {}
+                start = time.perf_counter()
+                run()
+                results.append({
+                    "name": name,
+                    "seconds": time.perf_counter() - start,
+                    "statuses": dict(sorted(server.statuses.items())),
+                })
+                self.stdout.write(
+                    f"{name:20} {results[-1]['seconds']:8.3f}s "
+                    f"statuses {results[-1]['statuses']}")
+        finally:
+            server.stop()
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
@@ -0,0 +1,184 @@
+# This command measures the swiss pairing engine. Every round of the given
+# TRF files is paired again from the results of the previous rounds and
+# compared with the pairing that was actually played, and a synthetic open
+# is paired round by round to see how the engine scales.
+# Everything runs inside a transaction that is rolled back at the end, so
+# the database is left as it was
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from chess_models.models import (Tournament, TournamentPlayers, Player,
+                                 Round, Game, Scores, RankingSystem,
+                                 SwissPairing, create_rounds)
+from chess_models.models import (TournamentType, TournamentSpeed,
+                                 TournamentBoardType)
+from chess_models.models.tournament import bump_version
+from chess_models.management.commands.populate import (
+    Command as PopulateCommand)
+
+TRF_DIR = "chess_models/management/commands"
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    # Help text displayed when running `python manage.py help bench_swiss`
+    help = """pair again the rounds of TRF files and a synthetic open with
+           the swiss pairing engine, measuring the time of each round
+           """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--files", nargs="*",
+            default=[f"{TRF_DIR}/tie-breaking-swiss.trf",
+                     f"{TRF_DIR}/real.trf"],
+            help="TRF files of swiss tournaments")
+        parser.add_argument(
+            "--players", type=int, default=1000,
+            help="players of the synthetic open, 0 to skip it")
+        parser.add_argument(
+            "--rounds", type=int, default=9,
+            help="rounds paired on the synthetic open")
+        parser.add_argument(
+            "--seed", type=int, default=0,
+            help="seed of the ratings and results of the synthetic open")
+        parser.add_argument(
+            "--output", default=None,
+            help="JSON file for the results, printed if not given")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        results = []
+        try:
+            with transaction.atomic():
+                for filename in options["files"]:
+                    results.append(self.bench_trf(filename))
+                if options["players"]:
+                    results.append(self.bench_open(
+                        options["players"], options["rounds"]))
+
+                # Leave the database as it was
+                raise Rollback()
+        except Rollback:
+            pass
+
+        report = json.dumps({
+            "database": connection.vendor,
+            "seed": options["seed"],
+            "results": results,
+        }, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(report + "\n")
+        else:
+            self.stdout.write(report)
+
+    def bench_trf(self, filename):
+        # Pair every round from the results of the previous ones and count
+        # the pairs that are the same as the ones of the file
+        populate = PopulateCommand()
+        populate.cleanDataBase()
+        populate.readInputFile(filename)
+        populate.insertData()
+        tournament = Tournament.objects.get(name=populate.tour.name)
+        rounds = list(tournament.round_set.order_by("id"))
+
+        stats = []
+        for number, round in enumerate(rounds[1:], 2):
+            games = list(Game.objects.filter(round=round))
+            played = {
+                frozenset([game.white_id, game.black_id]) for game in games
+                if game.black_id is not None
+            }
+            byes = [
+                game.white_id for game in games if game.black_id is None
+                and game.result in [Scores.BYE_H, Scores.BYE_Z]
+            ]
+
+            try:
+                with transaction.atomic():
+                    Game.objects.filter(
+                        round__tournament=tournament, round__id__gte=round.id
+                    ).delete()
+                    start = time.perf_counter()
+                    _, _, pairs = SwissPairing(tournament, byes).pair()
+                    seconds = time.perf_counter() - start
+                    raise Rollback()
+            except Rollback:
+                pass
+
+            same = sum(frozenset(pair) in played for pair in pairs)
+            stats.append({
+                "round": number,
+                "seconds": seconds,
+                "pairs": len(pairs),
+                "same_pairs": same,
+            })
+            self.stderr.write(f"{tournament.name[:24]:<24} round {number:>3} "
+                              f"{seconds:>9.3f} s {same:>4}/{len(pairs)} "
+                              "same pairs")
+
+        return {
+            "name": filename,
+            "players": tournament.getPlayersCount(),
+            "rounds": stats,
+        }
+
+    def bench_open(self, size, rounds):
+        # Pair a synthetic open round by round with random results
+        tournament = Tournament.objects.create(
+            name=f"bench_swiss_{size}_{time.time_ns()}",
+            tournament_type=TournamentType.SWISS,
+            tournament_speed=TournamentSpeed.CLASSICAL,
+            board_type=TournamentBoardType.OTB,
+        )
+        tournament.addToRankingList(RankingSystem.BUCHHOLZ.value)
+
+        players = Player.objects.bulk_create([
+            Player(name=f"{tournament.name}_{i}",
+                   email=f"player_{i}@example.com",
+                   fide_rating_classical=self.random.randint(1000, 2800))
+            for i in range(size)
+        ])
+        TournamentPlayers.objects.bulk_create([
+            TournamentPlayers(tournament=tournament, player=player)
+            for player in players
+        ])
+
+        results = [Scores.WHITE, Scores.BLACK, Scores.DRAW]
+        stats = []
+        for number in range(1, rounds + 1):
+            start = time.perf_counter()
+            create_rounds(tournament)
+            seconds = time.perf_counter() - start
+
+            games = list(Game.objects.filter(
+                round=Round.objects.get(
+                    tournament=tournament, name=f"round_{number:03d}"),
+                black__isnull=False,
+            ))
+            for game in games:
+                game.result = self.random.choice(results)
+                game.finished = True
+            Game.objects.bulk_update(games, ["result", "finished"])
+            Game.objects.filter(
+                round__tournament=tournament, black__isnull=True
+            ).update(finished=True)
+            bump_version(pk=tournament.pk)
+
+            stats.append({"round": number, "seconds": seconds})
+            self.stderr.write(f"{'synthetic open':<24} round {number:>3} "
+                              f"{seconds:>9.3f} s {size:>6} players")
+
+        return {
+            "name": "synthetic open",
+            "players": size,
+            "rounds": stats,
+        }
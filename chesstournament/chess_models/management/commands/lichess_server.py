@@ -0,0 +1,114 @@
+# This command runs a local stand-in of the Lichess API that serves the
+# users and games of lichess_fixtures.json, with the latency, errors and
+# rate limits asked for. Start the server with
+# LICHESS_URL=http://127.0.0.1:<port> to run the tests or the benchmarks
+# offline. With --record it fetches again from Lichess the users and games
+# of the fixtures, and the ones given with --add-user and --add-game, and
+# writes them back
+import json
+
+from django.core.management.base import BaseCommand
+
+from chess_models.lichess_server import (FIXTURES, GAME_ID_LENGTH,
+                                         LichessStandIn)
+from chess_models.models import LichessClient, run_lichess
+from chess_models.models.lichess import export_games
+
+
+class Command(BaseCommand):
+    # Help text displayed when running `python manage.py help
+    # lichess_server`
+    help = """serve the Lichess users and games of the fixtures on a local
+           Lichess compatible server
+           """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--fixtures", default=str(FIXTURES),
+            help="JSON file with the users and games served")
+        parser.add_argument(
+            "--latency", type=float, default=0,
+            help="seconds each request waits")
+        parser.add_argument(
+            "--jitter", type=float, default=0,
+            help="largest random seconds added to the latency")
+        parser.add_argument(
+            "--error-rate", type=float, default=0,
+            help="fraction of the requests answered with a 500")
+        parser.add_argument(
+            "--rate-limit", type=float, default=0,
+            help="fraction of the requests answered with a 429")
+        parser.add_argument(
+            "--retry-after", type=int, default=1,
+            help="Retry-After of the 429 responses")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--record", default=None, metavar="URL",
+            help="fetch the users and games of the fixtures from this "
+                 "Lichess and write them back instead of serving them")
+        parser.add_argument(
+            "--add-user", action="append", default=[], metavar="NAME",
+            help="user recorded with --record even if it is not in the "
+                 "fixtures")
+        parser.add_argument(
+            "--add-game", action="append", default=[], metavar="ID",
+            help="game recorded with --record even if it is not in the "
+                 "fixtures")
+
+    def handle(self, *args, **options):
+        if options["record"]:
+            return self.record(options["fixtures"], options["record"],
+                               options["add_user"], options["add_game"])
+
+        server = LichessStandIn(
+            ("127.0.0.1", options["port"]), fixtures=options["fixtures"],
+            latency=options["latency"], jitter=options["jitter"],
+            error_rate=options["error_rate"],
+            rate_limit_rate=options["rate_limit"],
+            retry_after=options["retry_after"], seed=options["seed"],
+        )
+        self.stdout.write(
+            f"{len(server.users)} users and {len(server.games)} games, "
+            f"LICHESS_URL={server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def record(self, fixtures, url, new_users=(), new_games=()):
+        with open(fixtures) as f:
+            data = json.load(f)
+        usernames = [user["username"] for user in data["users"]]
+        game_ids = [game["id"] for game in data["games"]]
+        known_users = {username.lower() for username in usernames}
+        known_games = {game_id[:GAME_ID_LENGTH] for game_id in game_ids}
+        usernames += [
+            username for username in new_users
+            if username.lower() not in known_users
+        ]
+        game_ids += [
+            game_id[:GAME_ID_LENGTH] for game_id in new_games
+            if game_id[:GAME_ID_LENGTH] not in known_games
+        ]
+
+        users = run_lichess(
+            lambda client: client.fetch_users(usernames), base_url=url)
+        client = LichessClient(base_url=url)
+        games = {game["id"]: game for game in export_games(game_ids, client)}
+        client.close()
+
+        recorded = f"recorded {len(users)} users and {len(games)} games"
+        # The users and games Lichess does not know any more are kept, the
+        # new ones are added if Lichess knows them
+        data["users"] = [
+            users.pop(user["id"], user) for user in data["users"]
+        ] + list(users.values())
+        data["games"] = [
+            games.pop(game["id"], game) for game in data["games"]
+        ] + list(games.values())
+        with open(fixtures, "w") as f:
+            json.dump(data, f, indent=1)
+        self.stdout.write(recorded)
@@ -0,0 +1,58 @@
+# This command recomputes the season leaderboards. Every season is
+# computed on a process of a pool and the results are stored by the
+# main process, one transaction per season
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from chess_models.models import Season, compute_season, store_season
+
+
+def setup_worker():
+    # Processes started with spawn need Django to be configured again
+    django.setup()
+
+
+class Command(BaseCommand):
+    # Help text displayed when running `python manage.py help
+    # recompute_seasons`
+    help = """recompute the season leaderboards in parallel
+           """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "seasons", type=int, nargs="*",
+            help="ids of the seasons to recompute, all if not given")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count(),
+            help="size of the process pool, 0 computes every season on "
+                 "this process")
+
+    def handle(self, *args, **options):
+        seasons = Season.objects.all()
+        if options["seasons"]:
+            seasons = seasons.filter(id__in=options["seasons"])
+        season_ids = list(seasons.values_list("id", flat=True))
+
+        if options["workers"] == 0:
+            results = map(compute_season, season_ids)
+        else:
+            # The workers open their own connections, the ones of this
+            # process must not be shared with them
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                max_workers=options["workers"], initializer=setup_worker
+            )
+            results = pool.map(compute_season, season_ids)
+
+        try:
+            for season_id, totals in zip(season_ids, results):
+                standings = store_season(season_id, totals)
+                self.stdout.write(
+                    f"season {season_id}: {len(standings)} players")
+        finally:
+            if options["workers"] != 0:
+                pool.shutdown()
@@ -0,0 +1,48 @@
+# This command refreshes the Lichess ratings of the players of the
+# unfinished tournaments whose data is older than the max_update_time of
+# their tournaments. The users are fetched in bulk batches and each batch
+# is written with one bulk_update. With --every it keeps running as a
+# periodic worker
+import time
+
+from django.core.management.base import BaseCommand
+
+from chess_models.models.player import (stale_lichess_players,
+                                        refresh_lichess_players)
+from chess_models.models.lichess import USERS_BATCH
+
+
+class Command(BaseCommand):
+    # Help text displayed when running `python manage.py help
+    # refresh_ratings`
+    help = """refresh the stale Lichess ratings of the players of the
+           unfinished tournaments
+           """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch", type=int, default=USERS_BATCH,
+            help="users fetched on each request")
+        parser.add_argument(
+            "--every", type=float, default=0,
+            help="seconds between refreshes, 0 refreshes once")
+
+    def handle(self, *args, **options):
+        while True:
+            self.refresh(options["batch"])
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
+
+    def refresh(self, batch_size):
+        players = stale_lichess_players()
+        total = changed = 0
+        for batch, batch_changed in refresh_lichess_players(
+                players, batch_size):
+            total += len(batch)
+            changed += len(batch_changed)
+            self.stdout.write(
+                f"{len(batch)} players fetched, "
+                f"{len(batch_changed)} ratings changed")
+        self.stdout.write(
+            f"refreshed {total} players, {changed} ratings changed")
@@ -0,0 +1,64 @@
+# This command is the worker of the tournament creation jobs. The queued
+# jobs are taken from the database one by one and their tournaments are
+# created, several jobs can run at once on a thread pool since most of the
+# time goes on the Lichess requests of the players
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from chess_models.models import claim_job
+from chess_models.jobs import run_job
+
+
+class Command(BaseCommand):
+    # Help text displayed when running `python manage.py help run_jobs`
+    help = """run the queued tournament creation jobs, waiting for new
+           ones unless --once is given
+           """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="stop when the queue is empty")
+        parser.add_argument(
+            "--poll", type=float, default=2.0,
+            help="seconds between looks at an empty queue")
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="size of the thread pool, 0 runs the jobs on this thread")
+
+    def handle(self, *args, **options):
+        if options["workers"] == 0:
+            self.work(options["once"], options["poll"])
+            return
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            workers = [
+                pool.submit(self.work_on_thread, options["once"],
+                            options["poll"])
+                for _ in range(options["workers"])
+            ]
+            for worker in workers:
+                worker.result()
+
+    def work_on_thread(self, once, poll):
+        # Every thread has its own connection, closed when it ends
+        try:
+            self.work(once, poll)
+        finally:
+            connection.close()
+
+    def work(self, once, poll):
+        while True:
+            job = claim_job()
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll)
+                continue
+
+            run_job(job)
+            self.stdout.write(
+                f"{job}: {job.get_status_display()} {job.error}".strip())
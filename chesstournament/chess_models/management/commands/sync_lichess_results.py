@@ -0,0 +1,49 @@
+# This command fills in the results of the open games of every round of the
+# unfinished Lichess tournaments. The games of each white player are asked
+# to Lichess once per run, and only the ones started since the last sync of
+# the tournament, so the cost of a poll grows with the players still
+# playing and the new games, not with the games of the tournament. With
+# --every it keeps running as a periodic worker
+import time
+
+from django.core.management.base import BaseCommand
+
+from chess_models.models import TournamentBoardType, LichessAPIError
+from chess_models.models.game import discover_lichess_results
+from chess_models.models.tournament import unfinished_tournaments
+
+
+class Command(BaseCommand):
+    # Help text displayed when running `python manage.py help
+    # sync_lichess_results`
+    help = """find on Lichess the results of the open games of the
+           unfinished Lichess tournaments
+           """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--every", type=float, default=0,
+            help="seconds between syncs, 0 syncs once")
+
+    def handle(self, *args, **options):
+        while True:
+            self.sync()
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
+
+    def sync(self):
+        total = 0
+        for tournament in unfinished_tournaments().filter(
+                board_type=TournamentBoardType.LICHESS).order_by("id"):
+            # A failing tournament does not stop the others
+            try:
+                imported = discover_lichess_results(tournament)
+            except LichessAPIError as e:
+                self.stderr.write(f"{tournament.name}: {e}")
+                continue
+            total += len(imported)
+            if imported:
+                self.stdout.write(
+                    f"{tournament.name}: {len(imported)} results found")
+        self.stdout.write(f"synced, {total} results found")
@@ -0,0 +1,235 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:41
+
+import chess_models.models.tournament
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Game',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('finished', models.BooleanField(default=False)),
+                ('start_date', models.DateTimeField(auto_now_add=True)),
+                ('update_date', models.DateTimeField(auto_now=True)),
+                ('result', models.CharField(default='*', max_length=1)),
+                ('rankingOrder', models.IntegerField(default=0, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LichessGameResult',
+            fields=[
+                ('id', models.CharField(max_length=8, primary_key=True, serialize=False)),
+                ('result', models.CharField(max_length=1)),
+                ('white', models.CharField(max_length=150)),
+                ('black', models.CharField(max_length=150)),
+                ('status', models.CharField(max_length=32)),
+                ('fetch_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Player',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, max_length=256, null=True)),
+                ('email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('country', models.CharField(blank=True, max_length=2, null=True)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('update_date', models.DateTimeField(auto_now=True)),
+                ('lichess_username', models.CharField(blank=True, max_length=150, null=True, unique=True)),
+                ('lichess_rating_bullet', models.IntegerField(default=0, null=True)),
+                ('lichess_rating_blitz', models.IntegerField(default=0, null=True)),
+                ('lichess_rating_rapid', models.IntegerField(default=0, null=True)),
+                ('lichess_rating_classical', models.IntegerField(default=0, null=True)),
+                ('lichess_fetch_date', models.DateTimeField(blank=True, null=True)),
+                ('fide_id', models.IntegerField(default=None, null=True, unique=True)),
+                ('fide_rating_blitz', models.IntegerField(default=0, null=True)),
+                ('fide_rating_rapid', models.IntegerField(default=0, null=True)),
+                ('fide_rating_classical', models.IntegerField(default=0, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RankingSystemClass',
+            fields=[
+                ('value', models.CharField(choices=[('BU', 'Buchholz'), ('BC', 'Buchholz Cut 1'), ('BA', 'Buchholz Average'), ('SB', 'Sonneborn-Berger'), ('PS', 'Plain Score'), ('WI', 'No. Wins'), ('BT', 'No. games played with Black')], max_length=2, primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Referee',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=128, null=True)),
+                ('refereeNumber', models.CharField(blank=True, default='-1', max_length=32, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Season',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128, unique=True)),
+                ('computed_date', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tournament',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=128, null=True, unique=True)),
+                ('start_date', models.DateField(auto_now=True, null=True)),
+                ('end_date', models.DateField(null=True)),
+                ('max_update_time', models.IntegerField(default=43200)),
+                ('only_administrative', models.BooleanField(default=False)),
+                ('tournament_type', models.CharField(choices=[('SR', 'Round Robin Simple'), ('DR', 'Round Robin Doble'), ('DD', 'Round Robin Doble (mismo día)'), ('SW', 'Sistema Suizo')], max_length=2)),
+                ('tournament_speed', models.CharField(choices=[('BU', 'Bullet'), ('BL', 'Blitz'), ('RA', 'Rápido'), ('CL', 'Clásico')], max_length=2)),
+                ('board_type', models.CharField(choices=[('LIC', 'lichess'), ('OTB', 'over the board')], max_length=3)),
+                ('win_points', models.FloatField(default=1.0)),
+                ('draw_points', models.FloatField(default=0.5)),
+                ('lose_points', models.FloatField(default=0.0)),
+                ('timeControl', models.CharField(default='15+0', max_length=32)),
+                ('number_of_rounds_for_swiss', models.IntegerField(default=0)),
+                ('bye_score', models.CharField(choices=[('F', 'Full point bye'), ('H', 'Half point bye'), ('U', 'Unpaired game point bye')], default='U', max_length=1)),
+                ('lazy_rounds', models.BooleanField(default=False)),
+                ('seed_order', models.JSONField(blank=True, null=True)),
+                ('lichess_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('version', models.BigIntegerField(default=chess_models.models.tournament.new_version)),
+                ('administrativeUser', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TournamentPlayers',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(auto_now=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chess_models.player')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chess_models.tournament')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TournamentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField()),
+                ('status', models.CharField(choices=[('QU', 'Queued'), ('RU', 'Running'), ('DO', 'Done'), ('FA', 'Failed')], default='QU', max_length=2)),
+                ('progress', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('update_date', models.DateTimeField(auto_now=True)),
+                ('tournament', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='chess_models.tournament')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='players',
+            field=models.ManyToManyField(blank=True, through='chess_models.TournamentPlayers', to='chess_models.player'),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='rankingList',
+            field=models.ManyToManyField(blank=True, to='chess_models.rankingsystemclass'),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='referee',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='chess_models.referee'),
+        ),
+        migrations.CreateModel(
+            name='SeasonStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.FloatField(default=0.0)),
+                ('wins', models.IntegerField(default=0)),
+                ('games', models.IntegerField(default=0)),
+                ('tournaments', models.IntegerField(default=0)),
+                ('rank', models.IntegerField(default=0)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chess_models.player')),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chess_models.season')),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.AddField(
+            model_name='season',
+            name='tournaments',
+            field=models.ManyToManyField(blank=True, to='chess_models.tournament'),
+        ),
+        migrations.CreateModel(
+            name='Round',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('start_date', models.DateTimeField(auto_now_add=True, null=True)),
+                ('end_date', models.DateTimeField(null=True)),
+                ('finish', models.BooleanField(default=False)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chess_models.tournament')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlayerStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.FloatField(default=0.0)),
+                ('wins', models.IntegerField(default=0)),
+                ('black_times', models.IntegerField(default=0)),
+                ('adjusted_score', models.FloatField(default=0.0)),
+                ('buchholz', models.FloatField(default=0.0)),
+                ('buchholz_cut1', models.FloatField(default=0.0)),
+                ('buchholz_average', models.FloatField(default=0.0)),
+                ('sonneborn_berger', models.FloatField(default=0.0)),
+                ('version', models.BigIntegerField(default=0)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chess_models.player')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chess_models.tournament')),
+            ],
+            options={
+                'ordering': ['-points', 'player_id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='player',
+            constraint=models.UniqueConstraint(fields=('name', 'email'), name='unique_name_email'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='black',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='black', to='chess_models.player'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='round',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chess_models.round'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='white',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='white', to='chess_models.player'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tournamentplayers',
+            unique_together={('tournament', 'player')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='seasonstanding',
+            unique_together={('season', 'player')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='playerstanding',
+            unique_together={('tournament', 'player')},
+        ),
+    ]
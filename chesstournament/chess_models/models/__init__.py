@@ -7,5 +7,19 @@ from .constants import * # noqa F104
 from .player import Player # noqa F104
 from .other_models import Referee, LichessAPIError # noqa F104
 from .tournament import Tournament, TournamentPlayers, RankingSystemClass, getScores, getBlackWins, getRanking, get_wins # noqa F104
+from .tournament import getRankingHistory, getRankingAfterRound # noqa F104
+from .tournament import getPlayers, getOpponents, getAdjustedScores, getBuchholz, getBuchholzCutMinusOne, getMediamBuchholz, getSonnebornBerger # noqa F104
+from .standings import TournamentGames, compute_standings, cumulative_standings # noqa F104
+from .tiebreaks import TieBreakEngine, compute_tiebreaks # noqa F104
+from .player_standing import PlayerStanding, rebuild_standings, update_standings, getStoredRanking, current_version # noqa F104
+from .ranking_backends import getSQLRanking, computeRanking, RANKING_BACKENDS # noqa F104
+from .cross_table import CrossTable # noqa F104
+from .rating_report import RatingReport # noqa F104
+from .season import Season, SeasonStanding, compute_season, store_season, rebuild_season # noqa F104
+from .lichess import LichessClient, lichess_client, reset_lichess_client # noqa F104
+from .lichess_async import AsyncLichessClient, async_lichess_client, run_lichess # noqa F104
+from .lichess_games import LichessGameResult, lichess_game_result # noqa F104
 from .round import Round # noqa F104
-from .game import Game, create_rounds # noqa F104
\ No newline at end of file
+from .swiss import SwissPairing # noqa F104
+from .game import Game, create_rounds, create_swiss_round, berger_table, open_round, lazy_schedule, import_lichess_results, discover_lichess_results # noqa F104
+from .job import TournamentJob, JobStatus, job_payload, job_data, claim_job # noqa F104
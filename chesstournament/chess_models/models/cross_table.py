@@ -0,0 +1,74 @@
+import numpy as np
+
+from .constants import Scores
+from .standings import RESULT_INDEX
+
+
+class CrossTable:
+    """
+    Player x player grid with the results of the games between them.
+
+    Players are ordered by id (their starting number in create_rounds).
+    `table[i, j, k]` holds the k-th game of player i against player j as
+    an int8: 0 when there is no game, RESULT_INDEX + 1 when player i had
+    white and -(RESULT_INDEX + 1) when player i had black. Games that have
+    not finished are stored as NOAVAILABLE.
+    """
+
+    def __init__(self, tournament):
+        from .game import Game
+
+        self.players = sorted(tournament.getPlayers(), key=lambda p: p.id)
+        self.ids = np.array([p.id for p in self.players], dtype=np.int64)
+        n = len(self.players)
+
+        # Every game with two players, in a single query
+        rows = list(
+            Game.objects.filter(
+                round__tournament=tournament,
+                white__isnull=False, black__isnull=False,
+            )
+            .order_by("round_id", "id")
+            .values_list("white_id", "black_id", "result", "finished")
+        )
+        whites, blacks, results, finished = \
+            zip(*rows) if rows else [()] * 4
+
+        white = self.index_of(whites)
+        black = self.index_of(blacks)
+        code = np.array([
+            RESULT_INDEX.get(result if done else Scores.NOAVAILABLE,
+                             RESULT_INDEX[Scores.NOAVAILABLE]) + 1
+            for result, done in zip(results, finished)
+        ], dtype=np.int8)
+
+        # Ignore the games of players that left the tournament
+        valid = (white >= 0) & (black >= 0)
+        white, black, code = white[valid], black[valid], code[valid]
+
+        # Position of each game among the games of the same pair
+        pair = np.minimum(white, black) * n + np.maximum(white, black)
+        order = np.argsort(pair, kind="stable")
+        first = np.searchsorted(pair[order], pair[order])
+        slot = np.empty(len(pair), dtype=np.int64)
+        slot[order] = np.arange(len(pair)) - first
+        self.cycles = int(slot.max()) + 1 if len(slot) else 0
+
+        self.table = np.zeros((n, n, self.cycles), dtype=np.int8)
+        self.table[white, black, slot] = code
+        self.table[black, white, slot] = -code
+
+    def index_of(self, ids):
+        # Positions of the player ids on the sorted players list, or -1
+        ids = np.array(ids, dtype=np.int64)
+        position = np.searchsorted(self.ids, ids)
+        position = np.minimum(position, max(len(self.ids) - 1, 0))
+        found = self.ids[position] == ids if len(self.ids) else \
+            np.zeros(len(ids), dtype=bool)
+        return np.where(found, position, -1)
+
+    def rows(self):
+        # Row ordered arrays, the games against every opponent one after
+        # the other
+        n = len(self.players)
+        return self.table.reshape(n, n * self.cycles).tolist()
@@ -1,167 +1,462 @@
-from django.db import models
-from .player import Player
-from .round import Round
-from .constants import Scores, ScoresFromValue
-from .tournament import Tournament
-from .other_models import LichessAPIError
-
-import requests
-
-
-# swissByes not needed,
-# implements ROUNDROBIN case with an even number of players
-def create_rounds(tournament: Tournament, swissByes=[]):
-    players = tournament.players.all()
-    players_count = len(players)
-    if players_count % 2 != 0 or players_count < 2:
-        return []
-
-    players_id = sorted([player.id for player in players])
-    fixed = players_id[-1]
-    others = players_id[:-1]
-
-    schedule = []
-    num_rounds = players_count - 1
-    rot = players_count // 2 - 1
-    for r in range(num_rounds):
-        round = []
-
-        # Save the fixed player. Check if he is white ot black
-        if r % 2 == 0:
-            first_pair = [others[0], fixed]
-        else:
-            first_pair = [fixed, others[0]]
-        round.append(first_pair)
-
-        # Rest of players
-        L = others[1:]
-        m = len(L)
-        for i in range(m // 2):
-            pair = [L[i], L[-(i + 1)]]
-            round.append(pair)
-        schedule.append(round)
-
-        # Rote the positions
-        rot_amt = rot % len(others)
-        others = others[-rot_amt:] + others[:-rot_amt]
-
-    # Create the rounds
-    round_count = 0
-    for round_data in schedule:
-        round_count += 1
-
-        # Create the round
-        round = Round.objects.create(
-            name=f'Round {round_count}',
-            tournament=tournament
-        )
-
-        # Insert the games on the round
-        for game_data in round_data:
-            # Create the game
-            game = Game.objects.create(
-                white=Player.objects.get(id=game_data[0]),
-                black=Player.objects.get(id=game_data[1]),
-                round=round
-            )
-            game.save()
-
-        # Save the round
-        round.save()
-
-    # Return the data
-    return schedule
-
-
-class Game(models.Model):
-
-    # White player, deleting on cascade deletes the player games
-    white = models.ForeignKey(
-        to=Player, null=True, on_delete=models.CASCADE, related_name="white"
-    )
-
-    # Black player
-    black = models.ForeignKey(
-        to=Player, null=True, on_delete=models.CASCADE, related_name="black"
-    )
-
-    # If the game ended, if true players can not edit the game
-    finished = models.BooleanField(default=False)
-
-    # The tournament round
-    round = models.ForeignKey(to=Round, null=False, on_delete=models.CASCADE)
-
-    # The start date and time of the game
-    start_date = models.DateTimeField(auto_now_add=True)
-
-    # Date and time of the last update
-    update_date = models.DateTimeField(auto_now=True)
-
-    # The result of the match,
-    # the possible values are defined in Scores.choices
-    result = models.CharField(default=Scores.NOAVAILABLE, max_length=1)
-
-    # The ranking order of the game, can be null
-    rankingOrder = models.IntegerField(default=0, null=True)
-
-    # Returns the game result, the white player and the black player
-    def get_lichess_game_result(self, game_id):
-
-        response = requests.get(f"https://lichess.org/api/game/{game_id}")
-
-        if response.status_code != 200:
-            # Handle unsuccessful response
-            raise LichessAPIError(
-                'Failed to fetch data for game'
-            )
-
-        data = response.json()
-
-        # Fixing the inconsistent quotes
-        white_player = data["players"]["white"]["userId"].lower()
-        black_player = data["players"]["black"]["userId"].lower()
-
-        white_correct = self.white.lichess_username.lower()
-        black_correct = self.black.lichess_username.lower()
-
-        if white_correct != white_player or black_correct != black_player:
-            raise LichessAPIError(
-                f"Players for game {game_id} are different"
-            )
-
-        # if white_player != white_correct:
-        #     raise LichessAPIError(
-        #         f"The player {self.white.lichess_username}"
-        #         f" is not {white_player}"
-        #     )
-
-        # if black_player != black_correct:
-        #     raise LichessAPIError(
-        #         f"The player {self.black.lichess_username}"
-        #         f" is not {black_player}"
-        #     )
-
-        if data.get("winner") is not None:
-            if data["winner"] == "white":
-                game_result = Scores.WHITE
-            elif data["winner"] == "black":
-                game_result = Scores.BLACK
-        else:
-            game_result = Scores.DRAW
-
-        return game_result, white_player, black_player
-
-    def __str__(self):
-        if self.white is None:
-            white_data = "BYE"
-        else:
-            white_data = f"{str(self.white)}({self.white.id})"
-
-        if self.black is None:
-            black_data = "BYE"
-        else:
-            black_data = f"{str(self.black)}({self.black.id})"
-
-        x = ScoresFromValue.get(self.result, "NOT_DEFINED")
-
-        return f"{white_data} vs {black_data} = {x}"
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+import asyncio
+
+from django.db import models, transaction
+from django.utils import timezone
+from .player import Player
+from .round import Round
+from .constants import Scores, ScoresFromValue, TournamentType
+from .tournament import Tournament, bump_version
+from .other_models import LichessAPIError
+from .swiss import SwissPairing
+from .lichess import export_games
+from .lichess_games import (LICHESS_UNFINISHED, LichessGameResult,  # noqa F401
+                            lichess_result, lichess_usernames,
+                            lichess_game_key, lichess_game_result,
+                            cached_lichess_games, store_lichess_games)
+
+
+def mirror_schedule(schedule):
+    # Same rounds with the colours of every game reversed
+    return [[[black, white] for white, black in round] for round in schedule]
+
+
+@lru_cache(maxsize=None)
+def berger_table(players_count):
+    # FIDE Berger table (C.05 Annex 1) of an even number of players, the
+    # (white, black) pairing numbers of every game of every round. Each
+    # table is computed once per size and kept by the process
+    fixed = players_count
+    others = list(range(1, players_count))
+
+    schedule = []
+    num_rounds = players_count - 1
+    rot = players_count // 2 - 1
+    for r in range(num_rounds):
+        round = []
+
+        # Save the fixed player. Check if he is white ot black
+        if r % 2 == 0:
+            first_pair = (others[0], fixed)
+        else:
+            first_pair = (fixed, others[0])
+        round.append(first_pair)
+
+        # Rest of players
+        L = others[1:]
+        m = len(L)
+        for i in range(m // 2):
+            pair = (L[i], L[-(i + 1)])
+            round.append(pair)
+        schedule.append(tuple(round))
+
+        # Rote the positions
+        rot_amt = rot % len(others)
+        others = others[-rot_amt:] + others[:-rot_amt]
+
+    return tuple(schedule)
+
+
+def round_robin_schedule(tournament_type, players_id):
+    # Rounds of [white, black] games of a round robin of the players, given
+    # in pairing number order. Odd fields add a bye slot, the player paired
+    # with it gets a game without black
+    players_id = list(players_id)
+    if len(players_id) < 2:
+        return []
+
+    # The bye slot takes the last pairing number
+    if len(players_id) % 2 != 0:
+        players_id.append(None)
+
+    schedule = [
+        [[players_id[white - 1], players_id[black - 1]]
+         for white, black in round]
+        for round in berger_table(len(players_id))
+    ]
+
+    # Double round robins play every game again with the colours reversed
+    if tournament_type == TournamentType.DOUBLEROUNDROBIN:
+        # The last two rounds of the first cycle are swapped, otherwise
+        # some players would repeat colour three times in a row
+        if len(schedule) > 1:
+            schedule[-2], schedule[-1] = schedule[-1], schedule[-2]
+        schedule += mirror_schedule(schedule)
+    elif tournament_type == TournamentType.DOUBLEROUNDROBINSAMEDAY:
+        # Both games of each pair are played on the same round
+        schedule = [
+            round + mirrored
+            for round, mirrored in zip(schedule, mirror_schedule(schedule))
+        ]
+
+    # The player of a bye game is always stored as white
+    return [
+        [[black, None] if white is None else [white, black]
+         for white, black in round]
+        for round in schedule
+    ]
+
+
+def insert_rounds(tournament: Tournament, schedule, first=1):
+    # Insert the rounds and their games in bulk, the player ids are used
+    # directly as the foreign keys. first is the number of the first round
+    with transaction.atomic():
+        rounds = Round.objects.bulk_create([
+            Round(name=f'Round {round_count}', tournament=tournament)
+            for round_count in range(first, first + len(schedule))
+        ])
+        # The bye games are finished, their points count from the start
+        Game.objects.bulk_create([
+            Game(white_id=white, black_id=black, round=round,
+                 result=Scores.NOAVAILABLE if black is not None
+                 else tournament.bye_score,
+                 finished=black is None)
+            for round, round_data in zip(rounds, schedule)
+            for white, black in round_data
+        ])
+
+        # bulk_create does not send the signals that change the version
+        bump_version(pk=tournament.pk)
+
+
+# swissByes are the players of a swiss tournament that asked for a half
+# point bye, implements the round robin types. Lazy round robins only keep
+# the seed order the first time, then each call creates the next round
+def create_rounds(tournament: Tournament, swissByes=[]):
+    if tournament.tournament_type == TournamentType.SWISS:
+        return create_swiss_round(tournament, swissByes)
+
+    if tournament.lazy_rounds and tournament.seed_order is not None:
+        return open_round(tournament)
+
+    players_id = sorted(
+        tournament.players.values_list("id", flat=True)
+    )
+    schedule = round_robin_schedule(tournament.tournament_type, players_id)
+    if not schedule:
+        return []
+
+    if tournament.lazy_rounds:
+        tournament.seed_order = players_id
+        tournament.save(update_fields=["seed_order"])
+    else:
+        insert_rounds(tournament, schedule)
+
+    # Return the data
+    return schedule
+
+
+def lazy_schedule(tournament: Tournament):
+    # Whole schedule of a lazy round robin, built again from the seed order
+    if tournament.seed_order is None:
+        return []
+    return round_robin_schedule(
+        tournament.tournament_type, tournament.seed_order
+    )
+
+
+def open_round(tournament: Tournament):
+    # Create the next round of a lazy round robin with its games, [] once
+    # every round is open
+    with transaction.atomic():
+        # Lock the tournament, the same round must not be opened twice
+        Tournament.objects.select_for_update().filter(
+            pk=tournament.pk).first()
+        schedule = lazy_schedule(tournament)
+        round_count = tournament.getRoundCount()
+        if round_count >= len(schedule):
+            return []
+
+        round_data = schedule[round_count]
+        insert_rounds(tournament, [round_data], first=round_count + 1)
+
+    return [round_data]
+
+
+def create_swiss_round(tournament: Tournament, swissByes=[]):
+    # Pair the next round of a swiss tournament. The byes come first, then
+    # the games by board
+    round_count = tournament.getRoundCount()
+    rounds_limit = tournament.number_of_rounds_for_swiss
+    if tournament.getPlayersCount() < 2 or \
+            (rounds_limit and round_count >= rounds_limit):
+        return []
+
+    # The byes are finished games, their points count from the start. They
+    # go by rating, the pairing-allocated one before the half point ones
+    # of the same rating
+    pairing = SwissPairing(tournament, swissByes)
+    half_byes, bye, pairs = pairing.pair()
+    byes = [(player_id, Scores.BYE_H) for player_id in half_byes]
+    if bye is not None:
+        byes.append((bye, Scores.BYE_U))
+    byes.sort(key=lambda bye: (-pairing.rating[bye[0]],
+                               bye[1] != Scores.BYE_U))
+    games = [
+        Game(white_id=player_id, black_id=None, result=result,
+             finished=True)
+        for player_id, result in byes
+    ]
+    games += [Game(white_id=white, black_id=black) for white, black in pairs]
+
+    with transaction.atomic():
+        round = Round.objects.create(
+            name=f"round_{round_count + 1:03d}", tournament=tournament
+        )
+        for game in games:
+            game.round = round
+        Game.objects.bulk_create(games)
+
+        # bulk_create does not send the signals that change the version
+        bump_version(pk=tournament.pk)
+
+    return [[[game.white_id, game.black_id] for game in games]]
+
+
+class Game(models.Model):
+
+    # White player, deleting on cascade deletes the player games
+    white = models.ForeignKey(
+        to=Player, null=True, on_delete=models.CASCADE, related_name="white"
+    )
+
+    # Black player
+    black = models.ForeignKey(
+        to=Player, null=True, on_delete=models.CASCADE, related_name="black"
+    )
+
+    # If the game ended, if true players can not edit the game
+    finished = models.BooleanField(default=False)
+
+    # The tournament round
+    round = models.ForeignKey(to=Round, null=False, on_delete=models.CASCADE)
+
+    # The start date and time of the game
+    start_date = models.DateTimeField(auto_now_add=True)
+
+    # Date and time of the last update
+    update_date = models.DateTimeField(auto_now=True)
+
+    # The result of the match,
+    # the possible values are defined in Scores.choices
+    result = models.CharField(default=Scores.NOAVAILABLE, max_length=1)
+
+    # The ranking order of the game, can be null
+    rankingOrder = models.IntegerField(default=0, null=True)
+
+    # Returns the game result, the white player and the black player
+    def get_lichess_game_result(self, game_id):
+        # The finished games are stored, they are asked to Lichess once
+        result = lichess_game_result(game_id)
+        if not result.played:
+            raise LichessAPIError(
+                f"Game {game_id} was not played on Lichess ({result.status})"
+            )
+        white_player, black_player = result.white, result.black
+
+        white_correct = self.white.lichess_username.lower()
+        black_correct = self.black.lichess_username.lower()
+
+        if white_correct != white_player or black_correct != black_player:
+            raise LichessAPIError(
+                f"Players for game {game_id} are different"
+            )
+
+        # if white_player != white_correct:
+        #     raise LichessAPIError(
+        #         f"The player {self.white.lichess_username}"
+        #         f" is not {white_player}"
+        #     )
+
+        # if black_player != black_correct:
+        #     raise LichessAPIError(
+        #         f"The player {self.black.lichess_username}"
+        #         f" is not {black_player}"
+        #     )
+
+        return result.result, white_player, black_player
+
+    def __str__(self):
+        if self.white is None:
+            white_data = "BYE"
+        else:
+            white_data = f"{str(self.white)}({self.white.id})"
+
+        if self.black is None:
+            black_data = "BYE"
+        else:
+            black_data = f"{str(self.black)}({self.black.id})"
+
+        x = ScoresFromValue.get(self.result, "NOT_DEFINED")
+
+        return f"{white_data} vs {black_data} = {x}"
+
+
+def lichess_pairings(round: Round):
+    # {(white user name, black user name): game} of the open games of the
+    # round between Lichess players, the names in lower case
+    return {
+        (game.white.lichess_username.lower(),
+         game.black.lichess_username.lower()): game
+        for game in Game.objects.filter(
+            round=round, finished=False, white__lichess_username__isnull=False,
+            black__lichess_username__isnull=False,
+        ).select_related("white", "black")
+    }
+
+
+def finish_lichess_game(game, result, now):
+    # Set the LichessGameResult on the game, without saving it. Returns
+    # {lichess_game_id, game_id, result}
+    game.result = result.result
+    game.finished = True
+    game.update_date = now
+    return {
+        "lichess_game_id": result.id, "game_id": game.id,
+        "result": game.result,
+    }
+
+
+def save_lichess_results(tournament: Tournament, games):
+    # Write the games whose Lichess results were set, with the standings
+    # and the version of the tournament
+    from .player_standing import rebuild_standings
+
+    if not games:
+        return
+    with transaction.atomic():
+        Game.objects.bulk_update(
+            games, ["result", "finished", "update_date"]
+        )
+
+        # bulk_update does not send the signals that change the version
+        bump_version(pk=tournament.pk)
+        rebuild_standings(tournament)
+
+
+def import_lichess_results(round: Round, lichess_game_ids):
+    # Results of the open games of the round from the given Lichess games,
+    # fetched together from the export endpoint. Each Lichess game is
+    # matched to the game of its two players. Returns the imported games,
+    # [{lichess_game_id, game_id, result}], and the Lichess games that could
+    # not be imported, [{lichess_game_id, message}]
+    lichess_game_ids = list(dict.fromkeys(lichess_game_ids))
+    pairings = lichess_pairings(round)
+
+    # The stored games are not asked to Lichess again
+    results = cached_lichess_games(lichess_game_ids)
+    keys = {lichess_game_key(game_id): game_id for game_id in lichess_game_ids}
+    exported = [
+        LichessGameResult.from_data(data) for data in export_games(
+            [game_id for game_id in lichess_game_ids if game_id not in results]
+        )
+    ]
+    store_lichess_games(exported)
+    results.update({
+        keys.get(result.id, result.id): result for result in exported
+    })
+
+    imported, errors = [], []
+    updated = []
+    now = timezone.now()
+    for game_id in lichess_game_ids:
+        result = results.get(game_id)
+        if result is None:
+            errors.append({
+                "lichess_game_id": game_id,
+                "message": "Game not found on Lichess",
+            })
+            continue
+        game = pairings.get((result.white, result.black))
+        if not result.played:
+            message = f"Game was not played ({result.status})"
+        elif not result.finished:
+            message = "Game is not finished"
+        elif game is None:
+            message = (f"No open game of the round for {result.white} vs "
+                       f"{result.black}")
+        else:
+            del pairings[(result.white, result.black)]
+            imported.append(finish_lichess_game(game, result, now))
+            updated.append(game)
+            continue
+        errors.append({"lichess_game_id": game_id, "message": message})
+
+    save_lichess_results(round.tournament, updated)
+    return imported, errors
+
+
+def open_rounds(tournament: Tournament):
+    # Rounds of the tournament that still have open games, in order
+    return Round.objects.filter(
+        tournament=tournament, game__finished=False,
+        game__white__isnull=False, game__black__isnull=False,
+    ).distinct().order_by("id")
+
+
+def lichess_created_at(data):
+    # Start time of the data of a Lichess game, given in milliseconds
+    return datetime.fromtimestamp(
+        data["createdAt"] / 1000, tz=dt_timezone.utc
+    )
+
+
+def discover_lichess_results(tournament: Tournament):
+    # Results of the open games of every round of the tournament found on
+    # Lichess without their game ids. The games each white player played
+    # with white since the last sync are asked once per player, all the
+    # players at the same time, and the first finished one against the
+    # black player of an open game gives its result, the oldest game to the
+    # earliest round. The next sync starts at the oldest game still being
+    # played, or now. Returns the imported games, as import_lichess_results
+    # does
+    from .lichess_async import run_lichess
+
+    rounds = list(open_rounds(tournament))
+    pairings = {}
+    for round in rounds:
+        for players, game in lichess_pairings(round).items():
+            pairings.setdefault(players, []).append(game)
+    if not pairings:
+        return []
+    whites = sorted({white for white, _ in pairings})
+    since = tournament.lichess_synced_at or rounds[0].start_date
+    until = timezone.now()
+
+    async def work(client):
+        return await asyncio.gather(*[
+            client.fetch_user_games(
+                white, since=since, until=until, color="white", ongoing=True
+            )
+            for white in whites
+        ])
+
+    imported, updated = [], []
+    now = timezone.now()
+    found = [
+        (data, LichessGameResult.from_data(data))
+        for games in run_lichess(work) for data in games
+    ]
+    store_lichess_games([result for _, result in found])
+    synced_at = until
+    for data, result in reversed(found):
+        # Lichess gives the newest games of each player first
+        games = pairings.get((result.white, result.black))
+        if not games:
+            continue
+        if not result.finished:
+            synced_at = min(synced_at, lichess_created_at(data))
+            continue
+        if not result.played:
+            continue
+        game = games.pop(0)
+        imported.append(finish_lichess_game(game, result, now))
+        updated.append(game)
+
+    save_lichess_results(tournament, updated)
+    Tournament.objects.filter(pk=tournament.pk).update(
+        lichess_synced_at=synced_at
+    )
+    tournament.lichess_synced_at = synced_at
+    return imported
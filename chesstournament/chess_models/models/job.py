@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.contrib.auth.models import User
+from django.http import QueryDict
+from django.utils import timezone
+
+
+class JobStatus(models.TextChoices):
+    QUEUED = 'QU', 'Queued'
+    RUNNING = 'RU', 'Running'
+    DONE = 'DO', 'Done'
+    FAILED = 'FA', 'Failed'
+
+
+class TournamentJob(models.Model):
+    # User that asked for the tournament, it will be its administrative user
+    user = models.ForeignKey(to=User, null=True, on_delete=models.CASCADE)
+
+    # Request data of the tournament, as stored by job_payload
+    data = models.JSONField()
+
+    # Job status, options of JobStatus
+    status = models.CharField(
+        choices=JobStatus.choices, max_length=2, default=JobStatus.QUEUED
+    )
+
+    # Percent of the work done, from 0 to 100
+    progress = models.IntegerField(default=0)
+
+    # Error message of a failed job
+    error = models.TextField(blank=True, default="")
+
+    # Tournament created by the job. Can be null
+    tournament = models.ForeignKey(
+        to="chess_models.Tournament", null=True, on_delete=models.SET_NULL
+    )
+
+    # Date the job was queued and date of its last change
+    creation_date = models.DateTimeField(auto_now_add=True)
+    update_date = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"job_{self.id:02d}"
+
+    def set_progress(self, progress, **fields):
+        # Write the progress with an update, the job row is the only one
+        # changed and other processes see it at once. update_date is the
+        # heartbeat of the worker, see claim_job
+        self.progress = progress
+        self.update_date = timezone.now()
+        for name, value in fields.items():
+            setattr(self, name, value)
+        TournamentJob.objects.filter(id=self.id).update(
+            progress=progress, update_date=self.update_date, **fields
+        )
+
+
+def job_payload(data):
+    # JSON copy of the request data. Form data keeps every value of each
+    # key, so that the list fields can be read again
+    if isinstance(data, QueryDict):
+        return {"form": dict(data.lists())}
+    return {"json": dict(data)}
+
+
+def job_data(payload):
+    # Request data of a job, as the serializer got it on the request
+    if "form" in payload:
+        data = QueryDict(mutable=True)
+        for key, values in payload["form"].items():
+            data.setlist(key, values)
+        return data
+    return payload["json"]
+
+
+def claim_job():
+    # Take the oldest queued job, None if there is none. The running jobs
+    # without progress for TOURNAMENT_JOB_TIMEOUT seconds are taken again,
+    # their worker died. The status is changed only if the job is still as
+    # it was found, so two workers never run the same job
+    now = timezone.now()
+    stalled = models.Q(
+        status=JobStatus.RUNNING,
+        update_date__lt=now - timedelta(
+            seconds=settings.TOURNAMENT_JOB_TIMEOUT),
+    )
+    waiting = TournamentJob.objects.filter(
+        models.Q(status=JobStatus.QUEUED) | stalled
+    )
+    for job_id in waiting.values_list("id", flat=True)[:10]:
+        claimed = TournamentJob.objects.filter(
+            models.Q(status=JobStatus.QUEUED) | stalled, id=job_id
+        ).update(status=JobStatus.RUNNING, progress=0, update_date=now)
+        if claimed:
+            return TournamentJob.objects.get(id=job_id)
+    return None
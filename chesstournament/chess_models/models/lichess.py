@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .other_models import LichessAPIError
+
+# Statuses of the responses that are retried
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+# Most user names Lichess accepts on each POST /api/users
+USERS_BATCH = 300
+
+# Most game ids Lichess accepts on each POST /api/games/export/_ids
+GAMES_BATCH = 300
+
+
+class LichessClient:
+    """
+    HTTP client of the Lichess API. The connections are kept alive on a
+    pooled session, every request has connect and read timeouts and the
+    429 and 5xx responses are retried with an exponential backoff, waiting
+    what Retry-After asks for when it is given.
+
+    The latency of the requests is counted by path, latency() returns it.
+    """
+
+    def __init__(self, base_url=None, connect_timeout=None,
+                 read_timeout=None, retries=None, backoff=None,
+                 pool_size=None, retry_statuses=RETRY_STATUSES):
+        def setting(value, name):
+            return getattr(settings, name) if value is None else value
+
+        self.base_url = setting(base_url, "LICHESS_URL").rstrip("/")
+        self.timeout = (
+            setting(connect_timeout, "LICHESS_CONNECT_TIMEOUT"),
+            setting(read_timeout, "LICHESS_READ_TIMEOUT"),
+        )
+        retry = Retry(
+            total=setting(retries, "LICHESS_RETRIES"),
+            backoff_factor=setting(backoff, "LICHESS_BACKOFF"),
+            status_forcelist=retry_statuses,
+            allowed_methods=["GET", "POST"],
+            # urllib3 retries every 429 with Retry-After when it is set,
+            # even if 429 is not one of the retried statuses
+            respect_retry_after_header=429 in retry_statuses,
+            raise_on_status=False,
+        )
+        pool_size = setting(pool_size, "LICHESS_POOL_SIZE")
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def request(self, method, path, **kwargs):
+        # Response of the request, LichessAPIError if Lichess can not be
+        # reached. The statuses are checked by the callers
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self.base_url + path, **kwargs
+            )
+        except requests.RequestException as e:
+            self.count(path, start, error=True)
+            raise LichessAPIError(f"Lichess request failed: {e}")
+
+        self.count(path, start, error=response.status_code >= 400)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def count(self, path, start, error=False):
+        # Counters of the endpoint, the path without its last part (the
+        # user name or the game id)
+        seconds = time.perf_counter() - start
+        endpoint = path.rsplit("/", 1)[0] if path.count("/") > 2 else path
+        with self.lock:
+            counter = self.counters.setdefault(endpoint, {
+                "requests": 0, "errors": 0, "seconds": 0.0,
+                "max_seconds": 0.0,
+            })
+            counter["requests"] += 1
+            counter["errors"] += int(error)
+            counter["seconds"] += seconds
+            counter["max_seconds"] = max(counter["max_seconds"], seconds)
+
+    def latency(self):
+        # {endpoint: {requests, errors, seconds, max_seconds, mean_seconds}}
+        with self.lock:
+            return {
+                endpoint: {
+                    **counter,
+                    "mean_seconds": counter["seconds"] / counter["requests"],
+                }
+                for endpoint, counter in self.counters.items()
+            }
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def lichess_client():
+    # Client shared by the whole process, created on the first use
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LichessClient()
+        return _client
+
+
+def reset_lichess_client():
+    # Drop the shared clients, the next ones read the settings again
+    from .lichess_async import reset_async_lichess_client
+
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+    reset_async_lichess_client()
+
+
+def fetch_users(usernames):
+    # {user id: user data} of the Lichess users, the ids are the lower case
+    # user names. The batches of USERS_BATCH names are asked at the same
+    # time, the users that do not exist are left out
+    from .lichess_async import run_lichess
+
+    return run_lichess(lambda client: client.fetch_users(usernames))
+
+
+def export_games(game_ids, client=None):
+    # Data of the Lichess games, parsed line by line from the NDJSON stream
+    # of the export endpoint as it arrives. They are asked GAMES_BATCH at a
+    # time, the games that do not exist are left out
+    client = client or lichess_client()
+    game_ids = list(game_ids)
+    for start in range(0, len(game_ids), GAMES_BATCH):
+        response = client.post(
+            "/api/games/export/_ids",
+            data=",".join(game_ids[start:start + GAMES_BATCH]),
+            params={"moves": "false"},
+            headers={"Accept": "application/x-ndjson"},
+            stream=True,
+        )
+        with response:
+            if response.status_code != 200:
+                raise LichessAPIError(
+                    f"Error exporting games: {response.status_code}"
+                )
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
@@ -0,0 +1,232 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import json
+import threading
+import time
+import weakref
+
+from django.conf import settings
+
+from .lichess import LichessClient, RETRY_STATUSES, USERS_BATCH, GAMES_BATCH
+from .other_models import LichessAPIError
+
+
+class AsyncLichessClient:
+    """
+    asyncio interface of the Lichess API for the bulk operations. There is
+    no asyncio HTTP client among the dependencies, so the I/O is not done
+    by asyncio: every request is sent by the blocking LichessClient on a
+    worker thread (run_in_executor) and the coroutines wait for it. The
+    semaphore, the thread pool and the keep-alive connection pool all have
+    concurrency slots, so at most concurrency requests are in flight and
+    a request that holds the semaphore never waits for a thread or a
+    connection.
+
+    A 429 response pauses every request of the client for the seconds of
+    Retry-After (LICHESS_RATE_LIMIT_PAUSE if it is not given, Lichess asks
+    for a minute), then the request is sent again, up to rate_limit_retries
+    times. The other failed requests are retried by the LichessClient.
+
+    The client can be used from several event loops, each one gets its own
+    semaphore, so the client of the process (async_lichess_client) is kept
+    between runs with its connections, its threads and its counters.
+    """
+
+    def __init__(self, concurrency=None, rate_limit_retries=3, **kwargs):
+        self.concurrency = concurrency or settings.LICHESS_CONCURRENCY
+        self.rate_limit_retries = rate_limit_retries
+        # Threads and connections are sized to the semaphore
+        self.client = LichessClient(
+            pool_size=self.concurrency,
+            retry_statuses=[
+                status for status in RETRY_STATUSES if status != 429
+            ],
+            **kwargs
+        )
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.semaphores = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+        self.paused_until = 0.0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.client.close()
+
+    def semaphore(self, loop):
+        # Semaphore of the loop, an asyncio semaphore only works on one loop
+        with self.lock:
+            semaphore = self.semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self.semaphores[loop] = \
+                    asyncio.Semaphore(self.concurrency)
+            return semaphore
+
+    async def request(self, method, path, **kwargs):
+        loop = asyncio.get_running_loop()
+        semaphore = self.semaphore(loop)
+        send = functools.partial(self.client.request, method, path, **kwargs)
+
+        for _ in range(self.rate_limit_retries + 1):
+            async with semaphore:
+                await self.wait()
+                response = await loop.run_in_executor(self.executor, send)
+            if response.status_code != 429:
+                return response
+            self.pause(response)
+        return response
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    def pause(self, response):
+        seconds = response.headers.get("Retry-After")
+        seconds = float(seconds) if seconds else \
+            settings.LICHESS_RATE_LIMIT_PAUSE
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def wait(self):
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def latency(self):
+        return self.client.latency()
+
+    async def gather_batches(self, values, size, fetch):
+        # Results of fetch for every batch of size values, at the same time
+        values = list(values)
+        return await asyncio.gather(*[
+            fetch(values[start:start + size])
+            for start in range(0, len(values), size)
+        ])
+
+    async def fetch_users(self, usernames):
+        # {user id: user data} of the users, see lichess.fetch_users
+        async def fetch(batch):
+            response = await self.post(
+                "/api/users", data=",".join(batch),
+                headers={"Content-Type": "text/plain"},
+            )
+            if response.status_code != 200:
+                raise LichessAPIError(
+                    f"Error fetching users data: {response.status_code}"
+                )
+            return response.json()
+
+        batches = await self.gather_batches(usernames, USERS_BATCH, fetch)
+        return {user["id"]: user for batch in batches for user in batch}
+
+    async def fetch_user(self, username):
+        # Data of the user, None if it does not exist
+        response = await self.get(f"/api/user/{username}")
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise LichessAPIError(
+                f"Error fetching user '{username}' data: "
+                f"{response.status_code}"
+            )
+        return response.json()
+
+    async def fetch_user_games(self, username, since=None, until=None,
+                               color=None, ongoing=False):
+        # Finished games of the user, the newest first, with ongoing also
+        # the games being played. since and until are datetimes that bound
+        # the start of the games, color keeps the games the user played
+        # with that color
+        params = {"moves": "false", "finished": "true"}
+        if ongoing:
+            params["ongoing"] = "true"
+        if since is not None:
+            params["since"] = int(since.timestamp() * 1000)
+        if until is not None:
+            params["until"] = int(until.timestamp() * 1000)
+        if color is not None:
+            params["color"] = color
+        response = await self.get(
+            f"/api/games/user/{username}", params=params,
+            headers={"Accept": "application/x-ndjson"},
+        )
+        if response.status_code == 404:
+            return []
+        if response.status_code != 200:
+            raise LichessAPIError(
+                f"Error fetching the games of '{username}': "
+                f"{response.status_code}"
+            )
+        return [
+            json.loads(line) for line in response.text.splitlines() if line
+        ]
+
+    async def export_games(self, game_ids):
+        # Data of the games, see lichess.export_games
+        async def fetch(batch):
+            response = await self.post(
+                "/api/games/export/_ids", data=",".join(batch),
+                params={"moves": "false"},
+                headers={"Accept": "application/x-ndjson"},
+            )
+            if response.status_code != 200:
+                raise LichessAPIError(
+                    f"Error exporting games: {response.status_code}"
+                )
+            return [
+                json.loads(line) for line in response.text.splitlines()
+                if line
+            ]
+
+        batches = await self.gather_batches(game_ids, GAMES_BATCH, fetch)
+        return [game for batch in batches for game in batch]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def async_lichess_client():
+    # asyncio client shared by the whole process, created on the first use
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AsyncLichessClient()
+        return _client
+
+
+def reset_async_lichess_client():
+    # Drop the shared asyncio client, the next one reads the settings again
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def run_lichess(work, **kwargs):
+    # Run work(client) on a new event loop, the way the synchronous code
+    # uses the asyncio client. It is the shared client, or a client of its
+    # own closed at the end if kwargs are given
+    async def main():
+        if not kwargs:
+            return await work(async_lichess_client())
+        async with AsyncLichessClient(**kwargs) as client:
+            return await work(client)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(main())
+
+    # asyncio.run can not be called while a loop runs on this thread (an
+    # async view or a notebook), main runs on a loop of another thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, main()).result()
@@ -0,0 +1,158 @@
+from concurrent.futures import Future
+import threading
+
+from django.db import models
+
+from .constants import Scores
+from .lichess import lichess_client
+from .other_models import LichessAPIError
+
+# Statuses of the Lichess games that are still being played
+LICHESS_UNFINISHED = ["created", "started"]
+
+# Statuses of the Lichess games that ended without being played, they have
+# no result and the players can play the game again
+LICHESS_NOT_PLAYED = ["aborted", "noStart"]
+
+# Length of the Lichess game ids, the longer ids have the player suffix
+LICHESS_GAME_ID_LENGTH = 8
+
+
+def lichess_result(data):
+    # Result of the data of a Lichess game, the games without winner are
+    # draws
+    if data.get("winner") == "white":
+        return Scores.WHITE
+    if data.get("winner") == "black":
+        return Scores.BLACK
+    return Scores.DRAW
+
+
+def lichess_usernames(data):
+    # Lower case user names of the white and black players of the data of a
+    # Lichess game, as given by /api/game or by the export endpoints
+    def username(side):
+        player = data["players"][side]
+        if "userId" in player:
+            return player["userId"].lower()
+        return player.get("user", {}).get("id", "").lower()
+
+    return username("white"), username("black")
+
+
+def lichess_game_key(game_id):
+    return game_id[:LICHESS_GAME_ID_LENGTH]
+
+
+class LichessGameResult(models.Model):
+    # Lichess game id, without the player suffix
+    id = models.CharField(
+        primary_key=True, max_length=LICHESS_GAME_ID_LENGTH
+    )
+
+    # Result of the game, options of Scores
+    result = models.CharField(max_length=1)
+
+    # Lower case Lichess user names of the players
+    white = models.CharField(max_length=150)
+    black = models.CharField(max_length=150)
+
+    # Lichess status of the game
+    status = models.CharField(max_length=32)
+
+    # Date the game was fetched from Lichess
+    fetch_date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.id}: {self.white} vs {self.black} = {self.result}"
+
+    @classmethod
+    def from_data(cls, data):
+        # Unsaved result of the data of a Lichess game
+        white, black = lichess_usernames(data)
+        return cls(
+            id=lichess_game_key(data["id"]), result=lichess_result(data),
+            white=white, black=black, status=data.get("status", ""),
+        )
+
+    @property
+    def finished(self):
+        return self.status not in LICHESS_UNFINISHED
+
+    @property
+    def played(self):
+        return self.status not in LICHESS_NOT_PLAYED
+
+
+def store_lichess_games(results):
+    # Keep the finished games of the results, a finished Lichess game never
+    # changes so the stored ones are never updated. The games that were not
+    # played have no result, they are not kept
+    LichessGameResult.objects.bulk_create(
+        [result for result in results if result.finished and result.played],
+        ignore_conflicts=True,
+    )
+
+
+def stored_lichess_games():
+    # Stored games, without the not played ones kept by older versions
+    return LichessGameResult.objects.exclude(status__in=LICHESS_NOT_PLAYED)
+
+
+def cached_lichess_games(game_ids):
+    # {game id: LichessGameResult} of the stored games among game_ids
+    keys = {lichess_game_key(game_id): game_id for game_id in game_ids}
+    return {
+        keys[result.id]: result
+        for result in stored_lichess_games().filter(id__in=keys)
+    }
+
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def lichess_game_result(game_id):
+    # LichessGameResult of the Lichess game, from the stored games or asked
+    # to Lichess and stored if it is finished. The threads that ask for the
+    # same game while it is being fetched wait for that request and share
+    # its result or its error
+    key = lichess_game_key(game_id)
+    result = stored_lichess_games().filter(id=key).first()
+    if result is not None:
+        return result
+
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = _in_flight[key] = Future()
+    if not leader:
+        return future.result()
+
+    try:
+        # Another thread may have stored it since the first lookup
+        result = stored_lichess_games().filter(id=key).first() \
+            or fetch_lichess_game(game_id)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+
+
+def fetch_lichess_game(game_id):
+    response = lichess_client().get(f"/api/game/{game_id}")
+
+    if response.status_code != 200:
+        # Handle unsuccessful response
+        raise LichessAPIError(
+            'Failed to fetch data for game'
+        )
+
+    result = LichessGameResult.from_data(response.json())
+    store_lichess_games([result])
+    return result
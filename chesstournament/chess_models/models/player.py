@@ -1,6 +1,18 @@
-from django.db import models
-import requests
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
 from .other_models import LichessAPIError
+from .lichess import lichess_client, fetch_users
+
+# Lichess speeds of the player ratings
+LICHESS_SPEEDS = ["bullet", "blitz", "rapid", "classical"]
+
+# Fields written when the Lichess data of a player is fetched
+LICHESS_FIELDS = [f"lichess_rating_{speed}" for speed in LICHESS_SPEEDS] + [
+    "update_date", "lichess_fetch_date"
+]
 
 
 class Player(models.Model):
@@ -51,6 +63,9 @@ class Player(models.Model):
     # Player Lichess rating in Classical mode. Can be null
     lichess_rating_classical = models.IntegerField(default=0, null=True)
 
+    # Date the Lichess data of the player was last fetched. Can be null
+    lichess_fetch_date = models.DateTimeField(null=True, blank=True)
+
     ##############
     # NOTE: fide #
     ##############
@@ -79,9 +94,27 @@ class Player(models.Model):
     def __str__(self):
         return self.lichess_username if self.lichess_username else self.name
 
-    def save(self, *args, **kwargs):
-        # Search the user on lichess
-        self.get_lichess_user_ratings()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Remember the user name the Lichess data was fetched for
+        player = super().from_db(db, field_names, values)
+        player._loaded_username = player.lichess_username
+        return player
+
+    def lichess_data_is_fresh(self, max_age=None):
+        # The Lichess data of the user name was fetched less than max_age
+        # seconds ago (LICHESS_RATINGS_MAX_AGE by default)
+        return (
+            self.lichess_fetch_date is not None
+            and self.lichess_username == getattr(
+                self, "_loaded_username", self.lichess_username)
+            and self.lichess_fetch_date >= ratings_cutoff(max_age)
+        )
+
+    def save(self, *args, refresh_ratings=False, **kwargs):
+        # Search the user on lichess, unless its data is fresh enough
+        if refresh_ratings or not self.lichess_data_is_fresh():
+            self.get_lichess_user_ratings()
 
         # Search the player on the database
         existing_player = (
@@ -126,8 +159,8 @@ class Player(models.Model):
             return False
 
         # Make the request
-        response = requests.get(
-            f"https://lichess.org/api/user/{self.lichess_username}")
+        response = lichess_client().get(
+            f"/api/user/{self.lichess_username}")
 
         return response.status_code == 200
 
@@ -135,18 +168,151 @@ class Player(models.Model):
         if self.lichess_username is None:
             return
 
-        response = requests.get(
-            f"https://lichess.org/api/user/{self.lichess_username}")
+        response = lichess_client().get(
+            f"/api/user/{self.lichess_username}")
         if response.status_code != 200:
             raise LichessAPIError(
                 f"Error fetching user "
                 f"'{self.lichess_username}'"
                 f" data: {response.status_code}"
             )
-        data = response.json()
-        if data.get("perfs") is None:
-            return
-        self.lichess_rating_bullet = data["perfs"]["bullet"]["rating"]
-        self.lichess_rating_blitz = data["perfs"]["blitz"]["rating"]
-        self.lichess_rating_rapid = data["perfs"]["rapid"]["rating"]
-        self.lichess_rating_classical = data["perfs"]["classical"]["rating"]
+        for field, rating in lichess_ratings(response.json()).items():
+            setattr(self, field, rating)
+        self.lichess_fetch_date = timezone.now()
+        self._loaded_username = self.lichess_username
+
+
+def lichess_ratings(data):
+    # {rating field: rating} of the data of a Lichess user
+    perfs = data.get("perfs") or {}
+    return {
+        f"lichess_rating_{speed}": perfs[speed]["rating"]
+        for speed in LICHESS_SPEEDS if speed in perfs
+    }
+
+
+def ratings_cutoff(max_age=None):
+    # Oldest fetch date of the Lichess data that is still fresh
+    if max_age is None:
+        max_age = settings.LICHESS_RATINGS_MAX_AGE
+    return timezone.now() - timedelta(seconds=max_age)
+
+
+def import_lichess_players(usernames, max_age=None, refresh=False):
+    # {user name: Player} of the Lichess users. The data of the new players
+    # and of the ones not fetched in the last max_age seconds (all of them
+    # with refresh) is fetched with a few bulk requests, and the players
+    # are created or updated in bulk, without the lookups of Player.save.
+    # LichessAPIError if any of these users does not exist
+    from .tournament import bump_version
+
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
+        return {}
+
+    players = {
+        player.lichess_username: player
+        for player in Player.objects.filter(lichess_username__in=usernames)
+    }
+    stale = [
+        username for username in usernames
+        if refresh or username not in players
+        or not players[username].lichess_data_is_fresh(max_age)
+    ]
+
+    users = fetch_users(stale) if stale else {}
+    for username in stale:
+        if username.lower() not in users:
+            raise LichessAPIError(
+                f"Error fetching user '{username}' data: 404"
+            )
+
+    existing = [players[username] for username in stale if username in players]
+    new = [
+        Player(lichess_username=username)
+        for username in stale if username not in players
+    ]
+    players.update({player.lichess_username: player for player in new})
+
+    now = timezone.now()
+    for username in stale:
+        player = players[username]
+        player.update_date = now
+        player.lichess_fetch_date = now
+        for field, rating in lichess_ratings(users[username.lower()]).items():
+            setattr(player, field, rating)
+
+    with transaction.atomic():
+        Player.objects.bulk_create(new)
+        if existing:
+            Player.objects.bulk_update(existing, LICHESS_FIELDS)
+            # bulk_update does not send the signals that change the version
+            bump_version(players__in=existing)
+
+    return {username: players[username] for username in usernames}
+
+
+def stale_lichess_players():
+    # Lichess players of the unfinished tournaments whose data is older than
+    # the max_update_time of any of their tournaments
+    from .tournament import unfinished_tournaments
+
+    tournaments = unfinished_tournaments()
+    stale = models.Q(pk__in=[])
+    for max_age in set(
+        tournaments.values_list("max_update_time", flat=True)
+    ):
+        stale |= models.Q(
+            tournament__in=tournaments.filter(max_update_time=max_age)
+        ) & (
+            models.Q(lichess_fetch_date__isnull=True)
+            | models.Q(lichess_fetch_date__lt=ratings_cutoff(max_age))
+        )
+
+    return Player.objects.filter(
+        stale, lichess_username__isnull=False
+    ).distinct().order_by("id")
+
+
+def refresh_lichess_players(players, batch_size=None):
+    # Fetch again the Lichess data of the players, batch_size users
+    # (USERS_BATCH by default) at a time. Each batch is written with one
+    # bulk_update and the tournaments of the players whose ratings changed
+    # get a new version. Yields (players of the batch, players changed)
+    from .tournament import bump_version
+    from .lichess import USERS_BATCH
+
+    batch_size = batch_size or USERS_BATCH
+    players = list(players)
+    for start in range(0, len(players), batch_size):
+        batch = players[start:start + batch_size]
+        users = fetch_users([player.lichess_username for player in batch])
+
+        now = timezone.now()
+        changed = []
+        for player in batch:
+            data = users.get(player.lichess_username.lower())
+            if data is None:
+                continue
+            player.update_date = now
+            player.lichess_fetch_date = now
+            ratings = lichess_ratings(data)
+            if any(getattr(player, field) != rating
+                   for field, rating in ratings.items()):
+                changed.append(player)
+            for field, rating in ratings.items():
+                setattr(player, field, rating)
+
+        # The users that are not on Lichess anymore are not written
+        fetched = [
+            player for player in batch
+            if player.lichess_username.lower() in users
+        ]
+        with transaction.atomic():
+            Player.objects.bulk_update(fetched, LICHESS_FIELDS)
+
+            # bulk_update does not send the signals that change the version
+            if changed:
+                bump_version(players__in=changed)
+
+        yield batch, changed
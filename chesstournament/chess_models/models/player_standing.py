@@ -0,0 +1,221 @@
+from django.db import models, transaction
+import numpy as np
+
+from .player import Player
+from .constants import RankingSystem
+from .standings import TournamentGames
+from .tiebreaks import TieBreakEngine, OPPONENT_TIEBREAKS
+
+
+# PlayerStanding field that stores the value of each ranking system
+RANKING_FIELDS = {
+    RankingSystem.PLAIN_SCORE.value: "points",
+    RankingSystem.WINS.value: "wins",
+    RankingSystem.BLACKTIMES.value: "black_times",
+    RankingSystem.BUCHHOLZ.value: "buchholz",
+    RankingSystem.BUCHHOLZ_CUT1.value: "buchholz_cut1",
+    RankingSystem.BUCHHOLZ_AVERAGE.value: "buchholz_average",
+    RankingSystem.SONNEBORN_BERGER.value: "sonneborn_berger",
+}
+
+
+class PlayerStanding(models.Model):
+    # Tournament reference
+    tournament = models.ForeignKey(
+        to="chess_models.Tournament",
+        null=False, blank=False, on_delete=models.CASCADE
+    )
+
+    # Player reference
+    player = models.ForeignKey(
+        to=Player, null=False, blank=False, on_delete=models.CASCADE
+    )
+
+    # Points, wins and games played with black (PS, WI and BT)
+    points = models.FloatField(default=0.0)
+    wins = models.IntegerField(default=0)
+    black_times = models.IntegerField(default=0)
+
+    # Score with the final voluntarily unplayed rounds counted as draws,
+    # used as the player's score by the opponents' tie-breaks
+    adjusted_score = models.FloatField(default=0.0)
+
+    # Opponent based tie-breaks (BU, BC, BA and SB)
+    buchholz = models.FloatField(default=0.0)
+    buchholz_cut1 = models.FloatField(default=0.0)
+    buchholz_average = models.FloatField(default=0.0)
+    sonneborn_berger = models.FloatField(default=0.0)
+
+    # Version of the tournament the row was computed for, the rows of an
+    # older version are stale
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("tournament", "player")
+        ordering = ["-points", "player_id"]
+
+    def __str__(self):
+        return f"{self.player} ({self.points})"
+
+
+# Fields written by the standings updates
+STANDING_FIELDS = [
+    "points", "wins", "black_times", "adjusted_score", "buchholz",
+    "buchholz_cut1", "buchholz_average", "sonneborn_berger",
+]
+
+
+def current_version(tournament, lock=False):
+    # Version of the tournament stored in the database. With lock the
+    # tournament is locked until the end of the transaction, so the other
+    # changes of the tournament wait for it
+    from .tournament import Tournament
+
+    tournaments = Tournament.objects.filter(pk=tournament.pk)
+    if lock:
+        tournaments = tournaments.select_for_update()
+    return tournaments.values_list("version", flat=True).get()
+
+
+def rebuild_standings(tournament):
+    # Compute the standings of every player from the games
+    version = current_version(tournament)
+    engine = TieBreakEngine(tournament)
+    columns = zip(
+        engine.games.players,
+        engine.score.tolist(),
+        engine.games.wins().tolist(),
+        engine.games.black_times().tolist(),
+        engine.adjusted_score.tolist(),
+        engine.buchholz().tolist(),
+        engine.buchholz_cut1().tolist(),
+        engine.buchholz_average().tolist(),
+        engine.sonneborn_berger().tolist(),
+    )
+
+    standings = [
+        PlayerStanding(tournament=tournament, player=player,
+                       version=version,
+                       **dict(zip(STANDING_FIELDS, values)))
+        for player, *values in columns
+    ]
+
+    with transaction.atomic():
+        PlayerStanding.objects.filter(tournament=tournament).delete()
+        PlayerStanding.objects.bulk_create(standings)
+
+    return standings
+
+
+def update_standings(game, version=None):
+    # Update the standings after the result of the game changed. Only the
+    # players of the game and the tie-breaks of their opponents are written.
+    # version is the version of the tournament before the game was saved,
+    # read with current_version(lock=True) in the same transaction. The
+    # table is built again if it was not up to date with it
+    tournament = game.round.tournament
+    changed = [id for id in [game.white_id, game.black_id] if id is not None]
+
+    with transaction.atomic():
+        rows = PlayerStanding.objects.select_for_update().filter(
+            tournament=tournament
+        )
+        standings = {row.player_id: row for row in rows}
+        players = tournament.getPlayers()
+
+        # The table is stale or does not cover the tournament players
+        if version is None \
+                or any(row.version != version for row in standings.values()) \
+                or set(standings) != {player.id for player in players}:
+            rebuild_standings(tournament)
+            return
+
+        ids = np.array([player.id for player in players], dtype=np.int64)
+        rows = [standings[id] for id in ids.tolist()]
+
+        def vector(field):
+            return np.array([getattr(row, field) for row in rows])
+
+        def write(index, **columns):
+            for i in index.tolist():
+                for field, values in columns.items():
+                    setattr(rows[i], field, values[i].item())
+
+        # Scores of the players of the game
+        engine = TieBreakEngine(
+            tournament, TournamentGames(tournament, players, changed))
+        index = engine.games.index_of(changed)
+        index = index[index >= 0]
+        write(index,
+              points=engine.score,
+              wins=engine.games.wins(),
+              black_times=engine.games.black_times(),
+              adjusted_score=engine.adjusted_score)
+
+        # Tie-breaks of these players and their opponents
+        affected = np.union1d(index, engine.opponents_of(index))
+        engine = TieBreakEngine(
+            tournament,
+            TournamentGames(tournament, players, ids[affected].tolist()))
+        adjusted_score = vector("adjusted_score")
+        write(affected,
+              buchholz=engine.buchholz(adjusted_score),
+              buchholz_cut1=engine.buchholz_cut1(adjusted_score),
+              sonneborn_berger=engine.sonneborn_berger(adjusted_score))
+
+        # Buchholz average depends on the Buchholz of the opponents
+        around = np.union1d(affected, engine.opponents_of(affected))
+        engine = TieBreakEngine(
+            tournament,
+            TournamentGames(tournament, players, ids[around].tolist()))
+        write(around,
+              buchholz_average=engine.buchholz_average(vector("buchholz")))
+
+        PlayerStanding.objects.bulk_update(
+            [rows[i] for i in around.tolist()], STANDING_FIELDS)
+        PlayerStanding.objects.filter(tournament=tournament).update(
+            version=current_version(tournament))
+
+
+def getStoredRanking(tournament):
+    # Same result as getRanking, read from the PlayerStanding table
+    # Rows by points and the criteria of the ranking list, the ties by the
+    # player id as the other backends do
+    rankingList = tournament.getRankingCodes()
+    fields = ["points"] + [
+        RANKING_FIELDS[criterion] for criterion in rankingList
+        if criterion in RANKING_FIELDS
+        and criterion != RankingSystem.PLAIN_SCORE
+    ]
+
+    rows = list(
+        PlayerStanding.objects.filter(tournament=tournament)
+        .select_related("player")
+        .order_by(*[f"-{field}" for field in fields], "player_id")
+    )
+    # Any change of the tournament since the rows were written changed its
+    # version, build them again. The new rows are sorted here, reading them
+    # again could find them out of date once more
+    version = current_version(tournament)
+    if len(rows) != tournament.getPlayersCount() \
+            or any(row.version != version for row in rows):
+        rows = sorted(
+            rebuild_standings(tournament),
+            key=lambda row: tuple(-getattr(row, field) for field in fields)
+            + (row.player_id,)
+        )
+
+    tiebreaks = [value for value in rankingList if value in OPPONENT_TIEBREAKS]
+    ranking = {}
+    for rank, row in enumerate(rows, 1):
+        stats = {
+            RankingSystem.PLAIN_SCORE.value: row.points,
+            RankingSystem.WINS.value: row.wins,
+            RankingSystem.BLACKTIMES.value: row.black_times,
+        }
+        for criterion in tiebreaks:
+            stats[criterion] = getattr(row, RANKING_FIELDS[criterion])
+        stats["rank"] = rank
+        ranking[row.player] = stats
+
+    return ranking
@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.db.models import (
+    Case, When, Value, Sum, F, FloatField, IntegerField, OuterRef,
+    Subquery, Window
+)
+from django.db.models.functions import Coalesce, Rank
+
+from .constants import Scores, RankingSystem
+from .standings import point_tables, RESULT_INDEX
+from .tiebreaks import OPPONENT_TIEBREAKS, compute_tiebreaks
+from .tournament import getRanking, _rankPlayers
+from .player_standing import getStoredRanking
+
+
+# Annotation that holds the value of each ranking system in SQL
+SQL_COLUMNS = {
+    RankingSystem.PLAIN_SCORE.value: "ps",
+    RankingSystem.WINS.value: "wi",
+    RankingSystem.BLACKTIMES.value: "bt",
+}
+
+
+def _side_total(tournament, side, weights, output_field):
+    # Sum over the finished games of the outer player on the given side
+    # (white or black) of the weight given to each result
+    from .game import Game
+
+    total = Game.objects.filter(
+        round__tournament=tournament, finished=True, **{side: OuterRef("pk")}
+    ).values(side).annotate(
+        total=Sum(Case(
+            *[
+                When(result=result, then=Value(weight))
+                for result, weight in weights.items() if weight
+            ],
+            default=Value(0),
+            output_field=output_field,
+        ))
+    ).values("total")
+
+    return Coalesce(Subquery(total), Value(0), output_field=output_field)
+
+
+def _annotate_standings(tournament, players):
+    # PS, WI and BT of every player as conditional aggregates. The points
+    # of each result are the ones used by the Python engine
+    white, black = point_tables(tournament)
+    white_points = {
+        result: white[RESULT_INDEX[result]].item() for result in Scores.values
+    }
+    black_points = {
+        result: black[RESULT_INDEX[result]].item() for result in Scores.values
+    }
+    played = {Scores.WHITE: 1, Scores.BLACK: 1, Scores.DRAW: 1}
+
+    return players.annotate(
+        ps=_side_total(tournament, "white", white_points, FloatField())
+        + _side_total(tournament, "black", black_points, FloatField()),
+        wi=_side_total(tournament, "white", {Scores.WHITE: 1}, IntegerField())
+        + _side_total(tournament, "black", {Scores.BLACK: 1}, IntegerField()),
+        bt=_side_total(tournament, "black", played, IntegerField()),
+    )
+
+
+def getSQLRanking(tournament):
+    # Same result as getRanking, with PS, WI and BT aggregated by the
+    # database and the players ordered by a RANK window function
+    rankingList = tournament.getRankingCodes()
+    order = [F("ps").desc()] + [
+        F(SQL_COLUMNS[criterion]).desc() for criterion in rankingList
+        if criterion in SQL_COLUMNS
+        and criterion != RankingSystem.PLAIN_SCORE
+    ] + [F("id").asc()]
+
+    players = _annotate_standings(tournament, tournament.players.all())
+    players = players.annotate(
+        rank=Window(expression=Rank(), order_by=order)
+    ).order_by("rank")
+
+    return_dict = {
+        player: {
+            RankingSystem.PLAIN_SCORE.value: player.ps,
+            RankingSystem.WINS.value: player.wi,
+            RankingSystem.BLACKTIMES.value: player.bt,
+            "rank": player.rank,
+        }
+        for player in players
+    }
+
+    # Opponent based tie-breaks are not computed by the database, the
+    # players are ranked again with them
+    tiebreaks = [value for value in rankingList if value in OPPONENT_TIEBREAKS]
+    if tiebreaks:
+        tiebreak_dict = compute_tiebreaks(tournament, tiebreaks)
+        for player, stats in tiebreak_dict.items():
+            return_dict[player].update(stats)
+        return _rankPlayers(return_dict, rankingList)
+
+    return return_dict
+
+
+# Available ranking backends, the default one is set by RANKING_BACKEND
+RANKING_BACKENDS = {
+    "stored": getStoredRanking,
+    "python": getRanking,
+    "sql": getSQLRanking,
+}
+
+
+def computeRanking(tournament, backend=None):
+    if backend is None:
+        backend = getattr(settings, "RANKING_BACKEND", "stored")
+    return RANKING_BACKENDS[backend](tournament)
@@ -0,0 +1,139 @@
+import numpy as np
+
+from .constants import Scores
+from .standings import TournamentGames, RESULT_INDEX
+
+
+# FIDE rating difference dp for a fractional score p (FIDE B.02 8.1.2),
+# DP_TABLE[i] is dp for p = 0.50 + i / 100. Lower scores use -dp(1 - p)
+DP_TABLE = np.array([
+    0, 7, 14, 21, 29, 36, 43, 50, 57, 65,
+    72, 80, 87, 95, 102, 110, 117, 125, 133, 141,
+    149, 158, 166, 175, 184, 193, 202, 211, 220, 230,
+    240, 251, 262, 273, 284, 296, 309, 322, 336, 351,
+    366, 383, 401, 422, 444, 470, 501, 538, 589, 677,
+    800,
+])
+
+# Rating difference cut used for the expected score (FIDE B.02 8.3.1)
+MAX_DIFFERENCE = 400
+
+# Default development coefficient of the rating change
+DEFAULT_K = 20
+
+
+def rating_difference(p):
+    # dp of every fractional score p (0 <= p <= 1)
+    hundredths = np.rint(np.asarray(p) * 100).astype(np.int64)
+    return np.where(
+        hundredths >= 50,
+        DP_TABLE[np.clip(hundredths - 50, 0, 50)],
+        -DP_TABLE[np.clip(50 - hundredths, 0, 50)],
+    )
+
+
+def expected_score(rating, opponent_rating):
+    difference = np.clip(
+        opponent_rating - rating, -MAX_DIFFERENCE, MAX_DIFFERENCE
+    )
+    return 1 / (1 + 10 ** (difference / 400))
+
+
+class RatingReport:
+    """
+    Rating figures of every player of a tournament: average rating of
+    the opponents, score and expected score against them, tournament
+    performance rating (TPR) and rating change.
+
+    Only games played over the board against rated opponents count, with
+    FIDE scores (1, 0.5, 0) whatever the points of the tournament are. The
+    rating used is the one that sorts the players in getPlayers.
+    """
+
+    def __init__(self, tournament, k=DEFAULT_K):
+        self.tournament = tournament
+        self.k = k
+        self.field = tournament.getRatingField()
+        self.players = tournament.getPlayers(sorted=True)
+        games = TournamentGames(tournament, self.players)
+
+        # Rating vector, unrated players (0 or None) are NaN
+        ratings = np.array(
+            [getattr(player, self.field) or 0 for player in self.players],
+            dtype=float
+        )
+        self.rating = np.where(ratings > 0, ratings, np.nan)
+
+        # One entry for each side of the played games
+        played = games.is_result(Scores.WHITE, Scores.BLACK, Scores.DRAW) \
+            & (games.white >= 0) & (games.black >= 0)
+        white, black = games.white[played], games.black[played]
+        result = games.result[played]
+        white_score = np.select(
+            [result == RESULT_INDEX[Scores.WHITE],
+             result == RESULT_INDEX[Scores.DRAW]],
+            [1.0, 0.5], 0.0
+        )
+        player = np.concatenate([white, black])
+        opponent = np.concatenate([black, white])
+        score = np.concatenate([white_score, 1 - white_score])
+
+        # Only the games against rated opponents
+        rated = ~np.isnan(self.rating[opponent])
+        player, opponent = player[rated], opponent[rated]
+        score = score[rated]
+
+        def total(weights):
+            return games.accumulate(player, weights)
+
+        self.games = total(np.ones(len(player))).astype(np.int64)
+        self.score = total(score)
+        self.opponents_rating = self.average(
+            total(self.rating[opponent]))
+        self.expected = total(
+            expected_score(self.rating[player], self.rating[opponent]))
+
+        # Unrated players have no expected score nor rating change
+        unrated = np.isnan(self.rating) | (self.games == 0)
+        self.expected[unrated] = np.nan
+        self.rating_change = self.k * (self.score - self.expected)
+
+        self.performance = self.opponents_rating + rating_difference(
+            self.average(self.score, fill=0)
+        )
+
+    def average(self, values, fill=np.nan):
+        return np.divide(
+            values, self.games, out=np.full(len(values), fill, dtype=float),
+            where=self.games > 0
+        )
+
+    def rows(self):
+        # One dict per player, undefined values are None
+        def column(values):
+            return [
+                None if np.isnan(value) else value
+                for value in np.asarray(values, dtype=float).tolist()
+            ]
+
+        columns = zip(
+            column(self.rating), self.games.tolist(), self.score.tolist(),
+            column(self.opponents_rating), column(self.expected),
+            column(self.performance), column(self.rating_change),
+        )
+        return [
+            {
+                "player": player,
+                "rating": rating,
+                "games": games,
+                "score": score,
+                "opponents_rating": opponents_rating,
+                "expected": expected,
+                "performance": performance,
+                "rating_change": rating_change,
+            }
+            for player, (
+                rating, games, score, opponents_rating, expected,
+                performance, rating_change,
+            ) in zip(self.players, columns)
+        ]
@@ -0,0 +1,122 @@
+from django.db import models, transaction
+from django.utils import timezone
+
+from .player import Player
+from .constants import Scores
+from .standings import point_tables, RESULT_INDEX
+
+
+class Season(models.Model):
+    # Season name. Must be unique
+    name = models.CharField(max_length=128, unique=True)
+
+    # Tournaments played on the season
+    tournaments = models.ManyToManyField(
+        to="chess_models.Tournament", blank=True
+    )
+
+    # Last time the season standings were computed. Can be null
+    computed_date = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return self.name
+
+
+class SeasonStanding(models.Model):
+    # Season reference
+    season = models.ForeignKey(
+        to=Season, null=False, blank=False, on_delete=models.CASCADE
+    )
+
+    # Player reference
+    player = models.ForeignKey(
+        to=Player, null=False, blank=False, on_delete=models.CASCADE
+    )
+
+    # Totals of the player over the season tournaments
+    points = models.FloatField(default=0.0)
+    wins = models.IntegerField(default=0)
+    games = models.IntegerField(default=0)
+    tournaments = models.IntegerField(default=0)
+
+    # Position on the season leaderboard
+    rank = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("season", "player")
+        ordering = ["rank"]
+
+
+def compute_season(season_id):
+    # Returns {player_id: {points, wins, games, tournaments}} adding up the
+    # games of every tournament of the season. The games are streamed in a
+    # single ordered query and each one uses the points of its tournament
+    from .tournament import Tournament, TournamentPlayers
+    from .game import Game
+
+    tournaments = list(Tournament.objects.filter(season__id=season_id))
+    points = {
+        tournament.id: point_tables(tournament) for tournament in tournaments
+    }
+
+    # Every player of the tournaments is on the leaderboard
+    totals = {}
+    entries = TournamentPlayers.objects.filter(
+        tournament__in=tournaments
+    ).values_list("player_id", flat=True)
+    for player_id in entries:
+        stats = totals.setdefault(player_id, {
+            "points": 0.0, "wins": 0, "games": 0, "tournaments": 0,
+        })
+        stats["tournaments"] += 1
+
+    games = Game.objects.filter(
+        round__tournament__in=tournaments, finished=True
+    ).exclude(result=Scores.NOAVAILABLE).order_by(
+        "round__tournament_id", "round_id", "id"
+    ).values_list("round__tournament_id", "white_id", "black_id", "result")
+
+    for tournament_id, white_id, black_id, result in games.iterator():
+        index = RESULT_INDEX.get(result)
+        if index is None:
+            continue
+
+        white_points, black_points = points[tournament_id]
+        for player_id, player_points, won in [
+            (white_id, white_points[index], result == Scores.WHITE),
+            (black_id, black_points[index], result == Scores.BLACK),
+        ]:
+            if player_id not in totals:
+                continue
+            stats = totals[player_id]
+            stats["points"] += player_points.item()
+            stats["wins"] += int(won)
+            stats["games"] += 1
+
+    return totals
+
+
+def store_season(season_id, totals):
+    # Replace the season leaderboard, ranked by points, then wins
+    ranking = sorted(
+        totals.items(),
+        key=lambda item: (-item[1]["points"], -item[1]["wins"], item[0])
+    )
+    standings = [
+        SeasonStanding(season_id=season_id, player_id=player_id,
+                       rank=rank, **stats)
+        for rank, (player_id, stats) in enumerate(ranking, 1)
+    ]
+
+    with transaction.atomic():
+        SeasonStanding.objects.filter(season_id=season_id).delete()
+        SeasonStanding.objects.bulk_create(standings)
+        Season.objects.filter(id=season_id).update(
+            computed_date=timezone.now()
+        )
+
+    return standings
+
+
+def rebuild_season(season):
+    return store_season(season.id, compute_season(season.id))
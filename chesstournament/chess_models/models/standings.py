@@ -0,0 +1,189 @@
+from django.db import models
+import numpy as np
+import copy
+
+from .constants import Scores, RankingSystem
+
+
+# Position of each result inside the point tables used by the engine
+RESULT_INDEX = {value: index for index, value in enumerate(Scores.values)}
+
+
+def point_tables(tournament):
+    # Points given to the white and to the black player for every result.
+    # They follow the rules applied by get_wins
+    white = np.zeros(len(RESULT_INDEX))
+    black = np.zeros(len(RESULT_INDEX))
+
+    white[RESULT_INDEX[Scores.WHITE]] = tournament.win_points
+    black[RESULT_INDEX[Scores.WHITE]] = tournament.lose_points
+    white[RESULT_INDEX[Scores.BLACK]] = tournament.lose_points
+    black[RESULT_INDEX[Scores.BLACK]] = tournament.win_points
+    white[RESULT_INDEX[Scores.DRAW]] = tournament.draw_points
+    black[RESULT_INDEX[Scores.DRAW]] = tournament.draw_points
+
+    # Byes are given to the player of the game whatever his color is
+    for bye, points in [
+        (Scores.BYE_H, tournament.draw_points),
+        (Scores.BYE_F, tournament.win_points),
+        (Scores.BYE_U, tournament.win_points),
+    ]:
+        white[RESULT_INDEX[bye]] = points
+        black[RESULT_INDEX[bye]] = points
+
+    # Forfeits are stored with the winner as white
+    white[RESULT_INDEX[Scores.FORFEITWIN]] = tournament.win_points
+
+    return white, black
+
+
+class TournamentGames:
+    """
+    Finished games of a tournament loaded with a single query and stored
+    as flat NumPy arrays. Players are referenced by their position in
+    `players` (-1 when the game has no such player, e.g. a bye).
+    """
+
+    def __init__(self, tournament, players=None, involving=None):
+        from .game import Game
+
+        self.tournament = tournament
+
+        # Get the players and their ids
+        if players is None:
+            players = tournament.getPlayers()
+        self.players = players
+        self.ids = np.array(
+            [player.id for player in self.players], dtype=np.int64
+        )
+
+        # Get the games (only the finished ones with a result). If a list
+        # of player ids is given only their games are loaded
+        games = Game.objects.filter(
+            round__tournament=tournament, finished=True
+        ).exclude(result=Scores.NOAVAILABLE)
+        if involving is not None:
+            games = games.filter(
+                models.Q(white_id__in=involving)
+                | models.Q(black_id__in=involving)
+            )
+        rows = list(
+            games
+            .order_by("round_id", "id")
+            .values_list("id", "round_id", "white_id", "black_id", "result")
+        )
+        ids, rounds, whites, blacks, results = \
+            zip(*rows) if rows else [()] * 5
+
+        self.game = np.array(ids, dtype=np.int64)
+        self.round = np.array(rounds, dtype=np.int64)
+        self.white = self.index_of(whites)
+        self.black = self.index_of(blacks)
+        self.result = np.array(
+            [RESULT_INDEX.get(result, -1) for result in results],
+            dtype=np.int8
+        )
+
+        # Unknown results do not give points to anyone
+        valid = self.result >= 0
+        self.white[~valid] = -1
+        self.black[~valid] = -1
+        self.result[~valid] = RESULT_INDEX[Scores.NOAVAILABLE]
+
+    def __len__(self):
+        return len(self.players)
+
+    def until(self, round_id):
+        # Same players with only the games of the rounds up to the given one
+        games = copy.copy(self)
+        mask = self.round <= round_id
+        for name in ["game", "round", "white", "black", "result"]:
+            setattr(games, name, getattr(self, name)[mask])
+        return games
+
+    def index_of(self, ids):
+        # Translate the player ids to positions on the players list
+        ids = np.array(
+            [-1 if id is None else id for id in ids], dtype=np.int64
+        )
+        if len(self.ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+
+        order = np.argsort(self.ids)
+        position = np.searchsorted(self.ids, ids, sorter=order)
+        index = order[np.minimum(position, len(order) - 1)]
+
+        return np.where(self.ids[index] == ids, index, -1)
+
+    def accumulate(self, index, weights):
+        # Add the weights of every game to the player on the index array
+        mask = index >= 0
+        return np.bincount(
+            index[mask], weights=weights[mask], minlength=len(self)
+        )
+
+    def is_result(self, *results):
+        return np.isin(self.result, [RESULT_INDEX[r] for r in results])
+
+    def points(self):
+        white, black = point_tables(self.tournament)
+        return (
+            self.accumulate(self.white, white[self.result])
+            + self.accumulate(self.black, black[self.result])
+        )
+
+    def wins(self):
+        return (
+            self.accumulate(self.white, self.is_result(Scores.WHITE))
+            + self.accumulate(self.black, self.is_result(Scores.BLACK))
+        ).astype(np.int64)
+
+    def black_times(self):
+        played = self.is_result(Scores.WHITE, Scores.BLACK, Scores.DRAW)
+        return self.accumulate(self.black, played).astype(np.int64)
+
+
+def cumulative_standings(games, round_ids):
+    # PS, WI and BT after each round as (rounds x players) arrays. The
+    # values of every round are added in one pass and then accumulated
+    # along the rounds. round_ids must be sorted
+    stage = np.searchsorted(round_ids, games.round)
+
+    def table(index, weights):
+        mask = (index >= 0) & (stage < len(round_ids))
+        values = np.zeros((len(round_ids), len(games)))
+        np.add.at(values, (stage[mask], index[mask]), weights[mask])
+        return values.cumsum(axis=0)
+
+    white, black = point_tables(games.tournament)
+    points = table(games.white, white[games.result]) \
+        + table(games.black, black[games.result])
+    wins = table(games.white, games.is_result(Scores.WHITE)) \
+        + table(games.black, games.is_result(Scores.BLACK))
+    black_times = table(
+        games.black, games.is_result(Scores.WHITE, Scores.BLACK, Scores.DRAW)
+    )
+
+    return points, wins.astype(np.int64), black_times.astype(np.int64)
+
+
+def compute_standings(tournament, games=None):
+    # Returns {player: {PS: points, WI: wins, BT: black times}} computing
+    # every player in a single pass over the tournament games
+    if games is None:
+        games = TournamentGames(tournament)
+
+    columns = zip(
+        games.points().tolist(),
+        games.wins().tolist(),
+        games.black_times().tolist(),
+    )
+
+    return {
+        player: {
+            RankingSystem.PLAIN_SCORE.value: points,
+            RankingSystem.WINS.value: wins,
+            RankingSystem.BLACKTIMES.value: black_times,
+        }
+        for player, (points, wins, black_times) in zip(games.players, columns)
+    }
@@ -0,0 +1,581 @@
+from itertools import groupby
+
+import networkx as nx
+
+from .constants import Scores, RankingSystem
+from .standings import TournamentGames, compute_standings
+from .tiebreaks import OPPONENT_TIEBREAKS, compute_tiebreaks
+
+
+# Colours of the colour history and preferences
+WHITE, BLACK = 1, -1
+
+# Strength of a colour preference (FIDE C.04.3 A.6)
+NONE, MILD, STRONG, ABSOLUTE = range(4)
+
+# Results that give points without playing. A player who got one of them
+# can not receive the pairing-allocated bye again
+UNPLAYED_POINTS = [Scores.BYE_U, Scores.BYE_F, Scores.FORFEITWIN]
+
+# Played games: they count as met opponents and for the colours. Forfeits
+# do not, the players may be paired again
+PLAYED = [Scores.WHITE, Scores.BLACK, Scores.DRAW, Scores.NOAVAILABLE]
+
+# Transpositions of S2 looked at in a bracket before it is left to the
+# matching
+SEARCH_LIMIT = 20000
+
+# Initial width of the window of candidate opponents of each player in a
+# bracket paired by the matching. It is doubled until every player that
+# can be paired is
+WINDOW = 8
+
+# Natural pairs of each block a large bracket is split in by the matching
+BLOCK = 32
+
+# Node of the matching graph taken by the player that floats down from a
+# bracket with an odd number of players
+FLOAT = "float"
+
+
+class SwissPairing:
+    """
+    Pairings of the next round of a swiss tournament with the Dutch system.
+    Players are ordered as in the ranking (score, the tie-breaks of the
+    tournament and then the pairing number, given by the rating) and paired
+    bracket by bracket, from the top score down. FIDE orders the brackets
+    by pairing number only, so the tournaments with tie-breaks can be
+    paired differently than with a certified engine.
+
+    In each bracket the players that floated down from the one above are
+    paired first, each one with the highest resident unless the pair is not
+    allowed (a rematch or two players with the same absolute colour
+    preference), does not grant a strong colour preference or leaves the
+    rest unpairable. Then it gets the highest resident that grants the most
+    preferences. When the rest of the bracket is odd, its lowest player
+    that leaves the others pairable floats down. The others are split in
+    two halves, S1 against S2, and the natural pairing is kept when every
+    pair is allowed and grants both colour preferences. Otherwise the first
+    transposition of S2 that grants the most preferences, the strong ones
+    first, is taken.
+
+    When every transposition has a pair that is not allowed, or there are
+    too many to look at, the bracket is paired with a maximum weight
+    matching of the same criteria, which can also exchange players between
+    S1 and S2.
+    """
+
+    def __init__(self, tournament, byes=()):
+        from .game import Game
+
+        self.tournament = tournament
+        players = tournament.getPlayers(sorted=True)
+
+        # Pairing number of each player, given by the rating
+        self.number = {player.id: n for n, player in enumerate(players)}
+        field = tournament.getRatingField()
+        self.rating = {
+            player.id: getattr(player, field, 0) or 0 for player in players
+        }
+
+        # Score and tie-breaks of every player, they are paired in the
+        # order of the ranking
+        games = TournamentGames(tournament, players)
+        standings = compute_standings(tournament, games)
+        codes = tournament.getRankingCodes()
+        tiebreaks = [code for code in codes if code in OPPONENT_TIEBREAKS]
+        if tiebreaks:
+            for player, stats in compute_tiebreaks(
+                    tournament, tiebreaks, games).items():
+                standings[player].update(stats)
+        self.score = {
+            player.id: standings[player][RankingSystem.PLAIN_SCORE.value]
+            for player in players
+        }
+        rank = {
+            player.id: (-self.score[player.id],)
+            + tuple(-standings[player].get(code, 0) for code in codes)
+            + (self.number[player.id],)
+            for player in players
+        }
+        self.order = sorted(self.number, key=rank.get)
+        self.position = {id: n for n, id in enumerate(self.order)}
+
+        # Opponents, colours and byes of the previous rounds
+        self.opponents = {id: set() for id in self.order}
+        self.colours = {id: [] for id in self.order}
+        self.had_bye = set()
+        games = Game.objects.filter(
+            round__tournament=tournament
+        ).order_by("round_id", "id").values_list(
+            "white_id", "black_id", "result"
+        )
+        for white, black, result in games:
+            if white not in self.opponents or black not in self.opponents:
+                if result in UNPLAYED_POINTS and white in self.opponents:
+                    self.had_bye.add(white)
+                continue
+            if result in UNPLAYED_POINTS:
+                self.had_bye.add(white)
+            if result not in PLAYED:
+                continue
+            self.opponents[white].add(black)
+            self.opponents[black].add(white)
+            self.colours[white].append(WHITE)
+            self.colours[black].append(BLACK)
+        self.preferences = {id: self.preference(id) for id in self.order}
+
+        # Players that asked for a half point bye this round
+        self.byes = sorted(
+            {id for id in byes if id in self.position},
+            key=self.number.get
+        )
+
+    def pair(self):
+        # Returns (half point byes, pairing-allocated bye or None, pairs)
+        # with the pairs as (white, black) ordered by board
+        players = [id for id in self.order if id not in self.byes]
+
+        bye = None
+        if len(players) % 2:
+            bye = self.choose_bye(players)
+            players.remove(bye)
+
+        pairs = sorted(self.pair_players(players),
+                       key=lambda pair: min(map(self.number.get, pair)))
+        pairs = [self.colours_of(a, b, board)
+                 for board, (a, b) in enumerate(pairs)]
+
+        return self.byes, bye, pairs
+
+    def choose_bye(self, players):
+        # Lowest ranked player that did not get a point without playing and
+        # leaves a field that can be paired
+        candidates = [id for id in reversed(players)
+                      if id not in self.had_bye] or players[::-1]
+        for id in candidates:
+            if self.pairable([other for other in players if other != id]):
+                return id
+
+        return candidates[0]
+
+    def allowed(self, a, b):
+        # Absolute criteria: no rematches and no pair of players with the
+        # same absolute colour preference
+        return b not in self.opponents[a] \
+            and self.colour_conflict(a, b) != ABSOLUTE
+
+    def pairable(self, players):
+        # True if every player can be paired without a rematch. A greedy
+        # pass repaired with swaps is tried first, the matching only when
+        # it fails
+        pairs, waiting = [], []
+        for id in players:
+            opponent = next(
+                (other for other in waiting if self.allowed(id, other)), None
+            )
+            if opponent is None:
+                waiting.append(id)
+            else:
+                waiting.remove(opponent)
+                pairs.append((opponent, id))
+
+        # Two waiting players take the places of a pair that can be split
+        while waiting:
+            first = waiting.pop()
+            swap = next((
+                (n, a, b, other)
+                for n, pair in enumerate(pairs) for a, b in [pair, pair[::-1]]
+                if self.allowed(first, a)
+                for other in waiting if self.allowed(other, b)
+            ), None)
+            if swap is None:
+                break
+            n, a, b, other = swap
+            waiting.remove(other)
+            pairs[n] = (first, a)
+            pairs.append((other, b))
+        else:
+            return True
+
+        graph = nx.Graph()
+        graph.add_nodes_from(players)
+        graph.add_edges_from(
+            (a, b, {"weight": 1.0})
+            for i, a in enumerate(players) for b in players[i + 1:]
+            if self.allowed(a, b)
+        )
+        matching = nx.max_weight_matching(graph, maxcardinality=True)
+        return 2 * len(matching) == len(players)
+
+    def floater(self, players, lower):
+        # Player of an odd group that floats down: the lowest one that
+        # leaves the others pairable and can be paired with the players
+        # below. None if there is no such player
+        for id in reversed(players):
+            rest = [other for other in players if other != id]
+            if self.pairable(rest) and self.pairable([id] + lower):
+                return id
+
+        return None
+
+    def completes(self, players, lower):
+        # True if the rest of a bracket can be paired, all of it or all but
+        # the player that floats down
+        if len(players) % 2 == 0:
+            return self.pairable(players)
+        return self.floater(players, lower) is not None
+
+    def pair_players(self, players):
+        # Pair the brackets from the top score down. The players left
+        # unpaired on a bracket float down to the next one
+        brackets = [
+            list(group)
+            for _, group in groupby(players, key=self.score.get)
+        ]
+
+        pairs = []
+        floaters = []
+        for index, residents in enumerate(brackets):
+            lower = [id for bracket in brackets[index + 1:] for id in bracket]
+            matched, unmatched = self.pair_bracket(floaters, residents, lower)
+
+            if not lower:
+                # Last bracket, rematches are allowed for the players that
+                # can not be paired in any other way
+                if unmatched:
+                    extra, unmatched = self.match(unmatched, rematches=True)
+                    matched += extra
+            elif not self.pairable(unmatched + lower):
+                # The rest of the field can not be completed, the whole
+                # bracket floats down
+                floaters = floaters + residents
+                continue
+
+            pairs += matched
+            floaters = unmatched
+
+        return pairs
+
+    def pair_bracket(self, floaters, residents, lower):
+        # Returns (pairs, unpaired players) of the bracket. The players that
+        # floated down are paired first, those that can not be join the
+        # residents
+        pairs = []
+        residents = list(residents)
+        waiting = []
+        for n, floater in enumerate(floaters):
+            rest = waiting + floaters[n + 1:] + residents
+            opponent = self.opponent_of(floater, residents, rest, lower)
+            if opponent is None:
+                waiting.append(floater)
+            else:
+                residents.remove(opponent)
+                pairs.append((floater, opponent))
+
+        group = waiting + residents
+        unpaired = []
+        if len(group) % 2:
+            floater = self.floater(group, lower)
+            if floater is None:
+                matched, unpaired = self.match(group)
+                return pairs + matched, unpaired
+            group.remove(floater)
+            unpaired.append(floater)
+
+        half = len(group) // 2
+        matched = self.pair_halves(group[:half], group[half:])
+        if matched is None:
+            matched, left = self.match(group)
+            unpaired = sorted(left + unpaired, key=self.position.get)
+
+        return pairs + matched, unpaired
+
+    def opponent_of(self, floater, residents, rest, lower):
+        # Resident paired with a player that floated down. The highest one
+        # is kept unless the pair is not allowed, does not grant a strong
+        # colour preference or leaves the rest of the bracket unpairable.
+        # Otherwise the highest one that grants the most preferences
+        def completes(id):
+            return self.completes([other for other in rest if other != id],
+                                  lower)
+
+        if residents and self.allowed(floater, residents[0]) \
+                and not self.cost(floater, residents[0])[0] \
+                and completes(residents[0]):
+            return residents[0]
+
+        candidates = sorted(
+            (id for id in residents if self.allowed(floater, id)),
+            key=lambda id: (self.cost(floater, id), self.position[id])
+        )
+        return next((id for id in candidates if completes(id)), None)
+
+    def pair_halves(self, s1, s2):
+        # S1 against S2, the natural pairing when it grants every colour
+        # preference or the best transposition of S2. None if every
+        # transposition has a pair that is not allowed
+        natural = list(zip(s1, s2))
+        if all(self.allowed(a, b) and self.cost(a, b) == (0, 0)
+               for a, b in natural):
+            return natural
+
+        order = self.transpose(s1, s2)
+        if order is None:
+            return None
+        return [(a, s2[j]) for a, j in zip(s1, order)]
+
+    def transpose(self, s1, s2):
+        # Positions in S2 of the opponents of S1 for the first transposition,
+        # in lexicographic order, with the fewest strong colour conflicts
+        # and then the fewest conflicts. It is searched with increasing
+        # limits of both counts, pruned with the conflicts that the players
+        # left can not avoid. None when every transposition has a pair that
+        # is not allowed or the search takes too long
+        size = len(s1)
+        costs = [
+            [(j, self.cost(a, b)) for j, b in enumerate(s2)
+             if self.allowed(a, b)]
+            for a in s1
+        ]
+
+        # Players of each half that want white, black, white strongly and
+        # black strongly. The ones of S1 from each position on and the ones
+        # of S2 not paired yet
+        def wants(id):
+            colour, strength = self.preferences[id]
+            return [int(strength != NONE and colour == WHITE),
+                    int(strength != NONE and colour == BLACK),
+                    int(strength >= STRONG and colour == WHITE),
+                    int(strength >= STRONG and colour == BLACK)]
+
+        second = [wants(id) for id in s2]
+        left = [[0] * 4]
+        for id in reversed(s1):
+            left.insert(0, [a + b for a, b in zip(left[0], wants(id))])
+        free = [sum(column) for column in zip(*second)] if second else [0] * 4
+
+        def unavoidable(i):
+            # (strong, all) conflicts of the pairs from the i-th player of S1
+            n = size - i
+            counts = [a + b - n for a, b in zip(left[i], free)]
+            return (max(0, counts[2]) + max(0, counts[3]),
+                    max(0, counts[0]) + max(0, counts[1]))
+
+        used = [False] * size
+        budget = [SEARCH_LIMIT]
+
+        def search(i, strong, conflicts, limit):
+            if i == size:
+                return []
+            budget[0] -= 1
+            if budget[0] < 0:
+                return None
+            for j, (s, c) in costs[i]:
+                if used[j]:
+                    continue
+                used[j] = True
+                for k, count in enumerate(second[j]):
+                    free[k] -= count
+                bound = unavoidable(i + 1)
+                if strong + s + bound[0] <= limit[0] \
+                        and conflicts + c + bound[1] <= limit[1]:
+                    rest = search(i + 1, strong + s, conflicts + c, limit)
+                else:
+                    rest = None
+                for k, count in enumerate(second[j]):
+                    free[k] += count
+                used[j] = False
+                if rest is not None:
+                    return [j] + rest
+                if budget[0] < 0:
+                    return None
+            return None
+
+        lowest = unavoidable(0)
+        for strong in range(lowest[0], size + 1):
+            for conflicts in range(max(lowest[1], strong), size + 1):
+                order = search(0, 0, 0, (strong, conflicts))
+                if order is not None or budget[0] < 0:
+                    return order
+
+        return None
+
+    def natural_targets(self, group):
+        # Position of the natural opponent of each player of the group,
+        # S1 against S2. The last one of an odd group floats
+        half = len(group) // 2
+        targets = {}
+        for i in range(half):
+            targets[group[i]] = half + i
+            targets[group[half + i]] = i
+        if len(group) % 2:
+            targets[group[-1]] = len(group) - 1
+
+        return targets
+
+    def match(self, group, rematches=False):
+        # Returns (pairs, unpaired players) of a group paired with a maximum
+        # weight matching. Large groups are split in blocks of consecutive
+        # natural pairs, each one paired by its own matching. The players
+        # left unpaired by the blocks are matched together at the end
+        if len(group) < 2:
+            return [], list(group)
+
+        targets = self.natural_targets(group)
+        natural = [
+            (a, group[targets[a]]) for i, a in enumerate(group)
+            if i < targets[a]
+        ]
+        paired = {id for pair in natural for id in pair}
+        left = [id for id in group if id not in paired]
+        pairs = []
+        for start in range(0, len(natural), BLOCK):
+            block = [id for pair in natural[start:start + BLOCK]
+                     for id in pair]
+            if start + BLOCK >= len(natural):
+                block += left
+                left = []
+            matched, unmatched = self.match_block(
+                group, block, targets, rematches)
+            pairs += matched
+            left += unmatched
+
+        if len(left) > 1 and len(natural) > BLOCK:
+            matched, left = self.match_block(group, left, targets, rematches)
+            pairs += matched
+
+        pairs.sort(key=lambda pair: self.position[pair[0]])
+        left.sort(key=self.position.get)
+        return pairs, left
+
+    def match_block(self, group, players, targets, rematches):
+        # Maximum weight matching of some players of the group, returns
+        # (pairs, unpaired players)
+        size = len(group)
+        scale = 2 * (size + 1) ** 3
+        weights = {
+            "strong": scale,
+            "colour": scale * (size + 1),
+            "absolute": scale * (size + 1) ** 2,
+            "rematch": scale * (size + 1) ** 3,
+        }
+        weights["base"] = 2 * weights["rematch"]
+
+        index = {id: i for i, id in enumerate(group)}
+        players = sorted(players, key=index.get)
+        width = WINDOW
+        while True:
+            graph = self.bracket_graph(
+                players, index, targets, width, weights, rematches)
+            matching = nx.max_weight_matching(graph, maxcardinality=True)
+            pairs = [
+                tuple(sorted((a, b), key=self.position.get))
+                for a, b in matching if FLOAT not in (a, b)
+            ]
+            paired = {id for pair in pairs for id in pair}
+            unpaired = [id for id in players if id not in paired]
+            if len(unpaired) <= len(players) % 2 or width >= size:
+                break
+            width *= 2
+
+        return pairs, unpaired
+
+    def bracket_graph(self, players, index, targets, width, weights,
+                      rematches):
+        graph = nx.Graph()
+        graph.add_nodes_from(players)
+
+        for n, a in enumerate(players):
+            i = index[a]
+            for b in players[n + 1:]:
+                j = index[b]
+                if abs(j - targets[a]) > width \
+                        and abs(i - targets[b]) > width:
+                    continue
+                if not rematches and not self.allowed(a, b):
+                    continue
+
+                # Distance to the natural pairing of both players
+                cost = (j - targets[a]) ** 2 + (i - targets[b]) ** 2
+                conflict = self.colour_conflict(a, b)
+                if conflict != NONE:
+                    cost += weights["colour"]
+                if conflict >= STRONG:
+                    cost += weights["strong"]
+                if conflict == ABSOLUTE:
+                    cost += weights["absolute"]
+                if not self.allowed(a, b):
+                    cost += weights["rematch"]
+                graph.add_edge(a, b, weight=weights["base"] - cost)
+
+        # The lowest players are the ones that should float down
+        if len(players) % 2:
+            for a in players:
+                cost = (len(index) - 1 - index[a]) ** 2
+                graph.add_edge(FLOAT, a, weight=weights["base"] - cost)
+
+        return graph
+
+    def preference(self, id):
+        # (colour, strength) of the colour preference of the player
+        colours = self.colours[id]
+        if not colours:
+            return 0, NONE
+
+        difference = sum(colours)
+        if abs(difference) > 1:
+            return -difference // abs(difference), ABSOLUTE
+        if len(colours) > 1 and colours[-1] == colours[-2]:
+            return -colours[-1], ABSOLUTE
+        if difference:
+            return -difference, STRONG
+        return -colours[-1], MILD
+
+    def colour_conflict(self, a, b):
+        # Strength of the preference that can not be granted to a player
+        # because both of them want the same colour
+        colour_a, strength_a = self.preferences[a]
+        colour_b, strength_b = self.preferences[b]
+        if colour_a != colour_b or min(strength_a, strength_b) == NONE:
+            return NONE
+
+        return min(strength_a, strength_b)
+
+    def cost(self, a, b):
+        # (strong, any) colour conflict of the pair, 0 or 1 each
+        conflict = self.colour_conflict(a, b)
+        return int(conflict >= STRONG), int(conflict != NONE)
+
+    def colours_of(self, a, b, board=0):
+        # (white, black) of the pair following FIDE C.04.3 E, `a` is the
+        # higher ranked player and `board` the index of the pair
+        if self.position[b] < self.position[a]:
+            a, b = b, a
+        colour_a, strength_a = self.preferences[a]
+        colour_b, strength_b = self.preferences[b]
+
+        colour = None
+        if colour_a and colour_a != colour_b:
+            colour = colour_a
+        elif colour_b and colour_a != colour_b:
+            colour = -colour_b
+        elif colour_a:
+            # Same preference, the stronger one is granted. Otherwise the
+            # colours alternate from the last round they were different
+            if strength_a != strength_b:
+                colour = colour_a if strength_a > strength_b else -colour_b
+            else:
+                for own, other in zip(self.colours[a][::-1],
+                                      self.colours[b][::-1]):
+                    if own != other:
+                        colour = -own
+                        break
+
+        if colour is None:
+            # First round, or the same colours in every round: they
+            # alternate with the boards, white for the higher ranked player
+            # on the first one
+            colour = WHITE if board % 2 == 0 else BLACK
+
+        return (a, b) if colour == WHITE else (b, a)
@@ -0,0 +1,171 @@
+import numpy as np
+
+from .constants import Scores, RankingSystem
+from .standings import TournamentGames, point_tables, RESULT_INDEX
+
+
+# Tie-breaks that depend on the scores of the opponents
+OPPONENT_TIEBREAKS = [
+    RankingSystem.BUCHHOLZ.value,
+    RankingSystem.BUCHHOLZ_CUT1.value,
+    RankingSystem.BUCHHOLZ_AVERAGE.value,
+    RankingSystem.SONNEBORN_BERGER.value,
+]
+
+
+class TieBreakEngine:
+    """
+    Opponent based tie-breaks (FIDE C.07) computed for every player at once.
+
+    Every side of a finished game is an entry. The entries of the games
+    actually played are kept as (player, opponent, points) arrays and the
+    tie-breaks add them up per player, so the memory grows with the games
+    and not with the square of the players. Unplayed rounds (byes and
+    forfeits) are evaluated as games against a virtual opponent with the
+    player's own score. Voluntarily unplayed rounds at the end of
+    the tournament count as draws when the player is someone's opponent.
+    """
+
+    def __init__(self, tournament, games=None):
+        if games is None:
+            games = TournamentGames(tournament)
+        self.games = games
+        n = len(games)
+
+        # One entry for each side of every game
+        white_points, black_points = point_tables(tournament)
+        self.player = np.concatenate([games.white, games.black])
+        self.opponent = np.concatenate([games.black, games.white])
+        self.round = np.concatenate([games.round, games.round])
+        self.game = np.concatenate([games.game, games.game])
+        result = np.concatenate([games.result, games.result])
+        self.points = np.concatenate([
+            white_points[games.result], black_points[games.result]
+        ])
+        self.is_white = np.arange(len(self.player)) < len(games.result)
+
+        # Ignore the empty side of the byes
+        mask = self.player >= 0
+        self.player = self.player[mask]
+        self.opponent = self.opponent[mask]
+        self.round = self.round[mask]
+        self.game = self.game[mask]
+        self.points = self.points[mask]
+        self.is_white = self.is_white[mask]
+        result = result[mask]
+
+        def is_result(*results):
+            return np.isin(result, [RESULT_INDEX[r] for r in results])
+
+        # Played games and voluntarily unplayed rounds (VUR)
+        self.played = is_result(Scores.WHITE, Scores.BLACK, Scores.DRAW) \
+            & (self.opponent >= 0)
+        self.vur = is_result(Scores.BYE_H, Scores.BYE_Z) \
+            | (self.is_white & is_result(Scores.FORFEITLOSS)) \
+            | (~self.is_white & is_result(Scores.FORFEITWIN))
+        unplayed = ~self.played
+
+        # Games actually played: player, opponent and points of each entry
+        self.played_player = self.player[self.played]
+        self.played_opponent = self.opponent[self.played]
+        self.played_points = self.points[self.played]
+
+        # Vectors with the score and the unplayed rounds of every player
+        self.score = games.points()
+        self.unplayed_count = games.accumulate(
+            self.player[unplayed], np.ones(unplayed.sum()))
+        self.unplayed_points = games.accumulate(
+            self.player[unplayed], self.points[unplayed])
+        self.vur_count = games.accumulate(
+            self.player[self.vur], np.ones(self.vur.sum()))
+
+        # VURs after the last round that was not a VUR count as draws
+        last_round = np.full(n, -1, dtype=np.int64)
+        np.maximum.at(last_round, self.player[~self.vur],
+                      self.round[~self.vur])
+        trailing = self.vur & (self.round > last_round[self.player])
+        self.adjusted_score = self.score + games.accumulate(
+            self.player[trailing],
+            tournament.draw_points - self.points[trailing]
+        )
+
+    # The opponents' adjusted scores and Buchholz can be given, so that
+    # only the rows of the players whose games were loaded are needed
+
+    def opponents_total(self, values, weights=None):
+        # Sum over the games played by every player of the values of the
+        # opponents, times the weights of the entries if given. bincount
+        # gives integers when there are no games, the sums are floats
+        values = values[self.played_opponent]
+        if weights is not None:
+            values = values * weights
+        return self.games.accumulate(
+            self.played_player, values).astype(float)
+
+    def buchholz(self, adjusted_score=None):
+        if adjusted_score is None:
+            adjusted_score = self.adjusted_score
+        return (
+            self.opponents_total(adjusted_score)
+            + self.unplayed_count * self.score
+        )
+
+    def buchholz_cut1(self, adjusted_score=None):
+        if adjusted_score is None:
+            adjusted_score = self.adjusted_score
+
+        # VURs are the first ones to be cut, otherwise the lowest opponent
+        lowest = np.full(len(self.games), np.inf)
+        np.minimum.at(lowest, self.played_player,
+                      adjusted_score[self.played_opponent])
+        lowest = np.minimum(
+            lowest, np.where(self.unplayed_count > 0, self.score, np.inf))
+        cut = np.where(self.vur_count > 0, self.score, lowest)
+
+        return self.buchholz(adjusted_score) \
+            - np.where(np.isfinite(cut), cut, 0)
+
+    def buchholz_average(self, buchholz=None):
+        if buchholz is None:
+            buchholz = self.buchholz()
+
+        # Average of the Buchholz of the opponents actually played
+        played = self.opponents_total(np.ones(len(self.games)))
+        total = self.opponents_total(buchholz)
+        return np.divide(
+            total, played, out=np.zeros_like(total), where=played > 0)
+
+    def sonneborn_berger(self, adjusted_score=None):
+        if adjusted_score is None:
+            adjusted_score = self.adjusted_score
+        return (
+            self.opponents_total(adjusted_score, self.played_points)
+            + self.unplayed_points * self.score
+        )
+
+    def opponents_of(self, index):
+        # Positions of the players that played against any of the given ones
+        return np.unique(
+            self.played_opponent[np.isin(self.played_player, index)])
+
+    def compute(self, systems=OPPONENT_TIEBREAKS):
+        # Returns {player: {system: value}} for the requested tie-breaks
+        methods = {
+            RankingSystem.BUCHHOLZ.value: self.buchholz,
+            RankingSystem.BUCHHOLZ_CUT1.value: self.buchholz_cut1,
+            RankingSystem.BUCHHOLZ_AVERAGE.value: self.buchholz_average,
+            RankingSystem.SONNEBORN_BERGER.value: self.sonneborn_berger,
+        }
+        columns = {
+            system: methods[system]().tolist()
+            for system in systems if system in methods
+        }
+
+        return {
+            player: {system: values[i] for system, values in columns.items()}
+            for i, player in enumerate(self.games.players)
+        }
+
+
+def compute_tiebreaks(tournament, systems=OPPONENT_TIEBREAKS, games=None):
+    return TieBreakEngine(tournament, games).compute(systems)
@@ -1,5 +1,8 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
+import numpy as np
+import time
 
 from .player import Player
 from .other_models import Referee
@@ -10,6 +13,10 @@ from .constants import (
     RankingSystem,
     Scores,
 )
+from .standings import (
+    TournamentGames, compute_standings, cumulative_standings
+)
+from .tiebreaks import TieBreakEngine, OPPONENT_TIEBREAKS, compute_tiebreaks
 
 
 class RankingSystemClass(models.Model):
@@ -18,6 +25,12 @@ class RankingSystemClass(models.Model):
     )
 
 
+def new_version():
+    # Versions start from the creation time, so that a tournament created
+    # again with the same id does not reuse the cached payloads of the old one
+    return time.time_ns() // 1000
+
+
 class Tournament(models.Model):
     # Tournament name. Can be null or blank, and must be unique
     name = models.CharField(
@@ -81,15 +94,55 @@ class Tournament(models.Model):
     # Number of rounds for swiss
     number_of_rounds_for_swiss = models.IntegerField(default=0)
 
+    # Result given to the player paired with the bye slot of an odd round
+    # robin, a full, half or unplayed game point bye
+    bye_score = models.CharField(
+        choices=[
+            (score.value, score.label)
+            for score in [Scores.BYE_F, Scores.BYE_H, Scores.BYE_U]
+        ],
+        max_length=1, default=Scores.BYE_U
+    )
+
+    # Create the rounds of a round robin one by one, when the director
+    # opens them, instead of every round at once
+    lazy_rounds = models.BooleanField(default=False)
+
+    # Player ids in pairing number order of a lazy round robin, its rounds
+    # are built again from them with the Berger tables
+    seed_order = models.JSONField(null=True, blank=True)
+
     # List of classification system,
     # associated with a tournament through the tournament ranking system
     rankingList = models.ManyToManyField(
         to=RankingSystemClass, blank=True
     )  # null=True has no effects
 
+    # Start time of the first Lichess game not seen yet by
+    # discover_lichess_results, the next sync asks the games since then
+    lichess_synced_at = models.DateTimeField(null=True, blank=True)
+
+    # Version of the games, rounds and players of the tournament. Changed
+    # by bump_version every time they are modified
+    version = models.BigIntegerField(default=new_version)
+
     def __str__(self):
         return f"tournament_{self.id:02d}"
 
+    def save(self, *args, **kwargs):
+        # The version is only written by bump_version, saving an old copy
+        # of the tournament must not take it back
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "version"
+            ]
+        super().save(*args, **kwargs)
+
+        # The points given by each result may have changed
+        if "update_fields" in kwargs:
+            bump_version(pk=self.pk)
+
     def getGames(self):
         games = []
         for round in self.round_set.all():
@@ -112,6 +165,13 @@ class Tournament(models.Model):
         if not sorted:
             return list(players)
 
+        # Sort players by the classification
+        return self.sort_players(players, self.getRatingField())
+
+    def getRatingField(self):
+        # Player rating used by the tournament, given by its speed and
+        # by the classification used (lichess or fide)
+
         # Map to avoid if-elif-elif...
         rating_type_mapping = {
             TournamentSpeed.BLITZ: "blitz",
@@ -129,8 +189,7 @@ class Tournament(models.Model):
         else:
             rating_attr = f"fide_rating_{rating_type}"
 
-        # Sort players by the classification
-        return self.sort_players(players, rating_attr)
+        return rating_attr
 
     def getPlayersCount(self):
         return self.players.all().count()
@@ -139,11 +198,27 @@ class Tournament(models.Model):
         self.rankingList.clear()
 
     def addToRankingList(self, rankingSystem):
-        createdRankingSystem = RankingSystemClass.objects.create(
+        createdRankingSystem, _ = RankingSystemClass.objects.get_or_create(
             value=rankingSystem
         )
         self.rankingList.add(createdRankingSystem)
 
+    def getRankingList(self):
+        # RankingSystemClass objects in the order they were added to the
+        # tournament
+        codes = self.getRankingCodes()
+        systems = RankingSystemClass.objects.in_bulk(codes)
+        return [systems[code] for code in codes]
+
+    def getRankingCodes(self):
+        # Values of the ranking systems in the order they were added to the
+        # tournament, used by the ranking engines
+        return list(
+            Tournament.rankingList.through.objects.filter(tournament=self)
+            .order_by("id")
+            .values_list("rankingsystemclass_id", flat=True)
+        )
+
     def getRoundCount(self):
         from .round import Round
 
@@ -191,6 +266,21 @@ class Tournament(models.Model):
         return last_round
 
 
+def unfinished_tournaments():
+    # Tournaments without end date or ending today or later
+    return Tournament.objects.filter(
+        models.Q(end_date__isnull=True)
+        | models.Q(end_date__gte=timezone.localdate())
+    )
+
+
+def bump_version(**filters):
+    # Invalidate the cached payloads of the tournaments matching the filters
+    Tournament.objects.filter(**filters).update(
+        version=models.F("version") + 1
+    )
+
+
 class TournamentPlayers(models.Model):
     # Tournament id
     tournament = models.ForeignKey(
@@ -272,14 +362,13 @@ def get_wins(
 def getScores(tournament: Tournament):
     result_dict = dict()
 
-    # Get the players
-    players = tournament.getPlayers()
+    # Compute the standings of every player at once
+    standings = compute_standings(tournament)
 
-    for player in players:
+    for player, stats in standings.items():
         result_dict[player] = {}
-
-        score, _, _ = get_wins(tournament, player)
-        result_dict[player][RankingSystem.PLAIN_SCORE.value] = score
+        result_dict[player][RankingSystem.PLAIN_SCORE.value] = \
+            stats[RankingSystem.PLAIN_SCORE.value]
     return result_dict
 
 
@@ -288,28 +377,123 @@ def getBlackWins(tournament, results):  # NOTE: works
     WINS = RankingSystem.WINS.value
     BLACKTIMES = RankingSystem.BLACKTIMES.value
 
-    # Get the tournament players
-    players = tournament.getPlayers()
-    # For each player call the get_wins function to fill the dictionary
+    # Compute the standings of every player at once and fill the dictionary
+    standings = compute_standings(tournament)
+    for player, stats in standings.items():
+        results[player][WINS] = stats[WINS]
+        results[player][BLACKTIMES] = stats[BLACKTIMES]
+    return results
+
+
+def getPlayers(tournament):
+    # Players with their starting rank, the order in which they entered the
+    # tournament (the starting numbers of a TRF file)
+    entries = TournamentPlayers.objects.filter(
+        tournament=tournament).select_related("player").order_by("id")
+    return {
+        entry.player: {"rank": rank}
+        for rank, entry in enumerate(entries, 1)
+    }
+
+
+def getOpponents(tournament, results):
+    # For every player add, round by round, the opponents (the player
+    # himself for unplayed rounds), the points and the color balance
+    from .game import Game
+
+    engine = TieBreakEngine(tournament)
+    players = engine.games.players
+    vur_games = Game.objects.in_bulk(engine.game[engine.vur].tolist())
+
     for player in players:
-        _, wins, blackTimes = get_wins(tournament, player)
-        results[player][WINS] = wins
-        results[player][BLACKTIMES] = blackTimes
+        results.setdefault(player, {}).update({
+            "opponents": [],
+            "OTBopponents": [],
+            "result": [],
+            "voluntarellyUmplayed": [],
+            "colordifference": 0,
+        })
+
+    for i in np.lexsort((engine.round, engine.player)):
+        player = players[engine.player[i]]
+        stats = results[player]
+        stats["result"].append(engine.points[i].item())
+        if engine.played[i]:
+            opponent = players[engine.opponent[i]]
+            stats["opponents"].append(opponent)
+            stats["OTBopponents"].append(opponent)
+            stats["colordifference"] += 1 if engine.is_white[i] else -1
+        else:
+            stats["opponents"].append(player)
+        if engine.vur[i]:
+            stats["voluntarellyUmplayed"].append(
+                vur_games[engine.game[i].item()])
+
     return results
 
 
-def getRanking(tournament):
+def _addTieBreak(tournament, results, system):
+    # Add the tie-break value of every player to the results
+    for player, stats in compute_tiebreaks(tournament, [system]).items():
+        results.setdefault(player, {})[system] = stats[system]
+    return results
 
-    PLAIN = RankingSystem.PLAIN_SCORE.value
+
+def getAdjustedScores(tournament, results):
+    engine = TieBreakEngine(tournament)
+    for player, score in zip(engine.games.players,
+                             engine.adjusted_score.tolist()):
+        results.setdefault(player, {})["adjustedScore"] = score
+    return results
+
+
+def getBuchholz(tournament, results):
+    return _addTieBreak(
+        tournament, results, RankingSystem.BUCHHOLZ.value)
+
+
+def getBuchholzCutMinusOne(tournament, results):
+    return _addTieBreak(
+        tournament, results, RankingSystem.BUCHHOLZ_CUT1.value)
+
+
+def getMediamBuchholz(tournament, results):
+    return _addTieBreak(
+        tournament, results, RankingSystem.BUCHHOLZ_AVERAGE.value)
+
+
+def getSonnebornBerger(tournament, results):
+    return _addTieBreak(
+        tournament, results, RankingSystem.SONNEBORN_BERGER.value)
+
+
+def getRanking(tournament):
 
     return_dict = {}
 
-    return_dict = getBlackWins(tournament, getScores(tournament))
+    # PS, WI and BT of every player are computed in a single pass
+    games = TournamentGames(tournament)
+    return_dict = compute_standings(tournament, games)
 
     # Now players are ordered unless there is a tie,
     # so we must see the rankingList
     # Get the methods to check
-    rankingList = tournament.rankingList.all()
+    rankingList = tournament.getRankingCodes()
+
+    # Add the opponent based tie-breaks, computed from the same games
+    tiebreaks = [value for value in rankingList if value in OPPONENT_TIEBREAKS]
+    if tiebreaks:
+        tiebreak_dict = compute_tiebreaks(tournament, tiebreaks, games)
+        for player, stats in tiebreak_dict.items():
+            return_dict[player].update(stats)
+
+    return _rankPlayers(return_dict, rankingList)
+
+
+def _rankPlayers(return_dict, rankingList):
+    # Add the rank of every player and sort them by it. Players are ordered
+    # by PS, ties are broken with the rankingList criteria
+    PLAIN = RankingSystem.PLAIN_SCORE.value
 
     ps_dict = {}
 
@@ -335,14 +519,16 @@ def getRanking(tournament):
     for score, player in ps_dict.items():  # player will be a list of players
         if score in draws.keys():
             players = draws[score]
-            # Sort the players in this group based on the rankingList criteria
-            for criterion in rankingList:
-                # Sort based on the given criterion
-                players.sort(
-                    key=lambda player:
-                    return_dict[player].get(criterion.value, 0),
-                    reverse=True,
-                )
+            # Sort the players in this group based on the rankingList
+            # criteria, the first criterion is the most important one. The
+            # last ties go by player id, as in the other backends
+            players.sort(
+                key=lambda player: tuple(
+                    return_dict[player].get(criterion, 0)
+                    for criterion in rankingList
+                ) + (-player.id,),
+                reverse=True,
+            )
             # After sorting, assign ranks to players within this group
             # print(f"AQUI {players}")
             for player in players:
@@ -361,3 +547,54 @@ def getRanking(tournament):
     }
 
     return return_dict
+
+
+def getRankingHistory(tournament):
+    # Ranking after each round as a list of (round, ranking) in round order.
+    # The games are loaded once and the scores of every round are running
+    # totals over the rounds, instead of a new ranking for each of them
+    from .round import Round
+
+    rounds = list(Round.objects.filter(tournament=tournament).order_by("id"))
+    round_ids = np.array([round.id for round in rounds], dtype=np.int64)
+    games = TournamentGames(tournament)
+    points, wins, black_times = cumulative_standings(games, round_ids)
+
+    rankingList = tournament.getRankingCodes()
+    tiebreaks = [value for value in rankingList if value in OPPONENT_TIEBREAKS]
+
+    history = []
+    for i, round in enumerate(rounds):
+        return_dict = {
+            player: {
+                RankingSystem.PLAIN_SCORE.value: ps,
+                RankingSystem.WINS.value: wi,
+                RankingSystem.BLACKTIMES.value: bt,
+            }
+            for player, ps, wi, bt in zip(
+                games.players, points[i].tolist(), wins[i].tolist(),
+                black_times[i].tolist()
+            )
+        }
+
+        # Opponent tie-breaks only with the games played until the round
+        if tiebreaks:
+            tiebreak_dict = compute_tiebreaks(
+                tournament, tiebreaks, games.until(round.id)
+            )
+            for player, stats in tiebreak_dict.items():
+                return_dict[player].update(stats)
+
+        history.append((round, _rankPlayers(return_dict, rankingList)))
+
+    return history
+
+
+def getRankingAfterRound(tournament, round_number):
+    # Ranking after the given round (starting at 1), empty if there is no
+    # such round
+    history = getRankingHistory(tournament)
+    if not 1 <= round_number <= len(history):
+        return {}
+
+    return history[round_number - 1][1]
@@ -4,10 +4,70 @@ from .models import (
     Player,
     Game,
     Tournament,
+    TournamentPlayers,
     Round,
     RankingSystem,
     RankingSystemClass,
 )
+from .models.player import import_lichess_players
+from .models.tournament import bump_version
+
+
+def add_players(tournament, players_csv, progress=None, refresh=False):
+    # Enter the players of a CSV file in the tournament: a header line and
+    # then one row per player, a Lichess username or name and email. The
+    # players already in the tournament are skipped. Returns the players
+    # entered
+    rows = []
+    for player_entry in players_csv.split("\n")[1:]:
+        player_entry = player_entry.strip()
+        if not player_entry:
+            continue
+
+        columns = [column.strip() for column in player_entry.split(",")]
+        if len(columns) not in [1, 2]:
+            raise serializers.ValidationError(
+                f"Invalid player format: {player_entry}"
+            )
+        rows.append(columns)
+
+    # The Lichess users are looked up together, with a few bulk requests
+    # for the whole file. The data fetched in the last max_update_time
+    # seconds is used as it is
+    lichess_players = import_lichess_players(
+        [columns[0] for columns in rows if len(columns) == 1],
+        max_age=tournament.max_update_time,
+        refresh=refresh,
+    )
+
+    players = []
+    for count, columns in enumerate(rows):
+        if progress is not None:
+            progress(count, len(rows))
+        if len(columns) == 1:
+            player = lichess_players[columns[0]]
+        else:
+            player, _ = Player.objects.get_or_create(
+                name=columns[0],
+                email=columns[1]
+            )
+        players.append(player)
+
+    # The players are entered in the order of the file, once each
+    entered = set(
+        TournamentPlayers.objects.filter(tournament=tournament)
+        .values_list("player_id", flat=True)
+    )
+    players = [player for player in dict.fromkeys(players)
+               if player.id not in entered]
+    TournamentPlayers.objects.bulk_create([
+        TournamentPlayers(tournament=tournament, player=player)
+        for player in players
+    ])
+
+    # bulk_create does not send the signals that change the version
+    bump_version(pk=tournament.pk)
+    return players
 
 
 class RefereeSerializer(serializers.ModelSerializer):
@@ -36,9 +96,15 @@ class TournamentSerializer(serializers.ModelSerializer):
     )
     players = serializers.CharField(required=False)
 
+    # Fetch the Lichess data of every player of the file, even the fresh one
+    refresh_ratings = serializers.BooleanField(
+        required=False, write_only=True
+    )
+
     class Meta:
         model = Tournament
         fields = "__all__"
+        read_only_fields = ["seed_order", "lichess_synced_at"]
 
     def validate_rankingList(self, values):
         """
@@ -62,35 +128,20 @@ class TournamentSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         rankingList = validated_data.pop("rankingList", [])
         players_csv = validated_data.pop("players", "")
+        refresh_ratings = validated_data.pop("refresh_ratings", False)
         tournament = super().create(validated_data)
 
-        # Add players
+        # The created callback of the context, if any, gets the tournament
+        # before its players are added
+        if "created" in self.context:
+            self.context["created"](tournament)
+
+        # Add players. The progress callback of the context, if any, gets
+        # the number of rows done and the number of rows
         if players_csv:
-            players = players_csv.split("\n")
-            for player_entry in players[1:]:
-                player_entry = player_entry.strip()
-                if not player_entry:
-                    continue
-
-                columns = player_entry.split(",")
-                if len(columns) == 1:
-                    lichess_username = columns[0].strip()
-                    player, _ = Player.objects.get_or_create(
-                        lichess_username=lichess_username
-                    )
-                elif len(columns) == 2:
-                    name = columns[0].strip()
-                    email = columns[1].strip()
-                    player, _ = Player.objects.get_or_create(
-                        name=name,
-                        email=email
-                    )
-                else:
-                    raise serializers.ValidationError(
-                        f"Invalid player format: {player_entry}"
-                    )
-
-                tournament.players.add(player)
+            add_players(tournament, players_csv,
+                        progress=self.context.get("progress"),
+                        refresh=refresh_ratings)
 
         # Add the ranking list items
         for current in rankingList:
@@ -122,3 +173,25 @@ class RoundSerializer(serializers.ModelSerializer):
     class Meta:
         model = Round
         fields = "__all__"
+
+
+class LichessGameIdsField(serializers.ListField):
+    # Lichess game ids, a list or comma separated strings of ids
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [data]
+        values = super().to_internal_value(data)
+        return [
+            game_id.strip() for value in values
+            for game_id in value.split(",") if game_id.strip()
+        ]
+
+
+class LichessGamesSerializer(serializers.Serializer):
+    lichess_game_ids = LichessGameIdsField(child=serializers.CharField())
+
+    def validate_lichess_game_ids(self, values):
+        if not values:
+            raise serializers.ValidationError("This list may not be empty.")
+        return values
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Game, Round, Player, Tournament
+from .models.tournament import bump_version
+
+
+# Every change on the games, rounds and players of a tournament changes its
+# version, so the cached ranking and round results are not used anymore
+
+@receiver([post_save, post_delete], sender=Game)
+def game_changed(sender, instance, **kwargs):
+    bump_version(round__id=instance.round_id)
+
+
+@receiver([post_save, post_delete], sender=Round)
+def round_changed(sender, instance, **kwargs):
+    bump_version(pk=instance.tournament_id)
+
+
+@receiver(post_save, sender=Player)
+def player_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_version(players=instance)
+
+
+def list_changed(field, instance, action, reverse, pk_set):
+    # The relation can be changed from any of its two sides. When it is
+    # cleared from the other side the tournaments are looked up before
+    if not reverse:
+        if action.startswith("post_"):
+            bump_version(pk=instance.pk)
+    elif action == "pre_clear":
+        bump_version(**{field: instance})
+    elif action in ["post_add", "post_remove"]:
+        bump_version(pk__in=pk_set)
+
+
+@receiver(m2m_changed, sender=Tournament.players.through)
+def players_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    list_changed("players", instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Tournament.rankingList.through)
+def ranking_list_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    list_changed("rankingList", instance, action, reverse, pk_set)
@@ -1,4 +1,6 @@
 from django.test import TestCase, tag, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -18,6 +20,8 @@ from chess_models.models import (
     LichessAPIError,
     get_wins,
     create_rounds,
+    berger_table,
+    getRanking,
 )
 from chess_models.serializers import TournamentSerializer
 from django.contrib.auth.models import User
@@ -289,6 +293,134 @@ class CreateRoundTests(TestCase):
         create_round = create_rounds(self.tournaments[5])
         self.assertEqual(create_round, result)
 
+    @tag("continua")
+    def test_007_create_round_bulk(self):
+        """The queries do not depend on the number of players"""
+        with CaptureQueriesContext(connection) as small:
+            create_rounds(self.tournaments[0])
+        with CaptureQueriesContext(connection) as large:
+            schedule = create_rounds(self.tournaments[5])
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(self.tournaments[5].getRoundCount(), 13)
+        for round, round_data in zip(
+            Round.objects.filter(
+                tournament=self.tournaments[5]).order_by("id"),
+            schedule
+        ):
+            games = Game.objects.filter(round=round).order_by("id")
+            self.assertEqual(
+                [[game.white_id, game.black_id] for game in games],
+                round_data
+            )
+
+    @tag("double")
+    def test_008_create_round_double(self):
+        """Double round robins play every pair twice with the colours
+        reversed, on a second cycle (DR) or on the same round (DD)"""
+        solutions = {
+            TournamentType.DOUBLEROUNDROBIN: [
+                [[1, 4], [2, 3]], [[2, 4], [3, 1]], [[4, 3], [1, 2]],
+                [[4, 1], [3, 2]], [[4, 2], [1, 3]], [[3, 4], [2, 1]],
+            ],
+            TournamentType.DOUBLEROUNDROBINSAMEDAY: [
+                [[1, 4], [2, 3], [4, 1], [3, 2]],
+                [[4, 3], [1, 2], [3, 4], [2, 1]],
+                [[2, 4], [3, 1], [4, 2], [1, 3]],
+            ],
+        }
+        players = self.tournaments[0].players.all()
+        for tournament_type, result in solutions.items():
+            tournament = Tournament.objects.create(
+                name=f"Double {tournament_type}",
+                tournament_type=tournament_type)
+            tournament.players.add(*players)
+
+            create_round = create_rounds(tournament)
+            self.assertEqual(create_round, result)
+            rounds = Round.objects.filter(
+                tournament=tournament).order_by("id")
+            self.assertEqual(
+                [[[game.white_id, game.black_id]
+                  for game in round.game_set.order_by("id")]
+                 for round in rounds],
+                result
+            )
+
+    @tag("double")
+    def test_009_create_round_double_bulk(self):
+        """A 40 player double round robin is inserted in bulk"""
+        tournament = Tournament.objects.create(
+            name="Double 40",
+            tournament_type=TournamentType.DOUBLEROUNDROBIN)
+        for i in range(40):
+            tournament.players.add(Player.objects.create(name=f"Double {i}"))
+
+        with CaptureQueriesContext(connection) as queries:
+            schedule = create_rounds(tournament)
+        self.assertEqual(len(schedule), 78)
+        self.assertLess(len(queries), len(schedule) // 2)
+        self.assertEqual(
+            Game.objects.filter(round__tournament=tournament).count(), 1560)
+
+    @tag("continua")
+    def test_010_create_round_odd(self):
+        """Odd fields add a bye slot, every player meets the others once
+        and has one bye game with the bye score of the tournament"""
+        players = list(self.tournaments[0].players.all()) + [
+            Player.objects.create(name="Odd player")]
+        for bye_score in [Scores.BYE_U, Scores.BYE_H]:
+            tournament = Tournament.objects.create(
+                name=f"Odd {bye_score}", bye_score=bye_score)
+            tournament.players.add(*players)
+
+            schedule = create_rounds(tournament)
+            self.assertEqual(len(schedule), 5)
+            met = set()
+            for round_data in schedule:
+                self.assertEqual(len(round_data), 3)
+                for white, black in round_data:
+                    if black is not None:
+                        met.add(frozenset([white, black]))
+            self.assertEqual(len(met), 10)
+
+            byes = Game.objects.filter(
+                round__tournament=tournament, black=None)
+            self.assertEqual(
+                sorted(byes.values_list("white_id", flat=True)),
+                sorted(player.id for player in players))
+            self.assertEqual(
+                set(byes.values_list("result", flat=True)), {bye_score})
+
+    @tag("continua")
+    def test_0105_odd_bye_points(self):
+        """The bye games are finished, the bye score is in the ranking"""
+        players = list(self.tournaments[0].players.all()) + [
+            Player.objects.create(name="Odd player")]
+        tournament = Tournament.objects.create(
+            name="Odd byes", bye_score=Scores.BYE_U)
+        tournament.players.add(*players)
+        create_rounds(tournament)
+
+        byes = Game.objects.filter(round__tournament=tournament, black=None)
+        self.assertEqual(set(byes.values_list("finished", flat=True)),
+                         {True})
+        points = {
+            player.id: stats[RankingSystem.PLAIN_SCORE.value]
+            for player, stats in getRanking(tournament).items()
+        }
+        self.assertEqual(
+            sorted(points.values()),
+            [tournament.win_points] * len(players))
+
+    @tag("continua")
+    def test_011_berger_table_cached(self):
+        """The Berger tables are computed once per number of players"""
+        self.assertIs(berger_table(8), berger_table(8))
+        self.assertEqual(
+            berger_table(4),
+            (((1, 4), (2, 3)), ((4, 3), (1, 2)), ((2, 4), (3, 1))))
+
 
 class TournamentModelTestExtension(TransactionTestCase):
     """test related with tournaments that involve the creation of games"""
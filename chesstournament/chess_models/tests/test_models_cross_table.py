@@ -0,0 +1,81 @@
+from django.db import connection
+from django.test import TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext
+from chess_models.models import (Tournament, Player, Game, Scores,
+                                 CrossTable, create_rounds)
+from chess_models.models.constants import (TournamentSpeed, TournamentType,
+                                           TournamentBoardType)
+
+
+class CrossTableTest(TransactionTestCase):
+    """test the player x player result grid"""
+    reset_sequences = True
+
+    def decode(self, cross_table, i, j, k):
+        value = int(cross_table.table[i, j, k])
+        return Scores.values[abs(value) - 1], value > 0
+
+    @tag("continua")
+    def test_001_cross_table_matches_games(self):
+        """every game is stored for both players"""
+        from chess_models.management.commands.populate import Command
+        command = Command()
+        command.cleanDataBase()
+        command.readInputFile(
+            'chess_models/management/commands/tie-breaking-swiss.trf')
+        command.insertData()
+        tournament = Tournament.objects.get(
+            name='tie-breaking exercises swiss')
+
+        cross_table = CrossTable(tournament)
+        ids = [player.id for player in cross_table.players]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(cross_table.cycles, 1)
+
+        games = Game.objects.filter(round__tournament=tournament,
+                                    black__isnull=False)
+        for game in games:
+            i, j = ids.index(game.white.id), ids.index(game.black.id)
+            self.assertEqual(self.decode(cross_table, i, j, 0),
+                             (game.result, True))
+            self.assertEqual(self.decode(cross_table, j, i, 0),
+                             (game.result, False))
+
+        # Only the pairs that played have a value
+        self.assertEqual((cross_table.table != 0).sum(), 2 * games.count())
+
+    @tag("continua")
+    def test_002_double_round_robin(self):
+        """games of the same pair go to consecutive slots"""
+        tournament = Tournament.objects.create(
+            name='double',
+            tournament_type=TournamentType.ROUNDROBIN,
+            tournament_speed=TournamentSpeed.CLASSICAL,
+            board_type=TournamentBoardType.OTB)
+        for i in range(4):
+            player = Player.objects.create(
+                name=f'player_{i}', email=f'player_{i}@example.com')
+            tournament.players.add(player)
+        create_rounds(tournament)
+        create_rounds(tournament)
+        Game.objects.filter(round__tournament=tournament).update(
+            result=Scores.DRAW, finished=True)
+        game = Game.objects.filter(round__tournament=tournament).last()
+        game.finished = False
+        game.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            cross_table = CrossTable(tournament)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(cross_table.cycles, 2)
+
+        rows = cross_table.rows()
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(len(row) == 8 for row in rows))
+        i = [player.id for player in cross_table.players].index(
+            game.white.id)
+        j = [player.id for player in cross_table.players].index(
+            game.black.id)
+        self.assertEqual(self.decode(cross_table, i, j, 1),
+                         (Scores.NOAVAILABLE, True))
+        self.assertEqual(self.decode(cross_table, i, j, 0)[0], Scores.DRAW)
@@ -0,0 +1,124 @@
+from django.db import connection
+from django.test import TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+
+from chess_models.models import (Tournament, Player, Game, Round, Scores,
+                                 create_rounds, open_round, lazy_schedule)
+from chess_models.models.constants import (TournamentSpeed, TournamentType,
+                                           TournamentBoardType)
+
+
+class LazyRoundsTest(TransactionTestCase):
+    """lazy round robins create each round when it is opened"""
+    reset_sequences = True
+
+    def create_tournament(self, count, tournament_type):
+        tournament = Tournament.objects.create(
+            name=f'lazy_{tournament_type}_{count}',
+            tournament_type=tournament_type,
+            tournament_speed=TournamentSpeed.CLASSICAL,
+            board_type=TournamentBoardType.OTB,
+            lazy_rounds=True)
+        for i in range(count):
+            player = Player.objects.create(
+                name=f'{tournament.name}_{i}',
+                email=f'{tournament.name}_{i}@example.com')
+            tournament.players.add(player)
+        return tournament
+
+    @tag("continua")
+    def test_001_schedule_is_not_stored(self):
+        """creating the rounds only keeps the seed order"""
+        tournament = self.create_tournament(6, TournamentType.ROUNDROBIN)
+        schedule = create_rounds(tournament)
+        self.assertEqual(len(schedule), 5)
+        self.assertEqual(tournament.getRoundCount(), 0)
+        self.assertEqual(Game.objects.count(), 0)
+
+        tournament = Tournament.objects.get(id=tournament.id)
+        self.assertEqual(tournament.seed_order, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(lazy_schedule(tournament), schedule)
+
+    @tag("continua")
+    def test_002_rounds_are_opened_in_order(self):
+        """each call opens the next round with the games of the schedule,
+        the same ones an eager tournament creates"""
+        for tournament_type in [TournamentType.ROUNDROBIN,
+                                TournamentType.DOUBLEROUNDROBIN,
+                                TournamentType.DOUBLEROUNDROBINSAMEDAY]:
+            tournament = self.create_tournament(5, tournament_type)
+            schedule = create_rounds(tournament)
+            for number, round_data in enumerate(schedule, 1):
+                self.assertEqual(create_rounds(tournament), [round_data])
+                round = Round.objects.get(
+                    tournament=tournament, name=f'Round {number}')
+                self.assertEqual(
+                    [[game.white_id, game.black_id]
+                     for game in round.game_set.order_by('id')],
+                    round_data)
+            self.assertEqual(open_round(tournament), [])
+            self.assertEqual(tournament.getRoundCount(), len(schedule))
+
+            bye = Game.objects.filter(
+                round__tournament=tournament, black=None).first()
+            self.assertEqual(bye.result, Scores.BYE_U)
+
+    @tag("continua")
+    def test_003_round_results_show_future_rounds(self):
+        """the rounds that are not open are shown without ids"""
+        tournament = self.create_tournament(4, TournamentType.ROUNDROBIN)
+        create_rounds(tournament)
+        create_rounds(tournament)
+
+        client = APIClient()
+        rounds = client.get(
+            f'/api/v1/get_round_results/{tournament.id}/').json()
+        self.assertEqual([round['virtual'] for round in rounds],
+                         [False, True, True])
+        self.assertEqual([round['name'] for round in rounds],
+                         ['Round 1', 'Round 2', 'Round 3'])
+        self.assertIsNotNone(rounds[0]['games'][0]['id'])
+
+        players = {
+            player.id: player.name for player in tournament.getPlayers()}
+        schedule = lazy_schedule(tournament)
+        for round, round_data in zip(rounds[1:], schedule[1:]):
+            self.assertIsNone(round['id'])
+            self.assertEqual(
+                [[game['white_player_name'], game['black_player_name']]
+                 for game in round['games']],
+                [[players[white], players[black]]
+                 for white, black in round_data])
+            for game in round['games']:
+                self.assertIsNone(game['id'])
+                self.assertEqual(game['result'], Scores.NOAVAILABLE)
+
+    @tag("continua")
+    def test_004_create_and_open_through_the_api(self):
+        """a lazy tournament created through the API has no rounds until
+        the director opens them"""
+        user = User.objects.create_user(
+            username='director', password='testpassword')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.post('/api/v1/tournament_create/', {
+            'name': 'lazy_api',
+            'tournament_type': TournamentType.ROUNDROBIN,
+            'tournament_speed': TournamentSpeed.CLASSICAL,
+            'board_type': TournamentBoardType.OTB,
+            'lazy_rounds': True,
+            'players': 'name,email\na,a@example.com\nb,b@example.com\n'
+                       'c,c@example.com\nd,d@example.com',
+        })
+        tournament = Tournament.objects.get(id=response.data['id'])
+        self.assertEqual(tournament.getRoundCount(), 0)
+        self.assertEqual(len(tournament.seed_order), 4)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/api/v1/create_round/',
+                                   {'tournament_id': tournament.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(tournament.getRoundCount(), 1)
+        self.assertLess(len(queries), 15)
@@ -0,0 +1,873 @@
+from datetime import timedelta
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings, tag)
+from django.utils import timezone
+from io import StringIO
+from rest_framework.test import APIClient
+
+from chess_models.models import (Player, Tournament, Game, Scores,
+                                 PlayerStanding, LichessAPIError,
+                                 LichessClient, AsyncLichessClient,
+                                 async_lichess_client,
+                                 reset_lichess_client, run_lichess,
+                                 create_rounds, discover_lichess_results,
+                                 import_lichess_results, LichessGameResult,
+                                 lichess_game_result)
+from chess_models.models.constants import TournamentType, TournamentBoardType
+from chess_models.models.player import (import_lichess_players,
+                                        stale_lichess_players)
+from chess_models.models.lichess import export_games
+from chess_models.lichess_server import LichessStandIn
+from chess_models.tests.constants import lichess_usernames_6
+from chess_models.serializers import TournamentSerializer
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    # Answers with the statuses of the server script, 200 once it is empty
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.client_address[1]))
+        status = server.script.pop(0) if server.script else 200
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+        body = json.dumps(server.body).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        # POST /api/users, the data of the known users of the list, and
+        # the export of the known games as NDJSON
+        server = self.server
+        names = self.rfile.read(
+            int(self.headers["Content-Length"])).decode().split(",")
+        server.requests.append((self.path.split("?")[0], names))
+        if self.path.startswith("/api/users"):
+            body = json.dumps([
+                server.users[name.lower()] for name in names
+                if name.lower() in server.users
+            ]).encode()
+        else:
+            body = "".join(
+                json.dumps(server.games[name]) + "\n" for name in names
+                if name in server.games
+            ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def lichess_user(name, rating):
+    return {"id": name.lower(), "username": name, "perfs": {
+        speed: {"rating": rating + i * 100} for i, speed in enumerate(
+            ["bullet", "blitz", "rapid", "classical"])}}
+
+
+class LocalServerMixin:
+    # Local server on a thread, the shared client is sent to it
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+        self.server.requests = []
+        self.server.script = []
+        self.server.delay = 0
+        self.server.body = {"id": "someone"}
+        self.server.users = {}
+        self.server.games = {}
+        self.server.lock = threading.Lock()
+        self.server.active = 0
+        self.server.peak = 0
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.settings = override_settings(LICHESS_URL=self.url)
+        self.settings.enable()
+        reset_lichess_client()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.server.shutdown()
+        self.server.server_close()
+        reset_lichess_client()
+
+
+class LichessClientTest(LocalServerMixin, SimpleTestCase):
+    """the shared lichess client against a local server"""
+
+    def lichess(self, **kwargs):
+        return LichessClient(base_url=self.url, backoff=0, **kwargs)
+
+    @tag("continua")
+    def test_001_keep_alive(self):
+        """the requests share one connection and are counted by
+        endpoint"""
+        client = self.lichess()
+        for name in ["a", "b", "c"]:
+            self.assertEqual(client.get(f"/api/user/{name}").status_code, 200)
+        self.assertEqual(
+            [path for path, _ in self.server.requests],
+            ["/api/user/a", "/api/user/b", "/api/user/c"])
+        self.assertEqual(len({port for _, port in self.server.requests}), 1)
+
+        latency = client.latency()["/api/user"]
+        self.assertEqual(latency["requests"], 3)
+        self.assertEqual(latency["errors"], 0)
+        self.assertGreater(latency["mean_seconds"], 0)
+
+    @tag("continua")
+    def test_002_retries(self):
+        """429 and 5xx are retried a bounded number of times"""
+        client = self.lichess(retries=2)
+        self.server.script = [503, 429]
+        self.assertEqual(client.get("/api/game/x").status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+
+        self.server.script = [500, 500, 500, 500]
+        self.assertEqual(client.get("/api/game/y").status_code, 500)
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertEqual(client.latency()["/api/game"]["errors"], 1)
+
+        self.server.script = [404]
+        self.assertEqual(client.get("/api/game/z").status_code, 404)
+        self.assertEqual(len(self.server.requests), 7)
+
+    @tag("continua")
+    def test_003_timeout(self):
+        """a stalled response raises LichessAPIError"""
+        client = self.lichess(read_timeout=0.2, retries=0)
+        self.server.delay = 1
+        with self.assertRaises(LichessAPIError):
+            client.get("/api/user/slow")
+
+    @tag("continua")
+    def test_004_models_use_the_base_url(self):
+        """the player ratings are read from the configured server"""
+        self.server.body = {"id": "someone", "perfs": {
+            speed: {"rating": rating} for speed, rating in [
+                ("bullet", 1500), ("blitz", 1600), ("rapid", 1700),
+                ("classical", 1800)]}}
+        player = Player(lichess_username="someone")
+        player.get_lichess_user_ratings()
+        self.assertTrue(player.check_lichess_user_exists())
+        self.assertEqual(player.lichess_rating_blitz, 1600)
+        self.assertEqual(player.lichess_rating_classical, 1800)
+        self.assertEqual(self.server.requests[0][0], "/api/user/someone")
+
+
+class LichessImportTest(LocalServerMixin, TransactionTestCase):
+    """players imported with bulk lookups of the lichess users"""
+    reset_sequences = True
+
+    @tag("continua")
+    def test_001_import_in_batches(self):
+        """the users are asked 300 at a time and the players are created
+        or updated"""
+        names = [f"User{i}" for i in range(650)]
+        self.server.users = {
+            name.lower(): lichess_user(name, 1000 + i)
+            for i, name in enumerate(names)}
+        Player.objects.bulk_create(
+            [Player(name="old", lichess_username="User7")])
+
+        players = import_lichess_players(names)
+        self.assertEqual(
+            sorted(len(batch) for _, batch in self.server.requests),
+            [50, 300, 300])
+        self.assertEqual(Player.objects.count(), 650)
+        self.assertEqual(list(players), names)
+        self.assertEqual(players["User7"].name, "old")
+        self.assertEqual(
+            Player.objects.get(lichess_username="User7").lichess_rating_blitz,
+            1107)
+        self.assertEqual(
+            Player.objects.get(
+                lichess_username="User649").lichess_rating_classical,
+            1949)
+
+    @tag("continua")
+    def test_002_unknown_user(self):
+        """an unknown user stops the import"""
+        self.server.users = {"known": lichess_user("Known", 1500)}
+        with self.assertRaises(LichessAPIError):
+            import_lichess_players(["Known", "Unknown"])
+        self.assertEqual(Player.objects.count(), 0)
+
+    @tag("continua")
+    def test_003_tournament_csv(self):
+        """the players of the file are looked up on one request and keep
+        the order of the file"""
+        names = ["Zeta", "alpha", "Mid"]
+        self.server.users = {
+            name.lower(): lichess_user(name, 1500) for name in names}
+        serializer = TournamentSerializer(data={
+            "name": "csv", "tournament_type": "SR",
+            "tournament_speed": "BL", "board_type": "LIC",
+            "players": "lichess_username\n" + "\n".join(names)
+                       + "\nalpha\nNoLichess,no@example.com\n",
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        tournament = serializer.save()
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(
+            [str(player) for player in tournament.getPlayers()],
+            names + ["NoLichess"])
+        self.assertGreater(Tournament.objects.get(id=tournament.id).version,
+                           tournament.version)
+
+
+def lichess_game(id, white, black, winner=None, status="mate"):
+    data = {"id": id, "status": status, "players": {
+        "white": {"user": {"name": white, "id": white.lower()}},
+        "black": {"user": {"name": black, "id": black.lower()}}}}
+    if winner:
+        data["winner"] = winner
+    return data
+
+
+class LichessResultsTest(LocalServerMixin, TransactionTestCase):
+    """results of a round imported from the lichess export"""
+    reset_sequences = True
+
+    @tag("continua")
+    def test_001_import_round(self):
+        """the lichess games are matched to the games of their players and
+        written together"""
+        user = User.objects.create_user(username="admin", password="admin")
+        tournament = Tournament.objects.create(
+            name="results", tournament_type=TournamentType.ROUNDROBIN,
+            administrativeUser=user)
+        tournament.players.add(*Player.objects.bulk_create([
+            Player(lichess_username=f"Player{i}") for i in range(1, 7)]))
+        create_rounds(tournament)
+        round = tournament.round_set.order_by("id").first()
+        games = list(round.game_set.order_by("id"))
+        names = [(game.white.lichess_username, game.black.lichess_username)
+                 for game in games]
+
+        self.server.games = {
+            "won": lichess_game("won", *names[0], winner="black"),
+            "drawn": lichess_game("drawn", *names[1], status="draw"),
+            "reversed": lichess_game("reversed", *reversed(names[2])),
+            "playing": lichess_game("playing", *names[2], status="started"),
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        response = self.client.post("/api/v1/update_lichess_games/", {
+            "round_id": round.id,
+            "lichess_game_ids": "won,drawn,reversed,playing,missing",
+        })
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["games"], [
+            {"lichess_game_id": "won", "game_id": games[0].id,
+             "result": Scores.BLACK},
+            {"lichess_game_id": "drawn", "game_id": games[1].id,
+             "result": Scores.DRAW},
+        ])
+        self.assertEqual(
+            [error["lichess_game_id"] for error in data["errors"]],
+            ["reversed", "playing", "missing"])
+        self.assertEqual(len(self.server.requests), 1)
+
+        self.assertEqual(
+            [(game.result, game.finished)
+             for game in round.game_set.order_by("id")],
+            [(Scores.BLACK, True), (Scores.DRAW, True),
+             (Scores.NOAVAILABLE, False)])
+        self.assertEqual(
+            PlayerStanding.objects.get(player=games[0].black).points, 1)
+
+        # The finished games are not matched again
+        response = self.client.post("/api/v1/update_lichess_games/", {
+            "round_id": round.id, "lichess_game_ids": ["won"]})
+        self.assertEqual(response.json()["games"], [])
+        self.assertEqual(
+            self.client.post("/api/v1/update_lichess_games/",
+                             {"round_id": round.id}).status_code, 400)
+
+    @tag("continua")
+    def test_002_only_the_administrator(self):
+        """only the administrative user of the tournament imports the
+        results, and the game ids must be strings"""
+        admin = User.objects.create_user(username="admin", password="admin")
+        other = User.objects.create_user(username="other", password="other")
+        tournament = Tournament.objects.create(
+            name="results", tournament_type=TournamentType.ROUNDROBIN,
+            administrativeUser=admin)
+        tournament.players.add(*Player.objects.bulk_create([
+            Player(lichess_username=f"Player{i}") for i in range(1, 5)]))
+        create_rounds(tournament)
+        round = tournament.round_set.order_by("id").first()
+        data = {"round_id": round.id, "lichess_game_ids": ["missing"]}
+
+        client = APIClient()
+        response = client.post("/api/v1/update_lichess_games/", data)
+        self.assertEqual(response.status_code, 401)
+        client.force_authenticate(user=other)
+        response = client.post("/api/v1/update_lichess_games/", data)
+        self.assertEqual(response.status_code, 403)
+
+        client.force_authenticate(user=admin)
+        for ids in [[{"id": "won"}], [["won"]], [], [" , "]]:
+            response = client.post(
+                "/api/v1/update_lichess_games/",
+                {"round_id": round.id, "lichess_game_ids": ids},
+                format="json")
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()["result"])
+        self.assertEqual(self.server.requests, [])
+
+        response = client.post(
+            "/api/v1/update_lichess_games/",
+            {"round_id": round.id, "lichess_game_ids": "missing"},
+            format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [error["lichess_game_id"] for error in response.json()["errors"]],
+            ["missing"])
+
+
+class LichessFreshnessTest(LocalServerMixin, TransactionTestCase):
+    """the lichess data is fetched again only when it is too old"""
+    reset_sequences = True
+
+    def user_requests(self):
+        return sum(path.startswith("/api/user")
+                   for path, _ in self.server.requests)
+
+    @tag("continua")
+    def test_001_player_save(self):
+        """saving a player with fresh data does not ask lichess"""
+        self.server.body = lichess_user("Fresh", 1500)
+        player = Player.objects.create(lichess_username="Fresh")
+        self.assertEqual(self.user_requests(), 1)
+        self.assertIsNotNone(player.lichess_fetch_date)
+
+        player = Player.objects.get(id=player.id)
+        player.name = "renamed"
+        player.save()
+        self.assertEqual(self.user_requests(), 1)
+
+        player.save(refresh_ratings=True)
+        self.assertEqual(self.user_requests(), 2)
+
+        player = Player.objects.get(id=player.id)
+        player.lichess_fetch_date -= timedelta(days=1)
+        player.save()
+        self.assertEqual(self.user_requests(), 3)
+
+        player = Player.objects.get(id=player.id)
+        player.lichess_username = "Other"
+        player.save()
+        self.assertEqual(self.user_requests(), 4)
+
+    @tag("continua")
+    def test_002_import(self):
+        """the imports only ask for the new and stale users"""
+        names = ["One", "Two", "Three"]
+        self.server.users = {
+            name.lower(): lichess_user(name, 1500) for name in names}
+        import_lichess_players(names[:2])
+        import_lichess_players(names)
+        self.assertEqual([batch for _, batch in self.server.requests],
+                         [["One", "Two"], ["Three"]])
+
+        import_lichess_players(names, max_age=0)
+        import_lichess_players(names[:1], refresh=True)
+        self.assertEqual([batch for _, batch in self.server.requests][2:],
+                         [names, ["One"]])
+
+        serializer = TournamentSerializer(data={
+            "name": "fresh", "tournament_type": "SR",
+            "tournament_speed": "BL", "board_type": "LIC",
+            "players": "lichess_username\nOne\nTwo",
+            "refresh_ratings": True,
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertEqual(self.server.requests[-1][1], ["One", "Two"])
+
+
+class AsyncLichessClientTest(LocalServerMixin, SimpleTestCase):
+    """the asyncio lichess client against a local server with latency"""
+
+    @tag("continua")
+    def test_001_concurrency(self):
+        """the requests run at the same time, never more than the limit,
+        much faster than one after the other"""
+        self.server.delay = 0.1
+        names = [f"user{i}" for i in range(16)]
+
+        start = time.perf_counter()
+        client = LichessClient()
+        for name in names:
+            client.get(f"/api/user/{name}")
+        sequential = time.perf_counter() - start
+        self.assertEqual(self.server.peak, 1)
+
+        async def fetch(client):
+            return await asyncio.gather(
+                *[client.fetch_user(name) for name in names])
+
+        start = time.perf_counter()
+        users = run_lichess(fetch, concurrency=4)
+        concurrent = time.perf_counter() - start
+        self.assertEqual(len(users), 16)
+        self.assertEqual(self.server.peak, 4)
+        self.assertLess(concurrent, sequential / 3)
+
+    @tag("continua")
+    def test_002_rate_limit(self):
+        """a 429 pauses the client and the request is sent again"""
+        self.server.script = [429, 429]
+
+        async def fetch(client):
+            user = await client.fetch_user("limited")
+            return user, client.paused_until
+
+        user, paused_until = run_lichess(fetch)
+        self.assertEqual(user, {"id": "someone"})
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertGreater(paused_until, 0)
+
+        self.server.script = [429] * 4
+        client = AsyncLichessClient(rate_limit_retries=1)
+        response = asyncio.run(client.get("/api/user/limited"))
+        client.close()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(self.server.requests), 5)
+
+    @tag("continua")
+    def test_003_shared_client(self):
+        """the runs without options use the client of the process, its
+        connections and counters are kept between them"""
+        async def fetch(client):
+            await client.fetch_user("someone")
+            return client
+
+        first = run_lichess(fetch)
+        second = run_lichess(fetch)
+        self.assertIs(first, second)
+        self.assertIs(first, async_lichess_client())
+        self.assertEqual(
+            first.latency()["/api/user"]["requests"], 2)
+        self.assertEqual(
+            len({port for _, port in self.server.requests}), 1)
+
+        reset_lichess_client()
+        self.assertIsNot(async_lichess_client(), first)
+
+    @tag("continua")
+    def test_004_running_loop(self):
+        """run_lichess works when an event loop is already running"""
+        async def fetch(client):
+            return await client.fetch_user("someone")
+
+        async def view():
+            return run_lichess(fetch)
+
+        self.assertEqual(asyncio.run(view()), {"id": "someone"})
+
+
+class RefreshRatingsTest(LocalServerMixin, TransactionTestCase):
+    """the refresh_ratings command"""
+    reset_sequences = True
+
+    @tag("continua")
+    def test_001_refresh_stale_players(self):
+        """only the stale players of unfinished tournaments are fetched,
+        in batches, and the changed ratings are written back"""
+        now = timezone.now()
+        ages = {"Stale": 86400, "Fresh": 60, "Ended": 86400,
+                "Quick": 300, "Never": None}
+        players = Player.objects.bulk_create([
+            Player(lichess_username=name, lichess_rating_blitz=1500,
+                   lichess_fetch_date=None if age is None
+                   else now - timedelta(seconds=age))
+            for name, age in ages.items()])
+        players = dict(zip(ages, players))
+        open = Tournament.objects.create(name="open")
+        open.players.add(players["Stale"], players["Fresh"],
+                         players["Never"])
+        quick = Tournament.objects.create(name="quick", max_update_time=60)
+        quick.players.add(players["Quick"])
+        ended = Tournament.objects.create(
+            name="ended", end_date=now.date() - timedelta(days=1))
+        ended.players.add(players["Ended"])
+
+        self.assertEqual(
+            [player.lichess_username for player in stale_lichess_players()],
+            ["Stale", "Quick", "Never"])
+
+        # Stale changed its rating, Quick did not and Never is gone
+        self.server.users = {
+            "stale": lichess_user("Stale", 1600),
+            "quick": {"id": "quick", "perfs": {"blitz": {"rating": 1500}}},
+        }
+        versions = {tournament.name: tournament.version
+                    for tournament in Tournament.objects.all()}
+        out = StringIO()
+        call_command("refresh_ratings", "--batch", "2", stdout=out)
+        self.assertIn("refreshed 3 players, 1 ratings changed",
+                      out.getvalue())
+        self.assertEqual(
+            sorted(len(batch) for _, batch in self.server.requests), [1, 2])
+
+        stale = Player.objects.get(lichess_username="Stale")
+        self.assertEqual(stale.lichess_rating_blitz, 1700)
+        self.assertGreater(stale.lichess_fetch_date, now)
+        self.assertGreater(
+            Player.objects.get(lichess_username="Quick").lichess_fetch_date,
+            now)
+        self.assertIsNone(
+            Player.objects.get(lichess_username="Never").lichess_fetch_date)
+        self.assertEqual(
+            [player.lichess_username for player in stale_lichess_players()],
+            ["Never"])
+
+        self.assertGreater(Tournament.objects.get(name="open").version,
+                           versions["open"])
+        self.assertEqual(Tournament.objects.get(name="quick").version,
+                         versions["quick"])
+
+
+class LichessStandInTest(SimpleTestCase):
+    """the local Lichess stand-in serves the fixtures"""
+
+    def stand_in(self, **kwargs):
+        server = LichessStandIn(**kwargs).start()
+        self.addCleanup(server.stop)
+        return server
+
+    @tag("continua")
+    def test_001_fixture_endpoints(self):
+        """the users and games of the fixtures, one by one and in bulk"""
+        server = self.stand_in()
+        client = LichessClient(base_url=server.url, backoff=0)
+        self.addCleanup(client.close)
+
+        response = client.get("/api/user/ERTOPO")
+        self.assertEqual(response.json()["username"], "ertopo")
+        self.assertEqual(client.get("/api/user/nobody").status_code, 404)
+        response = client.post("/api/users", data="soria49,nobody,Clavada")
+        self.assertEqual([user["id"] for user in response.json()],
+                         ["soria49", "clavada"])
+
+        # /api/game gives the players by userId, the player suffix of the
+        # long ids is left out
+        data = client.get("/api/game/Df4Kwb96abwJ").json()
+        self.assertEqual(data["players"]["white"]["userId"], "lexorg55")
+        self.assertEqual(data["winner"], "black")
+        self.assertEqual(client.get("/api/game/AAAAAAAA").status_code, 404)
+        self.assertEqual(
+            [game["id"] for game in export_games(
+                ["HsdNrFxG", "AAAAAAAA", "VrAvmsHj"], client)],
+            ["HsdNrFxG", "VrAvmsHj"])
+
+        games = client.get("/api/games/user/soria49", params={
+            "vs": "ertopo"}).text.splitlines()
+        self.assertEqual([json.loads(game)["id"] for game in games],
+                         ["VrAvmsHj"])
+        newest = json.loads(client.get(
+            "/api/games/user/ertopo", params={"max": 1}).text)
+        self.assertEqual(
+            len(client.get("/api/games/user/ertopo", params={
+                "since": newest["createdAt"]}).text.splitlines()), 1)
+
+    @tag("continua")
+    def test_002_faults_are_deterministic(self):
+        """the same seed fails the same requests, the 429 ask to wait"""
+        def statuses(seed):
+            server = self.stand_in(error_rate=0.3, rate_limit_rate=0.2,
+                                   retry_after=7, seed=seed)
+            client = LichessClient(base_url=server.url, retries=0)
+            self.addCleanup(client.close)
+            responses = [client.get(f"/api/user/{name}") for name in
+                         lichess_usernames_6 * 3]
+            for response in responses:
+                if response.status_code == 429:
+                    self.assertEqual(response.headers["Retry-After"], "7")
+            return [response.status_code for response in responses]
+
+        first = statuses(1)
+        self.assertEqual(statuses(1), first)
+        self.assertNotEqual(statuses(2), first)
+        self.assertEqual(set(first), {200, 429, 500})
+
+    @tag("continua")
+    def test_003_latency(self):
+        """every request waits the latency of the server"""
+        server = self.stand_in(latency=0.05)
+        client = LichessClient(base_url=server.url)
+        self.addCleanup(client.close)
+        for name in lichess_usernames_6[:3]:
+            client.get(f"/api/user/{name}")
+        self.assertGreaterEqual(
+            client.latency()["/api/user"]["mean_seconds"], 0.05)
+
+    @tag("continua")
+    def test_004_bench(self):
+        """bench_lichess runs the clients against the stand-in"""
+        out = StringIO()
+        call_command("bench_lichess", "--users", "4", "--latency", "0",
+                     stdout=out)
+        self.assertIn("users in bulk", out.getvalue())
+        self.assertIn("games export", out.getvalue())
+
+
+class LichessDiscoveryTest(TransactionTestCase):
+    """results found on lichess from the games of the white players"""
+    reset_sequences = True
+
+    def setUp(self):
+        self.server = LichessStandIn(fixtures=None).start()
+        self.settings = override_settings(LICHESS_URL=self.server.url)
+        self.settings.enable()
+        reset_lichess_client()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.server.stop()
+        reset_lichess_client()
+
+    def add_game(self, id, white, black, created_at, **kwargs):
+        game = lichess_game(id, white, black, **kwargs)
+        game["createdAt"] = int(created_at.timestamp() * 1000)
+        self.server.add_game(game)
+
+    def sync_tournament(self, players):
+        tournament = Tournament.objects.create(
+            name="sync", tournament_type=TournamentType.ROUNDROBIN,
+            board_type=TournamentBoardType.LICHESS)
+        tournament.players.add(*Player.objects.bulk_create([
+            Player(lichess_username=f"Player{i}")
+            for i in range(1, players + 1)]))
+        create_rounds(tournament)
+        return tournament
+
+    def names(self, round):
+        return [(game.white.lichess_username, game.black.lichess_username)
+                for game in round.game_set.order_by("id")]
+
+    def since(self):
+        # since of every request for the games of a user
+        return {
+            int(parse_qs(urlsplit(key.split()[1]).query)["since"][0])
+            for key in self.server.sent if "/api/games/user/" in key
+        }
+
+    @tag("continua")
+    def test_001_sync_open_rounds(self):
+        """one request for each white player of an open game, the first
+        finished game against the opponent in the round gives the
+        result"""
+        tournament = self.sync_tournament(6)
+        Tournament.objects.create(name="otb", end_date=None)
+        round = tournament.round_set.order_by("id").first()
+        games = list(round.game_set.order_by("id"))
+        names = self.names(round)
+        whites = len({
+            game.white_id
+            for game in Game.objects.filter(round__tournament=tournament)
+        })
+
+        now = timezone.now()
+        self.add_game("before", *names[0], now - timedelta(days=1),
+                      winner="black")
+        self.add_game("first", *names[0], now, winner="white")
+        self.add_game("rematch", *names[0], now + timedelta(seconds=1),
+                      winner="black")
+        self.add_game("playing", *names[1], now, status="started")
+        self.add_game("reversed", *reversed(names[2]), now)
+
+        out = StringIO()
+        call_command("sync_lichess_results", stdout=out)
+        self.assertIn("synced, 1 results found", out.getvalue())
+        self.assertEqual(self.server.statuses, {200: whites})
+        self.assertEqual(
+            [(game.result, game.finished)
+             for game in round.game_set.order_by("id")],
+            [(Scores.WHITE, True), (Scores.NOAVAILABLE, False),
+             (Scores.NOAVAILABLE, False)])
+        self.assertEqual(
+            PlayerStanding.objects.get(player=games[0].white).points, 1)
+
+        # The next sync starts at the game still being played, the
+        # finished game is not asked again
+        tournament.refresh_from_db()
+        self.assertAlmostEqual(tournament.lichess_synced_at, now,
+                               delta=timedelta(milliseconds=1))
+        self.add_game("drawn", *names[2], now, status="draw")
+        self.assertEqual(discover_lichess_results(tournament), [
+            {"lichess_game_id": "drawn", "game_id": games[2].id,
+             "result": Scores.DRAW}])
+        self.assertEqual(self.server.statuses, {200: 2 * whites})
+
+    @tag("continua")
+    def test_002_sync_since_the_last_sync(self):
+        """every round with open games is polled, from the start of the
+        first round and then from the last sync only"""
+        tournament = self.sync_tournament(4)
+        rounds = list(tournament.round_set.order_by("id"))
+        self.assertEqual(discover_lichess_results(tournament), [])
+        tournament.refresh_from_db()
+        synced_at = tournament.lichess_synced_at
+        self.assertGreater(synced_at, rounds[0].start_date)
+        self.assertEqual(self.since(), {
+            int(rounds[0].start_date.timestamp() * 1000)})
+
+        # A game of the last round is found, the games the last sync saw
+        # are not asked again
+        self.add_game("last", *self.names(rounds[-1])[0], timezone.now(),
+                      winner="black")
+        self.server.sent.clear()
+        self.assertEqual(discover_lichess_results(tournament), [
+            {"lichess_game_id": "last",
+             "game_id": rounds[-1].game_set.order_by("id").first().id,
+             "result": Scores.BLACK}])
+        self.assertEqual(self.since(), {
+            int(synced_at.timestamp() * 1000)})
+        tournament.refresh_from_db()
+        self.assertGreater(tournament.lichess_synced_at, synced_at)
+
+
+class LichessGameCacheTest(LocalServerMixin, TransactionTestCase):
+    """finished lichess games are stored and asked once"""
+    reset_sequences = True
+
+    def setUp(self):
+        super().setUp()
+        self.server.body = {
+            "id": "Cached01", "status": "mate", "winner": "black",
+            "players": {"white": {"userId": "Alpha"},
+                        "black": {"userId": "beta"}}}
+
+    def lookup(self, game_id, results):
+        try:
+            results.append(lichess_game_result(game_id).result)
+        finally:
+            connection.close()
+
+    @tag("continua")
+    def test_001_concurrent_lookups(self):
+        """the lookups of a game being fetched wait for its request"""
+        self.server.delay = 0.3
+        results = []
+        threads = [
+            threading.Thread(target=self.lookup, args=("Cached01", results))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [Scores.BLACK] * 5)
+        self.assertEqual(len(self.server.requests), 1)
+
+        # Stored, the player suffix of the long ids is left out
+        stored = LichessGameResult.objects.get(id="Cached01")
+        self.assertEqual((stored.white, stored.black), ("alpha", "beta"))
+        self.server.delay = 0
+        self.assertEqual(lichess_game_result("Cached01abcd").result,
+                         Scores.BLACK)
+        self.assertEqual(len(self.server.requests), 1)
+
+    @tag("continua")
+    def test_002_verifications_use_the_stored_game(self):
+        """the games checked again and the bulk imports do not ask
+        Lichess for a stored game"""
+        tournament = Tournament.objects.create(name="cache")
+        tournament.players.add(*Player.objects.bulk_create([
+            Player(lichess_username=name) for name in ["Alpha", "beta"]]))
+        create_rounds(tournament)
+        round = tournament.round_set.get()
+        game = round.game_set.get()
+        game.white, game.black = game.black, game.white
+        for _ in range(2):
+            with self.assertRaises(LichessAPIError):
+                game.get_lichess_game_result("Cached01")
+        self.assertEqual(len(self.server.requests), 1)
+
+        game.white, game.black = game.black, game.white
+        game.save()
+        imported, errors = import_lichess_results(round, ["Cached01"])
+        self.assertEqual(imported, [{"lichess_game_id": "Cached01",
+                                     "game_id": game.id,
+                                     "result": Scores.BLACK}])
+        self.assertEqual(len(self.server.requests), 1)
+
+    @tag("continua")
+    def test_003_unfinished_and_missing_games(self):
+        """the games being played and the errors are not stored"""
+        self.server.body["status"] = "started"
+        for _ in range(2):
+            self.assertFalse(lichess_game_result("Cached01").finished)
+        self.server.script = [404]
+        with self.assertRaises(LichessAPIError):
+            lichess_game_result("Cached01")
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertFalse(LichessGameResult.objects.exists())
+
+    @tag("continua")
+    def test_004_games_not_played(self):
+        """an aborted game is not stored nor imported as a draw, the game
+        played again afterwards gives the result"""
+        tournament = Tournament.objects.create(name="aborted")
+        tournament.players.add(*Player.objects.bulk_create([
+            Player(lichess_username=name) for name in ["Alpha", "beta"]]))
+        create_rounds(tournament)
+        round = tournament.round_set.get()
+        game = round.game_set.get()
+
+        self.server.body["status"] = "aborted"
+        del self.server.body["winner"]
+        with self.assertRaises(LichessAPIError):
+            game.get_lichess_game_result("Cached01")
+        self.server.games = {"Cached01": lichess_game(
+            "Cached01", "Alpha", "beta", status="noStart")}
+        imported, errors = import_lichess_results(round, ["Cached01"])
+        self.assertEqual(imported, [])
+        self.assertEqual(errors, [{"lichess_game_id": "Cached01",
+                                   "message": "Game was not played "
+                                              "(noStart)"}])
+        self.assertFalse(LichessGameResult.objects.exists())
+
+        self.server.games["Replay01"] = lichess_game(
+            "Replay01", "Alpha", "beta", winner="white")
+        imported, errors = import_lichess_results(round, ["Replay01"])
+        self.assertEqual(imported, [{"lichess_game_id": "Replay01",
+                                     "game_id": game.id,
+                                     "result": Scores.WHITE}])
+        self.assertEqual(errors, [])
+
+        # The errors give the ids as they were sent, with the player suffix
+        self.server.games["Cached01wxyz"] = self.server.games["Cached01"]
+        imported, errors = import_lichess_results(round, ["Cached01wxyz"])
+        self.assertEqual(
+            [error["lichess_game_id"] for error in errors], ["Cached01wxyz"])
@@ -1,6 +1,7 @@
 from chess_models.tests.constants import (
     lichess_usernames_6)
 from chess_models.models import Player, LichessAPIError
+from django.conf import settings
 from django.test import TransactionTestCase, tag
 import requests
 import uuid
@@ -46,7 +47,7 @@ class PlayerModelTest(TransactionTestCase):
         player = Player.objects.create(
             lichess_username=lichess_username)
         player.get_lichess_user_ratings()
-        url = f"https://lichess.org/api/user/{lichess_username}"
+        url = f"{settings.LICHESS_URL}/api/user/{lichess_username}"
         response = requests.get(url)
         data = response.json()
         self.assertEqual(
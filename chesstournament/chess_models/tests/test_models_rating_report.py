@@ -0,0 +1,72 @@
+from django.test import TransactionTestCase, tag
+from chess_models.models import (Tournament, Game, Scores, RatingReport,
+                                 TournamentSpeed)
+from chess_models.models.rating_report import rating_difference
+
+
+class RatingReportTest(TransactionTestCase):
+    """test the performance rating report"""
+    reset_sequences = True
+
+    def setUp(self):
+        from chess_models.management.commands.populate import Command
+        command = Command()
+        command.cleanDataBase()
+        command.readInputFile(
+            'chess_models/management/commands/tie-breaking-swiss.trf')
+        command.insertData()
+        self.tournament = Tournament.objects.get(
+            name='tie-breaking exercises swiss')
+        self.tournament.tournament_speed = TournamentSpeed.CLASSICAL
+        self.tournament.save()
+
+    @tag("continua")
+    def test_001_rating_difference(self):
+        """values of the FIDE dp table"""
+        self.assertEqual(
+            rating_difference([0, 0.25, 0.5, 0.83, 1]).tolist(),
+            [-800, -193, 0, 273, 800])
+
+    @tag("continua")
+    def test_002_report_matches_game_by_game(self):
+        """the vectorized report gives the values computed game by game"""
+        report = RatingReport(self.tournament)
+        self.assertEqual(report.field, 'fide_rating_classical')
+        self.assertEqual(report.players,
+                         self.tournament.getPlayers(sorted=True))
+
+        scores = {Scores.WHITE: 1, Scores.DRAW: 0.5, Scores.BLACK: 0}
+        for row in report.rows():
+            player = row['player']
+            opponents, score, expected = [], 0, 0
+            for game in Game.objects.filter(
+                    round__tournament=self.tournament,
+                    result__in=list(scores)):
+                if game.black is None:
+                    continue
+                if game.white == player:
+                    opponent, points = game.black, scores[game.result]
+                elif game.black == player:
+                    opponent, points = game.white, 1 - scores[game.result]
+                else:
+                    continue
+                rating = opponent.fide_rating_classical
+                opponents.append(rating)
+                score += points
+                difference = max(-400, min(400, rating
+                                           - player.fide_rating_classical))
+                expected += 1 / (1 + 10 ** (difference / 400))
+
+            self.assertEqual(row['games'], len(opponents))
+            self.assertEqual(row['score'], score)
+            if not opponents:
+                self.assertIsNone(row['performance'])
+                continue
+            average = sum(opponents) / len(opponents)
+            self.assertAlmostEqual(row['opponents_rating'], average)
+            self.assertAlmostEqual(row['expected'], expected)
+            self.assertAlmostEqual(row['rating_change'],
+                                   20 * (score - expected))
+            self.assertAlmostEqual(
+                row['performance'],
+                average + rating_difference(score / len(opponents)))
@@ -0,0 +1,78 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext
+from chess_models.models import (Tournament, Player, Game, Scores, Season,
+                                 SeasonStanding, RankingSystem, getRanking,
+                                 compute_season, create_rounds)
+from chess_models.models.constants import (TournamentSpeed, TournamentType,
+                                           TournamentBoardType)
+
+
+class SeasonTest(TransactionTestCase):
+    """test the season leaderboards"""
+    reset_sequences = True
+
+    def setUp(self):
+        self.players = [
+            Player.objects.create(name=f'player_{i}',
+                                  email=f'player_{i}@example.com')
+            for i in range(6)
+        ]
+        self.season = Season.objects.create(name='season')
+        results = [Scores.WHITE, Scores.BLACK, Scores.DRAW]
+        for n, (players, win_points) in enumerate(
+                [(self.players[:4], 1), (self.players[2:], 3)]):
+            tournament = Tournament.objects.create(
+                name=f'tournament_{n}',
+                tournament_type=TournamentType.ROUNDROBIN,
+                tournament_speed=TournamentSpeed.CLASSICAL,
+                board_type=TournamentBoardType.OTB,
+                win_points=win_points)
+            for player in players:
+                tournament.players.add(player)
+            create_rounds(tournament)
+            for i, game in enumerate(Game.objects.filter(
+                    round__tournament=tournament).order_by('id')):
+                game.result = results[(i + n) % len(results)]
+                game.finished = True
+                game.save()
+            self.season.tournaments.add(tournament)
+
+    @tag("continua")
+    def test_001_season_adds_the_tournaments(self):
+        """season points are the sum of the tournament scores"""
+        totals = compute_season(self.season.id)
+        self.assertEqual(set(totals), {player.id for player in self.players})
+
+        expected = {player.id: 0 for player in self.players}
+        for tournament in self.season.tournaments.all():
+            for player, stats in getRanking(tournament).items():
+                expected[player.id] += stats[RankingSystem.PLAIN_SCORE]
+        for player_id, stats in totals.items():
+            self.assertEqual(stats['points'], expected[player_id])
+        self.assertEqual(totals[self.players[2].id]['tournaments'], 2)
+        self.assertEqual(totals[self.players[0].id]['tournaments'], 1)
+
+    @tag("continua")
+    def test_002_games_are_read_in_one_query(self):
+        """the queries do not depend on the number of tournaments"""
+        with CaptureQueriesContext(connection) as queries:
+            compute_season(self.season.id)
+        self.assertEqual(len(queries), 3)
+
+    @tag("continua")
+    def test_003_recompute_seasons_command(self):
+        """the command stores the ranked leaderboard"""
+        out = StringIO()
+        call_command('recompute_seasons', '--workers', '0', stdout=out)
+        self.assertIn('6 players', out.getvalue())
+
+        standings = list(SeasonStanding.objects.filter(season=self.season))
+        self.assertEqual([s.rank for s in standings], list(range(1, 7)))
+        points = [s.points for s in standings]
+        self.assertEqual(points, sorted(points, reverse=True))
+        self.season.refresh_from_db()
+        self.assertIsNotNone(self.season.computed_date)
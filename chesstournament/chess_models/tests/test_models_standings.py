@@ -0,0 +1,325 @@
+from django.db import connection, transaction
+from django.test import TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+from chess_models.models import (Tournament, Player, Round, Game, Scores,
+                                 RankingSystem, getRanking, get_wins,
+                                 compute_standings, create_rounds,
+                                 PlayerStanding, rebuild_standings,
+                                 update_standings, getStoredRanking,
+                                 getRankingHistory, getRankingAfterRound,
+                                 getSQLRanking, RANKING_BACKENDS,
+                                 current_version)
+from chess_models.models.constants import (TournamentSpeed, TournamentType,
+                                           TournamentBoardType)
+from chess_models.models.tournament import bump_version
+
+
+class StandingsEngineTest(TransactionTestCase):
+    """test the single pass standings engine"""
+    reset_sequences = True
+
+    def create_tournament(self, number_of_players):
+        tournament = Tournament.objects.create(
+            name=f'tournament_{number_of_players}',
+            tournament_type=TournamentType.ROUNDROBIN,
+            tournament_speed=TournamentSpeed.CLASSICAL,
+            board_type=TournamentBoardType.OTB)
+        for i in range(number_of_players):
+            player = Player.objects.create(
+                name=f'player_{number_of_players}_{i}',
+                email=f'player_{number_of_players}_{i}@example.com')
+            tournament.players.add(player)
+        create_rounds(tournament)
+
+        # Give a different result to every game
+        results = [Scores.WHITE, Scores.BLACK, Scores.DRAW]
+        for i, game in enumerate(Game.objects.filter(
+                round__tournament=tournament).order_by('id')):
+            game.result = results[i % len(results)]
+            game.finished = True
+            game.save()
+        return tournament
+
+    @tag("continua")
+    def test_001_standings_match_get_wins(self):
+        """the engine returns the same values as get_wins"""
+        from chess_models.management.commands.populate import Command
+        command = Command()
+        command.cleanDataBase()
+        command.readInputFile(
+            'chess_models/management/commands/tie-breaking-swiss.trf')
+        command.insertData()
+        tournament = Tournament.objects.get(
+            name='tie-breaking exercises swiss')
+        tournament.win_points = 3
+        tournament.draw_points = 2
+        tournament.lose_points = 1
+        tournament.save()
+
+        standings = compute_standings(tournament)
+        self.assertEqual(len(standings), tournament.getPlayersCount())
+        for player, stats in standings.items():
+            points, wins, blacks = get_wins(tournament, player)
+            self.assertEqual(stats[RankingSystem.PLAIN_SCORE.value], points)
+            self.assertEqual(stats[RankingSystem.WINS.value], wins)
+            self.assertEqual(stats[RankingSystem.BLACKTIMES.value], blacks)
+
+    @tag("continua")
+    def test_002_unfinished_games_are_ignored(self):
+        """games without a result do not count"""
+        tournament = self.create_tournament(4)
+        Game.objects.filter(round__tournament=tournament).update(
+            finished=False)
+        for stats in compute_standings(tournament).values():
+            self.assertEqual(stats[RankingSystem.PLAIN_SCORE.value], 0)
+            self.assertEqual(stats[RankingSystem.WINS.value], 0)
+            self.assertEqual(stats[RankingSystem.BLACKTIMES.value], 0)
+
+    @tag("continua")
+    def test_003_ranking_query_count_does_not_grow(self):
+        """getRanking issues the same number of queries
+        whatever the number of players is"""
+        small = self.create_tournament(4)
+        large = self.create_tournament(12)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            getRanking(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            ranking = getRanking(large)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(len(ranking), 12)
+        ranks = [stats['rank'] for stats in ranking.values()]
+        self.assertEqual(ranks, list(range(1, 13)))
+
+    def load_swiss(self):
+        from chess_models.management.commands.populate import Command
+        command = Command()
+        command.cleanDataBase()
+        command.readInputFile(
+            'chess_models/management/commands/tie-breaking-swiss.trf')
+        command.insertData()
+        tournament = Tournament.objects.get(
+            name='tie-breaking exercises swiss')
+        for system in [RankingSystem.BUCHHOLZ, RankingSystem.BUCHHOLZ_CUT1,
+                       RankingSystem.BUCHHOLZ_AVERAGE,
+                       RankingSystem.SONNEBORN_BERGER]:
+            tournament.addToRankingList(system.value)
+        return tournament
+
+    def stored_values(self, tournament):
+        return list(PlayerStanding.objects.filter(
+            tournament=tournament).order_by('player_id').values())
+
+    @tag("continua")
+    def test_004_stored_ranking_matches_get_ranking(self):
+        """the ranking read from the standings table is the computed one"""
+        tournament = self.load_swiss()
+        self.assertEqual(getStoredRanking(tournament), getRanking(tournament))
+        self.assertEqual(PlayerStanding.objects.filter(
+            tournament=tournament).count(), tournament.getPlayersCount())
+
+    @tag("continua")
+    def test_005_incremental_update_matches_rebuild(self):
+        """updating the standings after a result changes gives the same
+        table as computing it from scratch"""
+        tournament = self.load_swiss()
+        rebuild_standings(tournament)
+        ids = [row['id'] for row in self.stored_values(tournament)]
+
+        games = Game.objects.filter(
+            round__tournament=tournament, black__isnull=False).order_by('id')
+        for i, result in enumerate(
+                [Scores.BLACK, Scores.DRAW, Scores.FORFEITWIN]):
+            game = games[i * 7]
+            game.result = result
+            with transaction.atomic():
+                version = current_version(tournament, lock=True)
+                game.save()
+                update_standings(game, version)
+            updated = self.stored_values(tournament)
+
+            # The rows were updated in place, not built again
+            self.assertEqual([row['id'] for row in updated], ids)
+            self.assertEqual({row['version'] for row in updated},
+                             {current_version(tournament)})
+
+            rebuild_standings(tournament)
+            rebuilt = self.stored_values(tournament)
+            ids = [row['id'] for row in rebuilt]
+            for row, expected in zip(updated, rebuilt):
+                del row['id'], expected['id']
+                for field, value in expected.items():
+                    self.assertAlmostEqual(row[field], value)
+        self.assertEqual(getStoredRanking(tournament), getRanking(tournament))
+
+    @tag("continua")
+    def test_0055_stored_ranking_follows_the_tournament(self):
+        """the stored table is built again after any change of the
+        tournament, its points or its games"""
+        tournament = self.load_swiss()
+        getStoredRanking(tournament)
+
+        tournament.win_points = 3
+        tournament.save()
+        self.assertEqual(getStoredRanking(tournament), getRanking(tournament))
+
+        Game.objects.filter(round__tournament=tournament).first().delete()
+        self.assertEqual(getStoredRanking(tournament), getRanking(tournament))
+
+        game = Game.objects.filter(
+            round__tournament=tournament, black__isnull=False).last()
+        Game.objects.create(round=game.round, white=game.black,
+                            black=game.white, result=Scores.WHITE,
+                            finished=True)
+        self.assertEqual(getStoredRanking(tournament), getRanking(tournament))
+
+        # A result written the way the endpoints do it
+        game.result = Scores.BLACK
+        with transaction.atomic():
+            version = current_version(tournament, lock=True)
+            game.save()
+        update_standings(game, version)
+        self.assertEqual(getStoredRanking(tournament), getRanking(tournament))
+
+    @tag("continua")
+    def test_0056_backends_rank_ties_alike(self):
+        """players tied on every criterion are ranked by player id by all
+        the backends, whatever order they entered the tournament in"""
+        tournament = Tournament.objects.create(
+            name='ties', tournament_type=TournamentType.ROUNDROBIN)
+        players = [
+            Player.objects.create(name=f'tie_{i}',
+                                  email=f'tie_{i}@example.com')
+            for i in range(6)]
+        for player in reversed(players):
+            tournament.players.add(player)
+        tournament.addToRankingList(RankingSystem.BUCHHOLZ.value)
+        create_rounds(tournament)
+        Game.objects.filter(round__tournament=tournament).update(
+            result=Scores.DRAW, finished=True)
+        bump_version(pk=tournament.pk)
+
+        # The players are read in the reverse order of their ids
+        def getPlayers(self, sorted=False):
+            return list(reversed(players))
+
+        for backend in RANKING_BACKENDS.values():
+            with patch.object(Tournament, 'getPlayers', getPlayers):
+                ranking = backend(tournament)
+            self.assertEqual(list(ranking), players)
+            self.assertEqual([stats['rank'] for stats in ranking.values()],
+                             list(range(1, 7)))
+
+    @tag("continua")
+    def test_0057_stored_ranking_does_not_loop(self):
+        """a version changed while the table is built again does not make
+        getStoredRanking build it once more"""
+        tournament = self.create_tournament(4)
+
+        def rebuild_and_bump(tournament):
+            standings = rebuild_standings(tournament)
+            bump_version(pk=tournament.pk)
+            return standings
+
+        with patch('chess_models.models.player_standing.rebuild_standings',
+                   side_effect=rebuild_and_bump) as rebuild:
+            ranking = getStoredRanking(tournament)
+        self.assertEqual(rebuild.call_count, 1)
+        self.assertEqual(list(ranking), list(getRanking(tournament)))
+
+    @tag("continua")
+    def test_006_ranking_history_matches_partial_rankings(self):
+        """the ranking after every round is the ranking computed
+        without the games of the next rounds"""
+        tournament = self.load_swiss()
+        history = getRankingHistory(tournament)
+        self.assertEqual(len(history), tournament.getRoundCount())
+        self.assertEqual(history[-1][1], getRanking(tournament))
+
+        for round, ranking in reversed(history):
+            Game.objects.filter(
+                round__tournament=tournament, round__id__gt=round.id
+            ).update(finished=False)
+            self.assertEqual(ranking, getRanking(tournament))
+        self.assertEqual(getRankingAfterRound(tournament, 0), {})
+
+    @tag("continua")
+    def test_007_ranking_history_query_count_does_not_grow(self):
+        """the history costs the same queries whatever the number
+        of rounds is"""
+        small = self.create_tournament(4)
+        large = self.create_tournament(10)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            getRankingHistory(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            history = getRankingHistory(large)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(len(history), 9)
+
+    @tag("continua")
+    def test_008_sql_ranking_matches_get_ranking(self):
+        """the database aggregates give the same ranking"""
+        tournament = self.load_swiss()
+        self.assertEqual(getSQLRanking(tournament), getRanking(tournament))
+
+        tournament.cleanRankingList()
+        tournament.addToRankingList(RankingSystem.WINS.value)
+        tournament.addToRankingList(RankingSystem.BLACKTIMES.value)
+        tournament.win_points = 3
+        tournament.draw_points = 2
+        tournament.lose_points = 1
+        tournament.save()
+        for backend in RANKING_BACKENDS.values():
+            self.assertEqual(backend(tournament), getRanking(tournament))
+
+    @tag("continua")
+    def test_009_sql_ranking_is_a_single_query(self):
+        """without opponent tie-breaks the ranking is one query
+        plus the ranking list"""
+        tournament = self.create_tournament(10)
+        with CaptureQueriesContext(connection) as queries:
+            ranking = getSQLRanking(tournament)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual([stats['rank'] for stats in ranking.values()],
+                         list(range(1, 11)))
+
+    @tag("continua")
+    def test_010_first_criterion_is_the_most_important(self):
+        """players tied on points are ordered by the first criterion of
+        the ranking list, the next ones only break its ties"""
+        tournament = Tournament.objects.create(
+            name='priority', tournament_type=TournamentType.SWISS)
+        players = {}
+        for name in 'ABCD':
+            players[name] = Player.objects.create(
+                name=name, email=f'{name.lower()}@example.com')
+            tournament.players.add(players[name])
+        # A and D have one point: A won once with white, D drew twice
+        # with black
+        for number, games in enumerate([
+                [('A', 'B', Scores.WHITE), ('C', 'D', Scores.DRAW)],
+                [('A', 'C', Scores.BLACK), ('B', 'D', Scores.DRAW)]], 1):
+            round = Round.objects.create(
+                name=f'round_{number}', tournament=tournament)
+            for white, black, result in games:
+                Game.objects.create(
+                    round=round, white=players[white],
+                    black=players[black], result=result, finished=True)
+
+        for ranking_list, order in [
+                ([RankingSystem.WINS, RankingSystem.BLACKTIMES], 'CADB'),
+                ([RankingSystem.BLACKTIMES, RankingSystem.WINS], 'CDAB')]:
+            tournament.cleanRankingList()
+            for system in ranking_list:
+                tournament.addToRankingList(system.value)
+            for backend in RANKING_BACKENDS.values():
+                ranking = backend(tournament)
+                self.assertEqual(
+                    ''.join(player.name for player in ranking), order)
+                self.assertEqual(
+                    [stats['rank'] for stats in ranking.values()],
+                    [1, 2, 3, 4])
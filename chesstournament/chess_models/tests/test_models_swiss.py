@@ -0,0 +1,151 @@
+from django.test import TransactionTestCase, tag
+from chess_models.models import (Tournament, Player, Game, Scores,
+                                 SwissPairing, create_rounds, getRanking,
+                                 computeRanking, RankingSystem)
+from chess_models.models.constants import (TournamentSpeed, TournamentType,
+                                           TournamentBoardType)
+
+
+class SwissPairingTest(TransactionTestCase):
+    """test the swiss pairing engine"""
+    reset_sequences = True
+
+    def create_tournament(self, count):
+        tournament = Tournament.objects.create(
+            name=f'swiss_{count}',
+            tournament_type=TournamentType.SWISS,
+            tournament_speed=TournamentSpeed.CLASSICAL,
+            board_type=TournamentBoardType.OTB)
+        for i in range(1, count + 1):
+            player = Player.objects.create(
+                id=i, name=f'player_{i}',
+                fide_rating_classical=3000 - 10 * i)
+            tournament.players.add(player)
+        return tournament
+
+    def play_round(self, tournament, results):
+        # Finish the games of the last round, the results are cycled
+        round = tournament.round_set.order_by('-id').first()
+        for i, game in enumerate(round.game_set.order_by('id')):
+            if game.black is not None:
+                game.result = results[i % len(results)]
+            game.finished = True
+            game.save()
+
+    @tag("continua")
+    def test_001_no_rematches(self):
+        """every player plays once per round and never meets an
+        opponent again"""
+        tournament = self.create_tournament(12)
+        results = [Scores.WHITE, Scores.DRAW, Scores.BLACK]
+        met = set()
+        for _ in range(5):
+            games = create_rounds(tournament)[0]
+            players = [id for game in games for id in game]
+            self.assertEqual(sorted(players), list(range(1, 13)))
+            for white, black in games:
+                self.assertNotIn(frozenset([white, black]), met)
+                met.add(frozenset([white, black]))
+            self.play_round(tournament, results)
+        self.assertEqual(tournament.getRoundCount(), 5)
+
+    @tag("continua")
+    def test_002_colours(self):
+        """nobody plays the same colour three times in a row"""
+        tournament = self.create_tournament(16)
+        for _ in range(6):
+            create_rounds(tournament)
+            self.play_round(tournament, [Scores.WHITE, Scores.BLACK])
+
+        colours = {id: '' for id in range(1, 17)}
+        for game in Game.objects.filter(
+                round__tournament=tournament).order_by('round_id', 'id'):
+            colours[game.white_id] += 'W'
+            colours[game.black_id] += 'B'
+        for history in colours.values():
+            self.assertNotIn('WWW', history)
+            self.assertNotIn('BBB', history)
+            self.assertLessEqual(
+                abs(history.count('W') - history.count('B')), 2)
+
+    @tag("continua")
+    def test_003_colour_preferences_in_a_bracket(self):
+        """the opponents of a score group are swapped to give both
+        players their colours"""
+        tournament = self.create_tournament(8)
+        create_rounds(tournament)
+        self.play_round(tournament, [Scores.WHITE, Scores.BLACK])
+
+        # 1, 2, 3 and 4 won. 1 and 3 played white, 2 and 4 black, so
+        # 1 - 3 and 2 - 4 are transposed
+        _, _, pairs = SwissPairing(tournament).pair()
+        self.assertIn((4, 1), pairs)
+        self.assertIn((2, 3), pairs)
+
+    @tag("continua")
+    def test_004_byes(self):
+        """the pairing-allocated bye goes to the lowest player that did
+        not get one, the half point byes are not paired"""
+        tournament = self.create_tournament(10)
+        games = create_rounds(tournament, swissByes=[1])[0]
+        self.assertEqual(games[0], [1, None])
+        self.assertEqual(games[1], [10, None])
+        self.assertEqual(
+            list(Game.objects.filter(black=None).order_by('id')
+                 .values_list('result', flat=True)),
+            [Scores.BYE_H, Scores.BYE_U])
+        self.play_round(tournament, [Scores.WHITE])
+
+        games = create_rounds(tournament, swissByes=[2])[0]
+        self.assertEqual(games[0], [2, None])
+        self.assertEqual(games[1][1], None)
+        self.assertNotIn(games[1][0], [1, 2, 10])
+
+    @tag("continua")
+    def test_0045_bye_points(self):
+        """the byes are finished when they are created, their points are
+        in the ranking and in the pairing of the next round"""
+        tournament = self.create_tournament(5)
+        create_rounds(tournament)
+        bye = Game.objects.get(black=None)
+        self.assertEqual((bye.white_id, bye.result, bye.finished),
+                         (5, Scores.BYE_U, True))
+
+        winners = {5}
+        for game in Game.objects.exclude(black=None):
+            winners.add(game.black_id)
+            game.result = Scores.BLACK
+            game.finished = True
+            game.save()
+        for ranking in [getRanking(tournament), computeRanking(tournament)]:
+            points = {player.id: stats[RankingSystem.PLAIN_SCORE.value]
+                      for player, stats in ranking.items()}
+            self.assertEqual(points[5], tournament.win_points)
+
+        pairing = SwissPairing(tournament)
+        self.assertEqual(pairing.score[5], tournament.win_points)
+        self.assertEqual(set(pairing.order[:3]), winners)
+
+    @tag("continua")
+    def test_005_number_of_rounds(self):
+        """no round is created after the last one"""
+        tournament = self.create_tournament(4)
+        tournament.number_of_rounds_for_swiss = 1
+        tournament.save()
+        self.assertEqual(len(create_rounds(tournament)), 1)
+        self.assertEqual(create_rounds(tournament), [])
+        self.assertEqual(tournament.getRoundCount(), 1)
+
+    @tag("continua")
+    def test_006_large_open(self):
+        """a large field is paired without rematches"""
+        tournament = self.create_tournament(200)
+        met = set()
+        for _ in range(4):
+            games = create_rounds(tournament)[0]
+            self.assertEqual(len(games), 100)
+            pairs = {frozenset(game) for game in games}
+            self.assertFalse(pairs & met)
+            met |= pairs
+            self.play_round(
+                tournament, [Scores.WHITE, Scores.DRAW, Scores.BLACK])
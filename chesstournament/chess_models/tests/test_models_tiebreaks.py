@@ -0,0 +1,117 @@
+from django.test import TransactionTestCase, tag
+from chess_models.models import (Tournament, Player, Round, Game, Scores,
+                                 RankingSystem, TieBreakEngine,
+                                 compute_tiebreaks)
+from chess_models.models.constants import (TournamentSpeed, TournamentType,
+                                           TournamentBoardType)
+
+
+class TieBreakEngineTest(TransactionTestCase):
+    """test the opponent tie-breaks against values worked out by hand"""
+    reset_sequences = True
+
+    def setUp(self):
+        # Three rounds of five players. E gets an unplayed round that is
+        # not voluntary (BYE_U), B a half point bye in the middle of the
+        # tournament and D a zero point bye in the last round, the only
+        # one that counts as a draw for the opponents of D
+        self.tournament = Tournament.objects.create(
+            name='tie-breaks',
+            tournament_type=TournamentType.SWISS,
+            tournament_speed=TournamentSpeed.CLASSICAL,
+            board_type=TournamentBoardType.OTB)
+        self.players = {}
+        for name in 'ABCDE':
+            player = Player.objects.create(
+                name=name, email=f'{name.lower()}@example.com')
+            self.tournament.players.add(player)
+            self.players[name] = player
+
+        rounds = [
+            [('A', 'B', Scores.WHITE), ('C', 'D', Scores.DRAW),
+             ('E', None, Scores.BYE_U)],
+            [('C', 'A', Scores.WHITE), ('D', 'E', Scores.BLACK),
+             ('B', None, Scores.BYE_H)],
+            [('A', 'E', Scores.DRAW), ('B', 'C', Scores.BLACK),
+             ('D', None, Scores.BYE_Z)],
+        ]
+        for number, games in enumerate(rounds, 1):
+            round = Round.objects.create(
+                name=f'round_{number}', tournament=self.tournament)
+            for white, black, result in games:
+                Game.objects.create(
+                    round=round, white=self.players[white],
+                    black=self.players.get(black), result=result,
+                    finished=True)
+
+    def by_name(self, values):
+        return {
+            player.name: value
+            for player, value in zip(self.engine.games.players,
+                                     values.tolist())
+        }
+
+    @tag("continua")
+    def test_001_adjusted_score(self):
+        """only the voluntarily unplayed rounds after the last game
+        played count as draws"""
+        self.engine = TieBreakEngine(self.tournament)
+        self.assertEqual(self.by_name(self.engine.score), {
+            'A': 1.5, 'B': 0.5, 'C': 2.5, 'D': 0.5, 'E': 2.5})
+        self.assertEqual(self.by_name(self.engine.adjusted_score), {
+            'A': 1.5, 'B': 0.5, 'C': 2.5, 'D': 1.0, 'E': 2.5})
+
+    @tag("continua")
+    def test_002_buchholz(self):
+        """adjusted scores of the opponents, the unplayed rounds count
+        the player's own score"""
+        self.engine = TieBreakEngine(self.tournament)
+        self.assertEqual(self.by_name(self.engine.buchholz()), {
+            'A': 5.5, 'B': 4.5, 'C': 3.0, 'D': 5.5, 'E': 5.0})
+
+    @tag("continua")
+    def test_003_buchholz_cut1(self):
+        """a voluntarily unplayed round is cut first, otherwise the
+        lowest opponent"""
+        self.engine = TieBreakEngine(self.tournament)
+        self.assertEqual(self.by_name(self.engine.buchholz_cut1()), {
+            'A': 5.0, 'B': 4.0, 'C': 2.5, 'D': 5.0, 'E': 4.0})
+
+    @tag("continua")
+    def test_004_buchholz_average(self):
+        """average Buchholz of the opponents actually played"""
+        self.engine = TieBreakEngine(self.tournament)
+        average = self.by_name(self.engine.buchholz_average())
+        expected = {'A': 12.5 / 3, 'B': 4.25, 'C': 15.5 / 3, 'D': 4.0,
+                    'E': 5.5}
+        for name, value in expected.items():
+            self.assertAlmostEqual(average[name], value)
+
+    @tag("continua")
+    def test_005_sonneborn_berger(self):
+        """points against each opponent times its adjusted score"""
+        self.engine = TieBreakEngine(self.tournament)
+        self.assertEqual(self.by_name(self.engine.sonneborn_berger()), {
+            'A': 1.75, 'B': 0.25, 'C': 2.5, 'D': 1.25, 'E': 4.25})
+
+    @tag("continua")
+    def test_006_compute(self):
+        """compute_tiebreaks gives only the requested systems"""
+        self.engine = TieBreakEngine(self.tournament)
+        tiebreaks = compute_tiebreaks(
+            self.tournament, [RankingSystem.BUCHHOLZ.value,
+                              RankingSystem.WINS.value])
+        self.assertEqual(
+            {player.name: stats for player, stats in tiebreaks.items()},
+            {name: {RankingSystem.BUCHHOLZ.value: value}
+             for name, value in self.by_name(
+                 self.engine.buchholz()).items()})
+
+    @tag("continua")
+    def test_007_opponents_of(self):
+        """the players that played against any of the given ones"""
+        self.engine = TieBreakEngine(self.tournament)
+        names = [player.name for player in self.engine.games.players]
+        opponents = self.engine.opponents_of([names.index('B')])
+        self.assertEqual(sorted(names[i] for i in opponents.tolist()),
+                         ['A', 'C'])
@@ -225,29 +225,20 @@ class TournamentModelTest(TransactionTestCase):
     @tag("double")
     def test_0075_tournament_create_double_round_same_dayeven(self):
         """create games for a double round same day robin tournament
+        both games of every pair are played on the same round
         Solution for 6 players:
-            Rd 01: 1-6, 2-5, 3-4.
-            Rd 02: 6-1, 5-2, 4-3.
-            Rd 03: 6-4, 5-3, 1-2.
-            Rd 04: 4-6, 3-5, 2-1.
-            Rd 05: 2-6, 3-1, 4-5.
-            Rd 06: 6-2, 1-3, 5-4.
-            Rd 07: 6-5, 1-4, 2-3.
-            Rd 08: 5-6, 4-1, 3-2.
-            Rd 09: 3-6, 4-2, 5-1.
-            Rd 10: 6-3, 2-4, 1-5.
+            Rd 1: 1-6, 2-5, 3-4, 6-1, 5-2, 4-3.
+            Rd 2: 6-4, 5-3, 1-2, 4-6, 3-5, 2-1.
+            Rd 3: 2-6, 3-1, 4-5, 6-2, 1-3, 5-4.
+            Rd 4: 6-5, 1-4, 2-3, 5-6, 4-1, 3-2.
+            Rd 5: 3-6, 4-2, 5-1, 6-3, 2-4, 1-5.
         from https://handbook.fide.com/chapter/C05Annex1
         """
-        solution = [[[1, 6], [2, 5], [3, 4]],
-                    [[6, 1], [5, 2], [4, 3]],
-                    [[6, 4], [5, 3], [1, 2]],
-                    [[4, 6], [3, 5], [2, 1]],
-                    [[2, 6], [3, 1], [4, 5]],
-                    [[6, 2], [1, 3], [5, 4]],
-                    [[6, 5], [1, 4], [2, 3]],
-                    [[5, 6], [4, 1], [3, 2]],
-                    [[3, 6], [4, 2], [5, 1]],
-                    [[6, 3], [2, 4], [1, 5]]]
+        solution = [[[1, 6], [2, 5], [3, 4], [6, 1], [5, 2], [4, 3]],
+                    [[6, 4], [5, 3], [1, 2], [4, 6], [3, 5], [2, 1]],
+                    [[2, 6], [3, 1], [4, 5], [6, 2], [1, 3], [5, 4]],
+                    [[6, 5], [1, 4], [2, 3], [5, 6], [4, 1], [3, 2]],
+                    [[3, 6], [4, 2], [5, 1], [6, 3], [2, 4], [1, 5]]]
 
         tournament_name = 'tournament_01'
         tournament = Tournament.objects.create(
@@ -264,6 +255,7 @@ class TournamentModelTest(TransactionTestCase):
         participants = tournament.getPlayers(sorted=True)
         create_rounds(tournament)
         rounds = tournament.round_set.all()
+        self.assertEqual(len(rounds), len(solution))
         for i, round in enumerate(rounds):
             # print(round)
             for j, game in enumerate(round.game_set.all()):
@@ -274,30 +266,20 @@ class TournamentModelTest(TransactionTestCase):
     @tag("double")
     def test_0076_tournament_create_round_odd(self):
         """create games for a double round robin same day tournament
-        Solution for 5 players:
+        Solution for 5 players, both games of a pair on the same round:
             player 6 -> bye
-            Rd 1: 1-6, 2-5, 3-4.
-            Rd 2: 6-1, 5-2, 4-3.
-            Rd 3: 6-4, 5-3, 1-2.
-            Rd 4: 4-6, 3-5, 2-1.
-            Rd 5: 2-6, 3-1, 4-5.
-            Rd 6: 6-2, 1-3, 5-4.
-            Rd 7: 6-5, 1-4, 2-3.
-            Rd 8: 5-6, 4-1, 3-2.
-            Rd 9: 3-6, 4-2, 5-1.
-            Rd 10: 6-3, 2-4, 1-5.
+            Rd 1: 1-6, 2-5, 3-4, 6-1, 5-2, 4-3.
+            Rd 2: 6-4, 5-3, 1-2, 4-6, 3-5, 2-1.
+            Rd 3: 2-6, 3-1, 4-5, 6-2, 1-3, 5-4.
+            Rd 4: 6-5, 1-4, 2-3, 5-6, 4-1, 3-2.
+            Rd 5: 3-6, 4-2, 5-1, 6-3, 2-4, 1-5.
         from https://handbook.fide.com/chapter/C05Annex1
         """
-        solution = [[[1, 6], [2, 5], [3, 4]],
-                    [[6, 1], [5, 2], [4, 3]],
-                    [[6, 4], [5, 3], [1, 2]],
-                    [[4, 6], [3, 5], [2, 1]],
-                    [[2, 6], [3, 1], [4, 5]],
-                    [[6, 2], [1, 3], [5, 4]],
-                    [[6, 5], [1, 4], [2, 3]],
-                    [[5, 6], [4, 1], [3, 2]],
-                    [[3, 6], [4, 2], [5, 1]],
-                    [[6, 3], [2, 4], [1, 5]]]
+        solution = [[[1, 6], [2, 5], [3, 4], [6, 1], [5, 2], [4, 3]],
+                    [[6, 4], [5, 3], [1, 2], [4, 6], [3, 5], [2, 1]],
+                    [[2, 6], [3, 1], [4, 5], [6, 2], [1, 3], [5, 4]],
+                    [[6, 5], [1, 4], [2, 3], [5, 6], [4, 1], [3, 2]],
+                    [[3, 6], [4, 2], [5, 1], [6, 3], [2, 4], [1, 5]]]
         tournament_name = 'tournament_01'
         tournament = Tournament.objects.create(
             name=tournament_name,
@@ -316,6 +298,7 @@ class TournamentModelTest(TransactionTestCase):
 
         create_rounds(tournament)
         rounds = tournament.round_set.all()
+        self.assertEqual(len(rounds), len(solution))
         for i, round in enumerate(rounds):
             # print(round)
             for j, game in enumerate(round.game_set.all()):
@@ -110,6 +110,57 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# CACHE_BACKEND can be 'locmem', 'file' or the path of any Django backend
+
+cache_backends = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+cache_backend = os.getenv('CACHE_BACKEND', 'locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': cache_backends.get(cache_backend, cache_backend),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache') if cache_backend == 'file'
+            else 'chesstournament'
+        ),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', 3600)),
+    }
+}
+
+
+# Ranking backend: 'stored' (PlayerStanding table), 'python' or 'sql'
+RANKING_BACKEND = os.getenv('RANKING_BACKEND', 'stored')
+
+
+# Lichess API. LICHESS_URL can point to a local stand-in, the timeouts are
+# in seconds and the failed requests (429 and 5xx) are retried with an
+# exponential backoff
+LICHESS_URL = os.getenv('LICHESS_URL', 'https://lichess.org')
+LICHESS_CONNECT_TIMEOUT = float(os.getenv('LICHESS_CONNECT_TIMEOUT', 3.05))
+LICHESS_READ_TIMEOUT = float(os.getenv('LICHESS_READ_TIMEOUT', 10))
+LICHESS_RETRIES = int(os.getenv('LICHESS_RETRIES', 3))
+LICHESS_BACKOFF = float(os.getenv('LICHESS_BACKOFF', 0.5))
+LICHESS_POOL_SIZE = int(os.getenv('LICHESS_POOL_SIZE', 10))
+
+# Requests in flight of the asyncio Lichess client used by the bulk
+# operations, and seconds they stop after a 429 without Retry-After
+LICHESS_CONCURRENCY = int(os.getenv('LICHESS_CONCURRENCY', 8))
+LICHESS_RATE_LIMIT_PAUSE = float(os.getenv('LICHESS_RATE_LIMIT_PAUSE', 60))
+
+# Seconds the Lichess data of a player is used before it is fetched again,
+# the imports of a tournament use its max_update_time
+LICHESS_RATINGS_MAX_AGE = int(os.getenv('LICHESS_RATINGS_MAX_AGE', 43200))
+
+# Seconds a running tournament job can go without reporting progress before
+# another worker takes it again, its worker is taken as dead
+TOURNAMENT_JOB_TIMEOUT = int(os.getenv('TOURNAMENT_JOB_TIMEOUT', 600))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 